@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def has_progress(path) -> bool:
+    """
+    Whether a journal exists at path and has any records in it.
+    """
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+class JournalCountries(Mapping):
+    """
+    Countries recorded in a journal, mapping country -> parks. Only the offset of each
+    country's record is kept in memory; its parks are read back from the journal when
+    it is looked up.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+
+    def __getitem__(self, country):
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[country])
+            return json.loads(f.readline().decode('utf-8'))['parks']
+
+    def __contains__(self, country):
+        return country in self.offsets
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+class CheckpointJournal:
+    """
+    Append-only journal of a crawl's progress, so that an interrupted run can be resumed
+    without fetching completed work again. Each line is a JSON record of a country page
+    that was scraped, or of a park article that was resolved or failed. Records are
+    buffered and appended in batches, and the file is flushed to disk every flush_every
+    records or flush_interval seconds, so a crash loses at most the last batch. A line
+    cut short by a crash is skipped when the journal is read.
+
+    Pass it to main as the checkpoint: it is told about progress through the crawl
+    observer methods (country_done, park_resolved, park_failed).
+
+    Parks whose page could not be fetched (park_failed with error=True) are journaled
+    as errors and fetched again on resume, unlike parks whose page has no coordinates.
+    Once the crawl has finished, discard removes the journal.
+
+    Only the work read from an existing journal is kept in memory (countries, a
+    JournalCountries read back on lookup, and parks, href -> (lat_dms, long_dms)), to
+    pass to the crawl as completed work. Progress made in this run is only appended to
+    the journal, and observer calls about work that was read from it are not journaled
+    again.
+
+    path: file the journal is written to
+    resume: read the countries and parks already done from an existing journal and keep
+    appending to it; otherwise the journal is started over
+    overwrite: allow starting over a journal that still holds the progress of an earlier
+    crawl; without it (or resume) a non-empty journal raises FileExistsError, so a rerun
+    that forgot to resume does not wipe the saved progress
+    """
+    def __init__(self, path, resume=False, overwrite=False, flush_every=100, flush_interval=5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        if not resume and not overwrite and has_progress(path):
+            raise FileExistsError(f"{path} holds the progress of an earlier crawl; resume it or overwrite it")
+
+        # Work recorded in the journal: country -> parks, park href -> (lat_dms, long_dms)
+        self.countries = JournalCountries(path)
+        self.parks = {}
+        if resume and os.path.exists(path):
+            self._load()
+
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self):
+        end_of_records = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("Record is missing its newline")
+                    record = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # Only the last line can be cut short; later appends start after the
+                    # last complete record
+                    logger.info(f"Skipping an incomplete record in {self.path}")
+                    break
+                if record['type'] == 'country':
+                    self.countries.offsets[record['country']] = end_of_records
+                elif record['type'] == 'park' and not record.get('error', False):
+                    self.parks[record['url']] = (record['lat_dms'], record['long_dms'])
+                end_of_records += len(line)
+
+        with open(self.path, 'r+b') as f:
+            f.truncate(end_of_records)
+
+        logger.info(f"Resuming from {self.path}: {len(self.countries)} countries and {len(self.parks)} parks are done")
+
+    def _append(self, record):
+        with self._lock:
+            self._buffer.append(json.dumps(record, ensure_ascii=False) + '\n')
+            if len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+    def discard(self):
+        """
+        Close and remove the journal once the crawl it records has finished.
+        """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def country_done(self, country, parks):
+        if country in self.countries:
+            return
+        self._append({'type': 'country', 'country': country, 'parks': {name: dict(park) for name, park in parks.items()}})
+
+    def park_resolved(self, url, lat_dms, long_dms):
+        if self.parks.get(url) == (lat_dms, long_dms):
+            return
+        self._append({'type': 'park', 'url': url, 'lat_dms': lat_dms, 'long_dms': long_dms})
+
+    def park_failed(self, url, error=False):
+        if not error and self.parks.get(url) == (None, None):
+            return
+        self._append({'type': 'park', 'url': url, 'lat_dms': None, 'long_dms': None, 'error': error})
@@ -0,0 +1,307 @@
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from park_query import haversine_km
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Words that say what kind of area a park is rather than which park it is; they are
+# left out of the names that are blocked on and compared
+GENERIC_NAME_TOKENS = {
+    'national', 'park', 'parks', 'np', 'reserve', 'nature', 'natural', 'forest', 'marine',
+    'conservation', 'area', 'the', 'of', 'and', 'de', 'del', 'la', 'le', 'los', 'las',
+    'des', 'du', 'da', 'do', 'di', 'parque', 'nacional', 'parc', 'nationalpark', 'parco',
+    'nazionale', 'narodni', 'narodowy', 'reserva', 'milli', 'parki'
+}
+
+# Tokens shorter than this, like numbers, do not tell parks apart on their own
+MIN_TOKEN_LENGTH = 3
+
+# Number of hash functions in a MinHash signature
+MINHASH_SIZE = 64
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_park_name(name) -> str:
+    """
+    Lowercase a park name and strip its accents and punctuation.
+    """
+    if name == None or name != name:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    stripped = ''.join(character for character in decomposed if not unicodedata.combining(character))
+
+    return ' '.join(re.sub(r'[^\w\s]', ' ', stripped.casefold()).split())
+
+
+def is_distinctive_token(token) -> bool:
+    """
+    Whether a token of a normalized name can tell parks apart: not a generic word, a
+    number or shorter than MIN_TOKEN_LENGTH.
+    """
+    return token not in GENERIC_NAME_TOKENS and not token.isdigit() and len(token) >= MIN_TOKEN_LENGTH
+
+
+def distinctive_name(normalized_name) -> str:
+    """
+    A normalized park name without its generic words ('Parque Nacional Los Glaciares'
+    -> 'glaciares'), or the whole name if no distinctive token is left, e.g. '1 national
+    park', which would otherwise be reduced to '1'.
+    """
+    tokens = [token for token in normalized_name.split() if token not in GENERIC_NAME_TOKENS]
+    if not any(is_distinctive_token(token) for token in tokens):
+        return normalized_name
+
+    return ' '.join(tokens)
+
+
+def geohash_cells(lat, long, precision):
+    """
+    Row and column of the geohash cell of each coordinate at a precision (number of
+    characters), as two int64 arrays. Cells next to each other differ by one in either.
+    """
+    long_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    lat_cells = np.floor((np.asarray(lat, dtype=float) + 90) / 180 * (1 << lat_bits))
+    long_cells = np.floor((np.asarray(long, dtype=float) + 180) / 360 * (1 << long_bits))
+
+    return (
+        np.clip(lat_cells, 0, (1 << lat_bits) - 1).astype(np.int64),
+        np.clip(long_cells, 0, (1 << long_bits) - 1).astype(np.int64)
+    )
+
+
+def minhash_signatures(names, size=MINHASH_SIZE, seed=0) -> np.ndarray:
+    """
+    MinHash signature of the character trigrams of each name, as an (n, size) array.
+    The fraction of positions where two signatures agree estimates the Jaccard
+    similarity of the names' trigrams.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size, dtype=np.uint64)
+    b = rng.integers(0, _MERSENNE_PRIME, size, dtype=np.uint64)
+
+    signatures = np.full((len(names), size), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, name in enumerate(names):
+        padded = f'  {name} '
+        shingles = np.fromiter({zlib.crc32(padded[j:j + 3].encode('utf-8')) for j in range(len(padded) - 2)}, dtype=np.uint64)
+        if len(shingles) > 0:
+            # Universal hashing of the 32-bit shingle hashes; wraps around 2^64, which is fine for hashing
+            signatures[i] = ((np.outer(shingles, a) + b) % _MERSENNE_PRIME).min(axis=0)
+
+    return signatures
+
+
+def minhash_similarity(signatures, i, j, chunk_size=100_000) -> np.ndarray:
+    """
+    Estimated Jaccard similarity of the pairs of rows (i[k], j[k]), compared
+    chunk_size pairs at a time to bound memory.
+    """
+    similarity = np.empty(len(i))
+    for start in range(0, len(i), chunk_size):
+        end = start + chunk_size
+        similarity[start:end] = (signatures[i[start:end]] == signatures[j[start:end]]).mean(axis=1)
+
+    return similarity
+
+
+def _pairs_from_blocks(left: pd.DataFrame, right: pd.DataFrame, on, max_block_size=None):
+    """
+    Pairs of rows (smaller position first) from left and right that share the keys in
+    on. Both have a row column. Keys shared by more than max_block_size rows are too
+    common to tell parks apart and are skipped.
+    """
+    if max_block_size is not None:
+        right = right[right.groupby(on)['row'].transform('size') <= max_block_size]
+    pairs = left.merge(right, on=on, suffixes=('_i', '_j'))
+    pairs = pairs[pairs['row_i'] != pairs['row_j']]
+
+    return pd.DataFrame({
+        'row_i': np.minimum(pairs['row_i'], pairs['row_j']),
+        'row_j': np.maximum(pairs['row_i'], pairs['row_j'])
+    })
+
+
+def candidate_pairs(lat, long, names, urls, countries, precision=4, max_block_size=1000) -> np.ndarray:
+    """
+    Pairs of rows that could be the same park: rows in the same or neighbouring
+    geohash cells, rows linking to the same article, and rows in the same country whose
+    names share a distinctive token, where one of them is missing coordinates. Returns
+    an (m, 2) array of row positions, each pair once with the smaller position first.
+
+    urls, countries: codes of each row's URL (-1 if missing) and country
+    """
+    rows = np.arange(len(names))
+    has_coordinates = ~(np.isnan(lat) | np.isnan(long))
+    pairs = []
+
+    # Spatial blocking: each cell is paired with itself and its 8 neighbours
+    lat_cells, long_cells = geohash_cells(lat[has_coordinates], long[has_coordinates], precision)
+    long_cell_count = 1 << ((5 * precision + 1) // 2)
+    cells = pd.DataFrame({'row': rows[has_coordinates], 'lat_cell': lat_cells, 'long_cell': long_cells})
+    for lat_offset in (-1, 0, 1):
+        for long_offset in (-1, 0, 1):
+            neighbours = cells.assign(
+                lat_cell=cells['lat_cell'] + lat_offset,
+                # Cells wrap around the antimeridian
+                long_cell=(cells['long_cell'] + long_offset) % long_cell_count
+            )
+            pairs.append(_pairs_from_blocks(cells, neighbours, ['lat_cell', 'long_cell']))
+
+    # Article blocking
+    linked = pd.DataFrame({'row': rows, 'url': urls})[urls >= 0]
+    pairs.append(_pairs_from_blocks(linked, linked, ['url']))
+
+    # Name blocking of the parks missing coordinates, within their country
+    tokens = pd.DataFrame({'row': rows, 'country': countries, 'token': [name.split() for name in names]})
+    tokens = tokens.explode('token').dropna(subset=['token']).drop_duplicates()
+    tokens = tokens[tokens['token'].map(is_distinctive_token)]
+    missing = tokens[~has_coordinates[tokens['row'].to_numpy()]]
+    pairs.append(_pairs_from_blocks(missing, tokens, ['country', 'token'], max_block_size))
+
+    pairs = pd.concat(pairs, ignore_index=True).drop_duplicates()
+
+    return pairs.to_numpy(dtype=np.int64).reshape(-1, 2)
+
+
+class UnionFind:
+    """
+    Disjoint sets of row positions, with path halving and union by size.
+    """
+    def __init__(self, n):
+        self.parent = np.arange(n)
+        self.size = np.ones(n, dtype=np.int64)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        if i == j:
+            return
+        if self.size[i] < self.size[j]:
+            i, j = j, i
+        self.parent[j] = i
+        self.size[i] += self.size[j]
+
+    def roots(self) -> np.ndarray:
+        return np.array([self.find(i) for i in range(len(self.parent))], dtype=np.int64)
+
+
+def find_duplicate_parks(df, precision=4, name_threshold=0.7, max_distance_km=15, strict_name_threshold=0.8,
+                         max_block_size=1000) -> pd.DataFrame:
+    """
+    Group the rows of the master table that are the same park, e.g. a park listed under
+    two neighbouring countries or under a title that redirects to the same article.
+    Candidate pairs come from geohash, article and name-token blocks rather than
+    comparing every pair, and are scored all at once. Two rows are the same park if they
+    link to the same article, or their names without generic words are similar (MinHash
+    estimate of trigram Jaccard similarity of at least name_threshold) and they are at
+    most max_distance_km apart. Rows missing coordinates need a name similarity of
+    strict_name_threshold and the same country.
+
+    Spatial blocks only pair rows up to the size of a geohash cell apart (about 20 km at
+    precision 4), so max_distance_km should not be larger.
+
+    Returns the table with a cluster column (rows of the same park share it), the
+    name_similarity and distance_km to the closest match, and is_canonical marking the
+    record kept for each cluster: the first row with coordinates and a URL.
+    """
+    df = df.reset_index(drop=True)
+    lat = df['lat_dec'].to_numpy(dtype=float)
+    long = df['long_dec'].to_numpy(dtype=float)
+    names = [distinctive_name(normalize_park_name(name)) for name in df['national_park_name']]
+
+    # Compare URLs and countries by their codes; missing URLs are coded -1
+    urls = pd.factorize(df['park_url'])[0]
+    countries = pd.factorize(df['country'])[0]
+
+    pairs = candidate_pairs(lat, long, names, urls, countries, precision, max_block_size)
+    logger.info(f"{len(pairs)} candidate pairs among {len(df)} parks")
+
+    i, j = pairs[:, 0], pairs[:, 1]
+    signatures = minhash_signatures(names)
+    similarity = minhash_similarity(signatures, i, j)
+    distance = haversine_km(lat[i], long[i], lat[j], long[j])
+    same_article = (urls[i] == urls[j]) & (urls[i] >= 0)
+    both_located = ~np.isnan(distance)
+
+    duplicate = (
+        same_article
+        | (both_located & (similarity >= name_threshold) & (distance <= max_distance_km))
+        | (~both_located & (similarity >= strict_name_threshold) & (countries[i] == countries[j]))
+    )
+
+    clusters = UnionFind(len(df))
+    for a, b in pairs[duplicate]:
+        clusters.union(a, b)
+    roots = clusters.roots()
+
+    df['cluster'] = pd.factorize(roots)[0]
+    df['name_similarity'] = np.nan
+    df['distance_km'] = np.nan
+    # Closest match of each row
+    matches = pd.DataFrame({
+        'row': np.concatenate([i[duplicate], j[duplicate]]),
+        'name_similarity': np.tile(similarity[duplicate], 2),
+        'distance_km': np.tile(distance[duplicate], 2)
+    }).sort_values(['row', 'name_similarity'], ascending=[True, False]).drop_duplicates('row')
+    df.loc[matches['row'], 'name_similarity'] = matches['name_similarity'].to_numpy()
+    df.loc[matches['row'], 'distance_km'] = matches['distance_km'].to_numpy()
+
+    # Canonical record: prefer rows with coordinates, then with a URL, then the first listed
+    preference = pd.DataFrame({
+        'cluster': df['cluster'],
+        'located': ~np.isnan(lat),
+        'has_url': df['park_url'].notna().to_numpy(),
+        'row': np.arange(len(df))
+    }).sort_values(['cluster', 'located', 'has_url', 'row'], ascending=[True, False, False, True])
+    df['is_canonical'] = False
+    df.loc[preference.drop_duplicates('cluster')['row'], 'is_canonical'] = True
+
+    cluster_sizes = df['cluster'].map(df['cluster'].value_counts())
+    logger.info(f"{(cluster_sizes > 1).sum()} parks are in {df.loc[cluster_sizes > 1, 'cluster'].nunique()} groups of duplicates")
+
+    return df
+
+
+def duplicate_clusters(df_dedup) -> pd.DataFrame:
+    """
+    Rows of find_duplicate_parks that belong to a cluster of more than one, canonical
+    record first, with the countries each park is listed under.
+    """
+    sizes = df_dedup['cluster'].map(df_dedup['cluster'].value_counts())
+    clusters = df_dedup[sizes > 1].copy()
+    clusters['cluster_size'] = sizes[sizes > 1]
+    clusters['countries'] = clusters.groupby('cluster')['country'].transform(
+        lambda countries: '; '.join(sorted(set(countries.astype(str))))
+    )
+
+    return clusters.sort_values(['cluster', 'is_canonical'], ascending=[True, False])
+
+
+def canonical_parks(df_dedup) -> pd.DataFrame:
+    """
+    One record per park: the canonical row of each cluster.
+    """
+    return df_dedup[df_dedup['is_canonical']].drop(columns=['cluster', 'name_similarity', 'distance_km', 'is_canonical'])
+
+
+def write_duplicate_parks(df, path):
+    """
+    Find the duplicate parks in the master table and write their clusters to a CSV
+    file, canonical record first.
+    """
+    clusters = duplicate_clusters(find_duplicate_parks(df))
+    clusters.to_csv(path, encoding='utf-8-sig', index=False)
+    logger.info(f"Wrote {clusters['cluster'].nunique()} groups of duplicate parks to {path}")
@@ -0,0 +1,65 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# A coordinate in degrees minutes seconds (23°17′20″N), degrees and decimal minutes
+# (35°35.5′N) or decimal degrees (23.288889°N, -23.288889), after whitespace is removed.
+# The degree sign may only be left out when nothing but a hemisphere follows.
+DMS_PATTERN = re.compile(
+    r"^(?P<sign>[-+−])?"
+    r"(?P<degrees>\d+(?:\.\d*)?)(?:°|º|(?=[NSEWnsew]?$))"
+    r"(?:(?P<minutes>\d+(?:\.\d*)?)(?:′|'|’))?"
+    r"(?:(?P<seconds>\d+(?:\.\d*)?)(?:″|\"|”|′′|''))?"
+    r"(?P<hemisphere>[NSEWnsew])?$"
+)
+
+
+def dms_to_decimal(values, limit=180, decimals=6):
+    """
+    Convert a column of coordinate strings to degree decimal in one pass. S and W (or a
+    leading minus sign) give negative values. Returns a float64 array of the decimal
+    coordinates, rounded to decimals places, and a boolean array flagging the strings
+    that could not be parsed (NaN in the decimals). Missing values (None/NaN) give NaN
+    but are not flagged.
+
+    limit: largest absolute value allowed, 90 for latitudes and 180 for longitudes
+    """
+    values = pd.Series(values, dtype=object)
+    missing = values.isna().to_numpy()
+    strings = values.astype(str).str.replace(r'\s', '', regex=True)
+
+    parts = strings.str.extract(DMS_PATTERN)
+    degrees = parts['degrees'].astype(float).to_numpy()
+    minutes = parts['minutes'].astype(float).to_numpy()
+    seconds = parts['seconds'].astype(float).to_numpy()
+    sign = parts['sign'].fillna('').to_numpy(dtype=str)
+    hemisphere = parts['hemisphere'].fillna('').str.upper().to_numpy(dtype=str)
+
+    negative_sign = (sign == '-') | (sign == '−')
+    southern_or_western = (hemisphere == 'S') | (hemisphere == 'W')
+
+    # Same order of operations as degrees + minutes / 60 + seconds / 3600 by hand, so
+    # the results match converting one string at a time
+    decimal = degrees + np.nan_to_num(minutes) / 60 + np.nan_to_num(seconds) / 3600
+    decimal = np.where(negative_sign | southern_or_western, -decimal, decimal)
+    decimal = np.round(decimal, decimals)
+
+    invalid = (
+        np.isnan(degrees)
+        # minutes and seconds roll over at 60
+        | (minutes >= 60) | (seconds >= 60)
+        # a sign and a hemisphere could disagree
+        | ((sign != '') & (hemisphere != ''))
+        | (np.abs(decimal) > limit)
+    ) & ~missing
+    decimal[invalid | missing] = np.nan
+
+    if invalid.any():
+        logger.info(f"{invalid.sum()} coordinates could not be converted to degree decimal")
+
+    return decimal, invalid
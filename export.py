@@ -0,0 +1,247 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import fiona
+except ImportError:
+    fiona = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Formats the park table can be exported to: Parquet, or uncompressed Arrow IPC files
+# that can be memory-mapped
+EXPORT_FORMATS = ('parquet', 'arrow')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Exporting to Parquet or Arrow requires pyarrow (pip install pyarrow)")
+
+
+def park_schema():
+    """
+    Arrow schema of the master table: country is dictionary-encoded, the degree decimal
+    coordinates are float64 and the other columns are strings.
+    """
+    return pa.schema([
+        ('country', pa.dictionary(pa.int32(), pa.string())),
+        ('national_park_name', pa.string()),
+        ('park_url', pa.string()),
+        ('lat_dms', pa.string()),
+        ('long_dms', pa.string()),
+        ('lat_dec', pa.float64()),
+        ('long_dec', pa.float64())
+    ])
+
+
+def park_table_to_arrow(df):
+    """
+    Convert the master table to an Arrow table with the park schema. Parks are sorted by
+    country then latitude, so the statistics of each file and row group cover a narrow
+    band of latitudes.
+    """
+    schema = park_schema()
+    df = df.sort_values(['country', 'lat_dec'], na_position='last')
+    df = df.astype({'country': 'category'})[schema.names]
+
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_park_dataset(df, path, file_format='parquet', row_group_size=64 * 1024):
+    """
+    Write the master table to a directory with one partition per country
+    (country=<name>/part-0.parquet, names are URL-encoded), which readers such as
+    pyarrow.dataset, pandas, DuckDB or Polars can filter by country without opening the
+    other files. Parquet files store the min/max of every column per row group, so
+    latitude/longitude bounding-box filters are pushed down too, and a _metadata file
+    collects the statistics of every file so they can be pruned without opening them.
+    Arrow IPC files have no statistics but can be memory-mapped.
+
+    The dataset is written next to path and swapped into place once complete, replacing
+    any previous export, so readers never see a half-written dataset or partitions of
+    countries that are gone.
+
+    path: directory the dataset is written to
+    file_format: 'parquet' or 'arrow'
+    """
+    require_pyarrow()
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {file_format}, expected one of {EXPORT_FORMATS}")
+
+    table = park_table_to_arrow(df)
+    partitioning = ds.partitioning(pa.schema([table.schema.field('country')]), flavor='hive')
+
+    if file_format == 'parquet':
+        dataset_format = ds.ParquetFileFormat()
+        file_options = dataset_format.make_write_options(compression='zstd', write_statistics=True)
+    else:
+        dataset_format = ds.IpcFileFormat()
+        file_options = dataset_format.make_write_options(compression=None)
+
+    # Metadata (row groups and their statistics) of every Parquet file written
+    file_metadata = []
+    def collect_metadata(written_file):
+        if written_file.metadata is not None:
+            written_file.metadata.set_file_path(os.path.relpath(written_file.path, tmp_path))
+            file_metadata.append(written_file.metadata)
+
+    tmp_path = path.rstrip(os.sep) + '.tmp'
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+
+    try:
+        ds.write_dataset(
+            table,
+            tmp_path,
+            format=dataset_format,
+            file_options=file_options,
+            partitioning=partitioning,
+            basename_template='part-{i}.' + ('parquet' if file_format == 'parquet' else 'arrow'),
+            max_rows_per_group=row_group_size,
+            min_rows_per_group=min(row_group_size, 1024),
+            file_visitor=collect_metadata
+        )
+
+        if file_format == 'parquet':
+            # The files hold every column but the partition column
+            file_schema = table.schema.remove(table.schema.get_field_index('country'))
+            pq.write_metadata(file_schema, os.path.join(tmp_path, '_common_metadata'))
+            pq.write_metadata(file_schema, os.path.join(tmp_path, '_metadata'), metadata_collector=file_metadata)
+
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+    except:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    logger.info(f"Exported {table.num_rows} parks of {len(table['country'].unique())} countries to {path} as {file_format}")
+
+
+def read_park_dataset(path, file_format='parquet'):
+    """
+    Open a dataset written by write_park_dataset. Filters on the dataset, e.g.
+    dataset.to_table(filter=(ds.field('country') == 'Canada') & (ds.field('lat_dec') > 60)),
+    only read the partitions and row groups that can match.
+    """
+    require_pyarrow()
+
+    partitioning = ds.HivePartitioning.discover(infer_dictionary=True)
+    dataset_format = 'parquet' if file_format == 'parquet' else 'ipc'
+
+    return ds.dataset(path, format=dataset_format, partitioning=partitioning)
+
+
+#################
+## GeoJSON/FGB ##
+#################
+
+# Park properties written with each feature
+FEATURE_PROPERTIES = ('country', 'national_park_name', 'park_url', 'lat_dms', 'long_dms')
+
+
+def require_fiona():
+    if fiona is None:
+        raise ImportError("Exporting to FlatGeobuf requires fiona (pip install fiona)")
+
+
+def iter_park_features(df, chunk_size=10000):
+    """
+    Yield a GeoJSON point feature for each park with degree decimal coordinates, one
+    at a time, without building the whole collection. The table is converted
+    chunk_size rows at a time. Parks missing coordinates are left out.
+    """
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        lat_dec = chunk['lat_dec'].to_numpy(dtype=float)
+        long_dec = chunk['long_dec'].to_numpy(dtype=float)
+        has_coordinates = ~(np.isnan(lat_dec) | np.isnan(long_dec))
+
+        columns = [chunk[column].astype(object).where(chunk[column].notna(), None).to_numpy()[has_coordinates]
+                   for column in FEATURE_PROPERTIES]
+        for long_value, lat_value, *values in zip(long_dec[has_coordinates], lat_dec[has_coordinates], *columns):
+            yield {
+                'type': 'Feature',
+                # GeoJSON positions are longitude, latitude
+                'geometry': {'type': 'Point', 'coordinates': [float(long_value), float(lat_value)]},
+                'properties': dict(zip(FEATURE_PROPERTIES, values))
+            }
+
+
+def _write_into_place(path, write):
+    """
+    Call write with a temporary path next to path and rename the result into place, so
+    readers never see a half-written file. The temporary file keeps the extension of
+    path, which some drivers pick the format from.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp' + os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_geojson_seq(df, path):
+    """
+    Write the parks with coordinates as newline-delimited GeoJSON: one feature per
+    line, streamed as it is serialized, so memory use does not grow with the number of
+    parks and readers can process the file line by line.
+    """
+    count = 0
+    def write(tmp_path):
+        nonlocal count
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for feature in iter_park_features(df):
+                f.write(json.dumps(feature, ensure_ascii=False))
+                f.write('\n')
+                count += 1
+
+    _write_into_place(path, write)
+    logger.info(f"Exported {count} parks to {path} as newline-delimited GeoJSON")
+
+
+def write_flatgeobuf(df, path, batch_size=1000):
+    """
+    Write the parks with coordinates to a FlatGeobuf file with a packed Hilbert R-tree
+    spatial index, so map clients can read only the features in a bounding box (also
+    with HTTP range requests). Features are handed to the driver in batches of
+    batch_size.
+    """
+    require_fiona()
+
+    schema = {'geometry': 'Point', 'properties': {name: 'str' for name in FEATURE_PROPERTIES}}
+    count = 0
+    def write(tmp_path):
+        nonlocal count
+        # The driver creates the file itself
+        os.remove(tmp_path)
+        with fiona.open(tmp_path, 'w', driver='FlatGeobuf', schema=schema, crs='EPSG:4326', SPATIAL_INDEX='YES') as collection:
+            batch = []
+            for feature in iter_park_features(df):
+                batch.append(feature)
+                if len(batch) >= batch_size:
+                    collection.writerecords(batch)
+                    count += len(batch)
+                    batch = []
+            collection.writerecords(batch)
+            count += len(batch)
+
+    _write_into_place(path, write)
+    logger.info(f"Exported {count} parks to {path} as FlatGeobuf")
@@ -0,0 +1,154 @@
+import json
+import os
+
+import mediawiki
+from national_parks import build_park_url_index, canonicalize_park_url
+from page_cache import _write_atomic
+from park_store import valid_wiki_url
+from transport import get_transport
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class IncrementalCrawl:
+    """
+    State of the previous crawl, used to only fetch and parse the pages that changed
+    since then. The latest revision ID of every country and park article is queried in
+    bulk from the MediaWiki API: a country whose article has the same revision as last
+    time reuses the parks found on it, and a park whose article has the same revision
+    reuses its coordinates. Changed pages are dropped from the page cache so they are
+    fetched again. Only pages that were fetched are saved with their revision: a page
+    that could not be fetched (park_failed with error=True, as an observer of
+    scrape_coordinates) is left out and fetched again next time.
+
+    path: JSON file the state is loaded from and saved to
+    transport: Transport the API is queried through, defaults to the shared transport
+    api_url: URL of the api.php endpoint, e.g. a local stub server when testing
+    """
+    def __init__(self, path, transport=None, api_url=mediawiki.API_URL, batch_size=mediawiki.MAX_TITLES_PER_REQUEST):
+        self.path = path
+        self.transport = transport
+        self.api_url = api_url
+        self.batch_size = batch_size
+
+        # State of the previous run
+        self.countries = {}
+        self.pages = {}
+        # State of this run, saved at the end
+        self._countries = {}
+        self._pages = {}
+        self._url_index = {}
+        self._failed = set()
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.countries = state.get('countries', {})
+            self.pages = state.get('pages', {})
+            logger.info(f"Loaded the previous crawl: {len(self.countries)} countries and {len(self.pages)} park pages")
+
+    def _revisions(self, hrefs) -> dict:
+        """
+        Latest revision ID of each href, None if it is not an article or is missing.
+        """
+        titles = {href: mediawiki.title_from_url(href) for href in hrefs}
+        revisions = mediawiki.fetch_revisions(
+            [title for title in titles.values() if title != None], self.transport, self.api_url, self.batch_size
+        )
+
+        return {href: revisions.get(title) for href, title in titles.items()}
+
+    def _invalidate(self, href):
+        cache = (self.transport or get_transport()).cache
+        if cache is not None:
+            cache.invalidate("https://en.wikipedia.org" + href)
+
+    def unchanged_countries(self, master_dict) -> dict:
+        """
+        Find the countries whose article has not changed since the previous crawl.
+        Returns a dictionary of country -> the parks found on its page last time.
+        """
+        hrefs = {country: master_dict[country]['url'] for country in master_dict
+                 if valid_wiki_url(master_dict[country].get('url'))}
+        revisions = self._revisions(hrefs.values())
+
+        unchanged = {}
+        for country, href in hrefs.items():
+            revision = revisions[href]
+            self._countries[country] = {'url': href, 'revision': revision}
+
+            previous = self.countries.get(country)
+            if revision != None and previous != None and previous['url'] == href and previous['revision'] == revision:
+                unchanged[country] = previous['parks']
+            else:
+                self._invalidate(href)
+
+        logger.info(f"{len(unchanged)} of {len(hrefs)} country pages are unchanged since the previous crawl")
+
+        return unchanged
+
+    def record_country(self, country, parks):
+        """
+        Save the parks found on a country page, before any coordinates are scraped.
+        """
+        if country in self._countries:
+            self._countries[country]['parks'] = {park_name: dict(park) for park_name, park in parks.items()}
+
+    def reuse_coordinates(self, master_dict, resolve_redirects=False) -> dict:
+        """
+        Find the park articles that have not changed since the previous crawl. Returns a
+        dictionary of href -> (lat_dms, long_dms) scraped from each of them last time
+        ((None, None) if it had no coordinates), to pass to scrape_coordinates as
+        completed so they are not fetched again. Pass the resolve_redirects given to
+        scrape_coordinates, so articles are tracked (and dropped from the cache) under
+        the hrefs that are fetched.
+        """
+        url_index = build_park_url_index(master_dict, resolve_redirects, self.transport, self.api_url)
+        revisions = self._revisions(url_index)
+        self._url_index = url_index
+
+        unchanged = {}
+        for href in url_index:
+            revision = revisions[href]
+            self._pages[href] = {'revision': revision}
+
+            previous = self.pages.get(href)
+            if revision == None or previous == None or previous['revision'] != revision:
+                self._invalidate(href)
+                continue
+
+            unchanged[href] = (previous['lat_dms'], previous['long_dms'])
+
+        logger.info(f"{len(unchanged)} of {len(url_index)} park pages are unchanged since the previous crawl")
+
+        return unchanged
+
+    def park_resolved(self, url, lat_dms, long_dms):
+        pass
+
+    def park_failed(self, url, error=False):
+        if error:
+            self._failed.add(url)
+
+    def save(self, master_dict):
+        """
+        Save the revisions seen in this run with the parks and coordinates scraped for
+        them, replacing the state of the previous run. Pages that could not be fetched
+        are not saved.
+        """
+        countries = {country: state for country, state in self._countries.items() if 'parks' in state}
+
+        # Every park linking to an article was given the same coordinates from it
+        pages = {}
+        for href, parks in self._url_index.items():
+            park_dicts = [master_dict[country]['parks'][park] for country, park in parks]
+            # Observers are told about the href each park links to
+            if any(canonicalize_park_url(park_dict['url']) in self._failed for park_dict in park_dicts):
+                continue
+            park_dict = park_dicts[0]
+            pages[href] = {**self._pages[href], 'lat_dms': park_dict.get('lat_dms'), 'long_dms': park_dict.get('long_dms')}
+
+        state = {'countries': countries, 'pages': pages}
+        _write_atomic(self.path, json.dumps(state, ensure_ascii=False).encode('utf-8'))
+        logger.info(f"Saved the crawl state of {len(countries)} countries and {len(pages)} park pages to {self.path}")
@@ -0,0 +1,190 @@
+import json
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+
+import requests
+
+from page_cache import OfflineCacheMiss
+from transport import get_transport
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+WIKIPEDIA_URL = "https://en.wikipedia.org"
+API_URL = "https://en.wikipedia.org/w/api.php"
+
+# The API accepts at most 50 titles per query for clients without the apihighlimits right
+MAX_TITLES_PER_REQUEST = 50
+
+
+def title_from_url(url: str):
+    """
+    Get the article title from a Wikipedia URL or href, e.g. '/wiki/Hoggar_Mountains'
+    gives 'Hoggar Mountains'. Anchors are dropped. Returns None if the URL does not
+    point at an article.
+    """
+    parts = urlsplit(url)
+    if parts.path.startswith('/wiki/'):
+        title = parts.path[len('/wiki/'):]
+    else:
+        title = parse_qs(parts.query).get('title', [None])[0]
+        if title is None:
+            return None
+
+    title = unquote(title).replace('_', ' ').strip()
+    if title == '':
+        return None
+
+    return title
+
+
+def url_from_title(title: str) -> str:
+    """
+    Build the '/wiki/...' href of an article title, encoded the way MediaWiki does.
+    """
+    return '/wiki/' + quote(title.replace(' ', '_'), safe=";@$!*(),/~:")
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def query(params: dict, transport=None, api_url=API_URL, use_cache=True) -> dict:
+    """
+    Run an action=query request against the MediaWiki API, following continuations.
+    Pages from every continuation are merged by title, and the normalized and
+    redirects lists are turned into from -> to dictionaries. With use_cache=False the
+    responses skip the page cache, for answers that must be current, so they cannot be
+    answered offline (OfflineCacheMiss).
+    """
+    transport = transport or get_transport()
+    if not use_cache and transport.offline:
+        raise OfflineCacheMiss(f"{api_url} cannot be queried uncached while offline")
+    params = {'action': 'query', 'format': 'json', 'formatversion': '2', **params}
+
+    result = {'pages': {}, 'normalized': {}, 'redirects': {}}
+    continue_params = {}
+    while True:
+        url = api_url + '?' + urlencode({**params, **continue_params})
+        if use_cache:
+            response = json.loads(transport.fetch_text(url))
+        else:
+            response = transport.get(url).json()
+        if 'error' in response:
+            raise ValueError(f"MediaWiki API error: {response['error'].get('info', response['error'])}")
+
+        response_query = response.get('query', {})
+        for page in response_query.get('pages', []):
+            merged = result['pages'].setdefault(page['title'], {})
+            for key, value in page.items():
+                if isinstance(value, list):
+                    merged.setdefault(key, []).extend(value)
+                else:
+                    merged[key] = value
+        for item in response_query.get('normalized', []):
+            result['normalized'][item['from']] = item['to']
+        for item in response_query.get('redirects', []):
+            result['redirects'][item['from']] = item['to']
+
+        if 'continue' not in response:
+            break
+        continue_params = response['continue']
+
+    return result
+
+
+def resolve_title(title: str, result: dict) -> str:
+    """
+    Follow a requested title through title normalization and redirects to the
+    title of the page the API returned for it.
+    """
+    redirects = result['redirects']
+
+    title = result['normalized'].get(title, title)
+    seen = set()
+    while title in redirects and title not in seen:
+        seen.add(title)
+        title = redirects[title]
+
+    return title
+
+
+def fetch_coordinates(titles: list, transport=None, api_url=API_URL, batch_size=MAX_TITLES_PER_REQUEST) -> dict:
+    """
+    Get the primary coordinates of each title through prop=coordinates, following
+    redirects in bulk. Returns a dictionary of title -> (lat, lon), with None for
+    titles that are missing or have no coordinates. A batch whose request fails (after
+    the transport's retries) or returns an API error is logged and its titles are left
+    out, so one bad batch does not stop the others.
+    """
+    coordinates = {}
+    unique_titles = list(dict.fromkeys(titles))
+
+    for batch in chunked(unique_titles, batch_size):
+        logger.info(f"Querying coordinates for {len(batch)} titles")
+        try:
+            result = query({
+                'prop': 'coordinates',
+                'titles': '|'.join(batch),
+                'redirects': '1',
+                'colimit': 'max'
+            }, transport, api_url)
+        except (requests.RequestException, ValueError, OfflineCacheMiss) as e:
+            logger.info(f"Could not query coordinates for {len(batch)} titles ({e}). Moving to next batch.")
+            continue
+
+        for title in batch:
+            page = result['pages'].get(resolve_title(title, result), {})
+            page_coordinates = [c for c in page.get('coordinates', []) if c.get('globe', 'earth') == 'earth']
+            if len(page_coordinates) > 0:
+                coordinates[title] = (page_coordinates[0]['lat'], page_coordinates[0]['lon'])
+            else:
+                coordinates[title] = None
+
+    return coordinates
+
+
+def resolve_redirects(titles: list, transport=None, api_url=API_URL, batch_size=MAX_TITLES_PER_REQUEST) -> dict:
+    """
+    Resolve each title to the title of the article it redirects to (or to itself if
+    it is not a redirect), 50 titles per request. The titles of a batch whose request
+    fails (after the transport's retries) or returns an API error are logged and
+    resolved to themselves, so one bad batch does not stop the others.
+    """
+    resolved = {}
+    unique_titles = list(dict.fromkeys(titles))
+
+    for batch in chunked(unique_titles, batch_size):
+        logger.info(f"Resolving redirects for {len(batch)} titles")
+        try:
+            result = query({'titles': '|'.join(batch), 'redirects': '1'}, transport, api_url)
+        except (requests.RequestException, ValueError, OfflineCacheMiss) as e:
+            logger.info(f"Could not resolve redirects for {len(batch)} titles ({e}). Moving to next batch.")
+            resolved.update((title, title) for title in batch)
+            continue
+
+        for title in batch:
+            resolved[title] = resolve_title(title, result)
+
+    return resolved
+
+
+def fetch_revisions(titles: list, transport=None, api_url=API_URL, batch_size=MAX_TITLES_PER_REQUEST) -> dict:
+    """
+    Get the ID of the latest revision of each title through prop=info, 50 titles per
+    request and following redirects (a redirect gives the revision of its target),
+    always asking the server rather than the page cache.
+    Returns a dictionary of title -> revision ID, with None for missing titles.
+    """
+    revisions = {}
+    unique_titles = list(dict.fromkeys(titles))
+
+    for batch in chunked(unique_titles, batch_size):
+        logger.info(f"Querying revisions for {len(batch)} titles")
+        result = query({'prop': 'info', 'titles': '|'.join(batch), 'redirects': '1'}, transport, api_url, use_cache=False)
+        for title in batch:
+            page = result['pages'].get(resolve_title(title, result), {})
+            revisions[title] = page.get('lastrevid')
+
+    return revisions
@@ -1,18 +1,52 @@
 import pandas as pd
+import itertools
 import re
 import time
+from collections import ChainMap, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import bs4
+import html
+import bisect
 
-from dms2dec.dms_convert import dms2dec
+from dms import dms_to_decimal
+from park_store import ParkStore, as_park_store, valid_wiki_url
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+import mediawiki
+from page_cache import OfflineCacheMiss
+from transport import get_transport
+
+import contextvars
 import logging 
 logging.basicConfig()
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Name of the task (e.g. a country being scraped on a worker thread) the current code is running for
+_task_name = contextvars.ContextVar('task_name', default=None)
+
+
+class TaskNameFilter(logging.Filter):
+    """
+    Prefix log messages with the name of the task that emitted them, so messages from
+    countries scraped in parallel can be told apart.
+    """
+    def filter(self, record):
+        task_name = _task_name.get()
+        if task_name is not None:
+            record.msg = f"[{task_name}] {record.msg}"
+        return True
+
+
+logger.addFilter(TaskNameFilter())
+
 
 def find_coordinates(soup):
     """
@@ -27,6 +61,188 @@ def find_coordinates(soup):
 
     return lat, long
 
+
+def find_coordinates_in_html(page: str, parser=None):
+    """
+    Given the HTML of a national park page, find the coordinates. With the 'selectolax' 
+    parser the lookup runs on a lexbor tree, which is much faster to build than a 
+    BeautifulSoup one; other parsers go through find_coordinates.
+    """
+    parser = parser or _html_parser
+    if parser == 'selectolax' and LexborHTMLParser != None:
+        tree = LexborHTMLParser(page)
+        lat = tree.css_first('.latitude')
+        long = tree.css_first('.longitude')
+        if lat == None or long == None:
+            return None, None
+
+        return lat.text(), long.text()
+
+    return find_coordinates(BeautifulSoup(page, soup_parser(parser)))
+
+
+# Opening tag of the first element in the geo microformat Wikipedia renders coordinates 
+# with, e.g. <span class="latitude">23°17′20″N</span>
+LATITUDE_TAG = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)[^>]*?\sclass="(?:[^"]*\s)?latitude(?:\s[^"]*)?"[^>]*>')
+LONGITUDE_TAG = re.compile(r'<([a-zA-Z][a-zA-Z0-9]*)[^>]*?\sclass="(?:[^"]*\s)?longitude(?:\s[^"]*)?"[^>]*>')
+COORDINATES_STRAINER = SoupStrainer(class_=['latitude', 'longitude'])
+
+
+def scan_coordinate(page: str, tag_pattern):
+    """
+    Scan raw HTML for the first element matching tag_pattern and return its text. 
+    Returns None if there is no match, or if the element holds nested markup and so 
+    cannot be read without parsing.
+    """
+    match = tag_pattern.search(page)
+    if match == None:
+        return None
+
+    end = page.find('<', match.end())
+    if end == -1 or not page.startswith(f'</{match.group(1)}>', end):
+        return None
+
+    return html.unescape(page[match.end():end])
+
+
+def find_coordinates_fast(page: str, parser=None):
+    """
+    Given the HTML of a national park page, find the coordinates without building a 
+    DOM of the whole article. The raw HTML is scanned for the geo microformat first; 
+    if that misses, only the latitude/longitude elements are parsed (SoupStrainer). 
+    Gives the same results as find_coordinates_in_html.
+    """
+    lat = scan_coordinate(page, LATITUDE_TAG)
+    long = scan_coordinate(page, LONGITUDE_TAG)
+    if lat != None and long != None:
+        return lat, long
+
+    # html5lib does not support parse_only
+    parser = soup_parser(parser)
+    if parser == 'html5lib':
+        parser = 'html.parser'
+    soup = BeautifulSoup(page, parser, parse_only=COORDINATES_STRAINER)
+
+    return find_coordinates(soup)
+
+
+def find_coordinates_streaming(chunks, parser=None):
+    """
+    Given the HTML of a national park page as an iterable of text chunks, stop reading 
+    as soon as both coordinates have been seen. The coordinates sit near the top of the 
+    article, so most of the page is never downloaded. If the page ends without a match, 
+    falls back to find_coordinates_fast on the whole page.
+    """
+    page = ''
+    try:
+        for chunk in chunks:
+            page += chunk
+            lat = scan_coordinate(page, LATITUDE_TAG)
+            long = scan_coordinate(page, LONGITUDE_TAG)
+            if lat != None and long != None:
+                return lat, long
+    finally:
+        # Stops the download if the coordinates were found before the end of the page
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+    return find_coordinates_fast(page, parser)
+
+################
+## Page Index ##
+################
+
+# ID of the header above the national parks section of a country page
+NATIONAL_PARK_ID = re.compile('[Nn]ational_[Pp]arks?')
+
+
+class PageIndex:
+    """
+    The features of a country page the dispatch logic looks for, collected in one 
+    traversal of the page so that every check and find is a lookup instead of a search 
+    of the whole tree.
+
+    container: the 'mw-parser-output' element holding the article
+    national_park_span: first <span> whose ID matches NATIONAL_PARK_ID
+    tables: wikitables in document order
+    lists: <ul> elements in document order
+    """
+    def __init__(self, soup):
+        self.soup = soup
+        self.container = None
+        self.national_park_span = None
+        self.tables = []
+        self.lists = []
+
+        self._ids = {}
+        self._span_ids = {}
+        self._positions = {}
+        self._table_positions = []
+        self._list_positions = []
+
+        for position, tag in enumerate(soup.find_all(True)):
+            self._positions[id(tag)] = position
+            classes = tag.get('class') or []
+            tag_id = tag.get('id')
+
+            if tag_id != None:
+                self._ids.setdefault(tag_id, tag)
+                if tag.name == 'span':
+                    self._span_ids.setdefault(tag_id, tag)
+                    if self.national_park_span == None and NATIONAL_PARK_ID.search(tag_id):
+                        self.national_park_span = tag
+            if self.container == None and 'mw-parser-output' in classes:
+                self.container = tag
+            if tag.name == 'table' and 'wikitable' in classes:
+                self.tables.append(tag)
+                self._table_positions.append(position)
+            elif tag.name == 'ul':
+                self.lists.append(tag)
+                self._list_positions.append(position)
+
+    def find_id(self, element_id):
+        """
+        First element of any kind with the given ID.
+        """
+        return self._ids.get(element_id)
+
+    def find_span_id(self, element_id):
+        """
+        First <span> with the given ID.
+        """
+        return self._span_ids.get(element_id)
+
+    def _next(self, element, elements, positions):
+        # Like element.find_next: the first match after element in document order. The 
+        # soup itself is not part of that order, so nothing comes after it.
+        position = self._positions.get(id(element))
+        if position == None:
+            return None
+        i = bisect.bisect_right(positions, position)
+        if i == len(elements):
+            return None
+
+        return elements[i]
+
+    def next_table(self, element):
+        return self._next(element, self.tables, self._table_positions)
+
+    def next_list(self, element):
+        return self._next(element, self.lists, self._list_positions)
+
+    def first_list_in_container(self):
+        """
+        First <ul> inside the 'mw-parser-output' container, or None.
+        """
+        if self.container == None:
+            return None
+        park_list = self.next_list(self.container)
+        if park_list == None or not any(parent is self.container for parent in park_list.parents):
+            return None
+
+        return park_list
+
+
 ############
 ## Checks ##
 ############
@@ -43,115 +259,117 @@ def lone_nat_park_check(c_dict):
     return check
 
 
-def check_next_national_park_table(soup, country, log_level=logging.INFO) -> bool:
+def check_next_national_park_table(soup, country, log_level=logging.INFO, index=None) -> bool:
     """
-    In the provided soup object, find the next table.
+    In the provided soup object, find the next table. If the PageIndex of the page is 
+    given, it is used instead of searching the page.
     """
-    logger.setLevel(log_level)
-    logger.info(f"Checking to see if a table is found in webpage for {country}...")
+    logger.log(log_level, f"Checking to see if a table is found in webpage for {country}...")
 
-    if soup.find_next('table', class_='wikitable') != None:
-        logger.info(f"Table with National Parks found for {country}.")
+    if find_next_national_park_table(soup, index=index) != None:
+        logger.log(log_level, f"Table with National Parks found for {country}.")
         check = True
     
     else:
-        logger.info(f"No National Park table found for {country}.")
+        logger.log(log_level, f"No National Park table found for {country}.")
         check = False
 
     return check
 
 
-def check_next_national_park_list(soup, country, log_level=logging.INFO) -> bool:
+def check_next_national_park_list(soup, country, log_level=logging.INFO, index=None) -> bool:
     """
     In the provided soup object, find the next table. Return boolean
     """
-    logger.setLevel(log_level)
-    logger.info(f"Checking to see if an unordered list is found in webpage for {country}...")
+    logger.log(log_level, f"Checking to see if an unordered list is found in webpage for {country}...")
 
-    if soup.find_next('ul') != None:
-        logger.info(f"List with National Parks found for {country}.")
+    if find_next_national_park_list(soup, index=index) != None:
+        logger.log(log_level, f"List with National Parks found for {country}.")
         check = True
     
     else:
-        logger.info(f"No National Park list found for {country}.")
+        logger.log(log_level, f"No National Park list found for {country}.")
         check = False
 
     return check
 
 
-def check_country_id(soup, country, log_level=logging.INFO):
+def check_country_id(soup, country, log_level=logging.INFO, index=None):
     """
     If the country is an ID, look for the next list. This is 
     to catch edge cases of African countries that redirect to 
     the National Parks in Africa page. 
     """
-    logger.setLevel(log_level)
-    logger.info(f"Checking to see if an ID containing '{country}' is in the webpage...")
+    logger.log(log_level, f"Checking to see if an ID containing '{country}' is in the webpage...")
     
-    if soup.find('span', id=country) != None:
-        logger.info(f'An ID for {country} was found in the webpage. This webpage may contain multiple countries. Looking for national parks only in {country}')
+    if index != None:
+        country_span = index.find_span_id(country)
+    else:
+        country_span = soup.find('span', id=country)
+
+    if country_span != None:
+        logger.log(log_level, f'An ID for {country} was found in the webpage. This webpage may contain multiple countries. Looking for national parks only in {country}')
         check = True
     else:
-        logger.info(f"An ID for {country} was not found.")
+        logger.log(log_level, f"An ID for {country} was not found.")
         check = False
 
     return check
 
 
-def check_national_park_id(soup, country, log_level=logging.INFO):
+def check_national_park_id(soup, country, log_level=logging.INFO, index=None):
     """
     In the given URL, looker for the national park ID. 
     """
-    logger.setLevel(log_level)
-    logger.info(f"Checking to see if an ID matches a regex pattern for 'National Park' for {country} is in the webpage...")
+    logger.log(log_level, f"Checking to see if an ID matches a regex pattern for 'National Park' for {country} is in the webpage...")
 
-    if soup.find('span', id=re.compile('[Nn]ational_[Pp]arks?')) != None:
-        logger.info(f"National park ID found for {country}")
+    if find_national_park_id(soup, index=index) != None:
+        logger.log(log_level, f"National park ID found for {country}")
         check = True
     else:
-        logger.info(f"National park ID not found for {country}")
+        logger.log(log_level, f"National park ID not found for {country}")
         check = False
     
     return check
 
 
-def check_table(soup, country, log_level=logging.INFO):
-    logger.setLevel(log_level)
-    logger.info(f"Checking to see if there are tables in the webpage")
+def check_table(soup, country, log_level=logging.INFO, index=None):
+    logger.log(log_level, f"Checking to see if there are tables in the webpage")
 
-    if soup.find('table', class_="wikitable"):
-        logger.info(f"A table was found for {country}")
+    if find_lone_table(soup, index=index):
+        logger.log(log_level, f"A table was found for {country}")
         check = True
     else:
-        logger.info(f"A table was not found for {country}")
+        logger.log(log_level, f"A table was not found for {country}")
         check = False
 
     return check
 
 
-def check_list(soup, country, log_level=logging.INFO):
-    logger.setLevel(log_level)
-    logger.info(f"Checking to see if there are unordered lists in the webpage")
+def check_list(soup, country, log_level=logging.INFO, index=None):
+    logger.log(log_level, f"Checking to see if there are unordered lists in the webpage")
 
-    main_container = soup.find(class_='mw-parser-output')
-
-    if main_container.find('ul'):
-        logger.info(f"A list was found for {country}")
+    if find_unordered_list(soup, index=index):
+        logger.log(log_level, f"A list was found for {country}")
         check = True
     else:
-        logger.info(f"A list was not found for {country}")
+        logger.log(log_level, f"A list was not found for {country}")
         check = False
 
     return check
 
 
-def multiple_table_check(soup, log_level=logging.INFO):
-    logger.setLevel(log_level)
-    if len(soup.find_all('table', class_='wikitable')) > 1:
-        logger.info("There are multiple tables at this URL")
+def multiple_table_check(soup, log_level=logging.INFO, index=None):
+    if index != None:
+        tables = index.tables
+    else:
+        tables = soup.find_all('table', class_='wikitable')
+
+    if len(tables) > 1:
+        logger.log(log_level, "There are multiple tables at this URL")
         check = True
     else:
-        logger.info("There is one or less table at this URL")
+        logger.log(log_level, "There is one or less table at this URL")
         check = False
 
     return check
@@ -173,100 +391,63 @@ def scrape_table_coordinates(park_table_row):
     lat_dms = park_table_row.find('span', class_="latitude").text
     long_dms = park_table_row.find('span', class_="longitude").text
 
-    # Convert to decimal
-    lat_dec = round(dms2dec(lat_dms), 6)
-    long_dec = round(dms2dec(long_dms), 6)
-
-    return lat_dms, long_dms, lat_dec, long_dec
+    return lat_dms, long_dms
 
 
 ##################
 ## Find Element ##
 ##################
 
-def find_national_park_id(soup, log_level=logging.INFO):
+def find_national_park_id(soup, log_level=logging.INFO, index=None):
     """
     In the given URL, looker for the national park ID. 
     """
-    logger.setLevel(log_level)
+    if index != None:
+        return index.national_park_span
     
-    nat_park_id = soup.find('span', id=re.compile('[Nn]ational_[Pp]arks?'))
+    nat_park_id = soup.find('span', id=NATIONAL_PARK_ID)
     
     return nat_park_id
 
 
 # Get next national park 
-def find_next_national_park_table(soup, log_level=logging.INFO):
-    logger.setLevel(log_level)
+def find_next_national_park_table(soup, log_level=logging.INFO, index=None):
+    if index != None:
+        return index.next_table(soup)
+
     park_table = soup.find_next('table', class_="wikitable")
     
     return park_table
 
 
-def find_header_element(park_table):
-    if len(park_table.find_next('tr').find_all('td')) > 0:
-        header_element = 'td'
-    else:
-        header_element = 'th'
-    
-    return header_element
-
-
-def find_national_park_name_col(park_table, header_element=['th', 'td']):
+def find_national_park_name_col(park_table):
     """
     Go through the table header, and see if "Name" or "National Park" is in the header. If so, get the column number
     so we can scrape the right column. 
     """
-    name_col = [re.compile('[Nn]ame'), re.compile('[Nn]ational [Pp]arks?'), re.compile('Short name')]
-    
-    # Go through header of table to get column number of name or national park column 
-    for col_num, element in enumerate(park_table.find_next('tr').find_all(header_element)):
-        if any(regex.match(element.text.strip()) for regex in name_col):
-            park_name_col_index = col_num
-            logger.info(f"Found column containing park name in column {park_name_col_index}")
-            break
-        else:
-            # logger.info("Could not find park name column")
-            park_name_col_index = 0
-    
-    return park_name_col_index
-
-        
-def find_park_name_col_element(park_table):
-    """
-    For a given table, figure out if the park name is in a 'td' or a 'th'
-    HTML element. 
-    """
-    # Find first row of data
-    first_row_num = find_first_data_row(park_table)
-    
-    # In first row, determine if the column with the park name is using a th or a td element
-    row = park_table.find_all('tr')[first_row_num]
-    
-    if len(row.find_all('th')) > 0: 
-        park_name_element = 'th'
-    else:
-        park_name_element = 'td'
+    return TableView(park_table).name_col
 
-    return park_name_element
-
-def find_next_national_park_list(soup, log_level=logging.INFO):
+def find_next_national_park_list(soup, log_level=logging.INFO, index=None):
     """
     In the provided soup object, find the next table.
     """
-    logger.setLevel(log_level)
+    if index != None:
+        return index.next_list(soup)
+
     park_list = soup.find_next('ul')
 
     return park_list
 
 
-def find_country_id(soup, country, log_level=logging.INFO):
+def find_country_id(soup, country, log_level=logging.INFO, index=None):
     """
     If the country is an ID, look for the next list. This is 
     to catch edge cases of African countries that redirect to 
     the National Parks in Africa page. 
     """
-    logger.setLevel(log_level)
+    if index != None:
+        return index.find_id(country)
+
     country_id = soup.find(id=country)
 
     return country_id
@@ -302,36 +483,22 @@ def find_invalid_or_missing_park_url(master_dict):
 
 
 def find_first_data_row(table: bs4.element.Tag):
-    # header_element = find_header_element(table)
-    # Get length of header
-    header_row_contents = table.find_all('tr')[0].find_all(['th', 'td'])
-
-    # Len of header 
-    header_row_len = len(header_row_contents)
-    logger.info(f"Header row length: {header_row_len}")
-
-    # Find first row of data
-    for row_num, row in enumerate(table.find_all('tr')[1:], start=1):
-        row_len = len(row.find_all(['th', 'td']))
-        # logger.info(f"Row number: {row_num}    Row length: {row_len}")
-        
-        if header_row_len <= row_len:
-            # logger.info(f"First row of data found in row {row_num}")
-            first_data_row = row_num
-            break
+    return TableView(table).first_data_row
 
-    return first_data_row
 
+def find_lone_table(soup, log_level=logging.INFO, index=None):
+    if index != None:
+        return index.tables[0] if len(index.tables) > 0 else None
 
-def find_lone_table(soup, log_level=logging.INFO):
-    logger.setLevel(log_level)
     park_table = soup.find('table', class_='wikitable')
 
     return park_table
 
 
-def find_unordered_list(soup, log_level=logging.INFO):
-    logger.setLevel(log_level)
+def find_unordered_list(soup, log_level=logging.INFO, index=None):
+    if index != None:
+        return index.first_list_in_container()
+
     main_container = soup.find(class_='mw-parser-output')
     park_list = main_container.find('ul')
 
@@ -339,82 +506,189 @@ def find_unordered_list(soup, log_level=logging.INFO):
 
 
 ############
-## Scrape ##
+## Tables ##
 ############
 
-def scrape_next_national_park_table(park_table):
+# Column headers that hold the park name
+NAME_COL_PATTERNS = [re.compile('[Nn]ame'), re.compile('[Nn]ational [Pp]arks?'), re.compile('Short name')]
+
+
+def span_attribute(cell, attribute):
     """
-    For the given national park table, get the name and URL of each park.
+    Read a rowspan or colspan attribute, treating missing or malformed values as 1.
     """
-    # Find header element, park name element, and the column number where the park name is in 
-    park_name_element = ['td', 'th']
-    park_name_col_index = find_national_park_name_col(park_table)
-    first_row_num = find_first_data_row(park_table)
-    
-    logger.info(f"Park name is in column {park_name_col_index}")
+    match = re.match(r'\s*(\d+)', cell.get(attribute, ''))
+    if match == None or int(match.group(1)) < 1:
+        return 1
 
-    # Go through the park table, get the name and url of each park 
-    # Empty dictionary
+    return min(int(match.group(1)), 1000)
+
+
+class TableView:
+    """
+    Everything the table scrapers need from a wikitable, read in a single pass over its 
+    rows.
+
+    rows: the table's own <tr> elements (not those of nested tables)
+    cells: the <th>/<td> cells of each row, as written in the HTML
+    grid: for each row, the cell covering each column once rowspan and colspan are 
+    expanded, so that a column index means the same column in every row
+    first_data_row: index of the first row, after the first one, that has a <td> cell, 
+    so the <th>-only second row of a two-level header is not taken for data; if no 
+    row has one, the first row at least as long as the header, like 
+    find_first_data_row used to do
+    name_col: column of the first header row holding the park name, 0 if none of its 
+    cells matches NAME_COL_PATTERNS
+    has_name_col: whether a header matched NAME_COL_PATTERNS
+    """
+    def __init__(self, table):
+        self.table = table
+        self.rows = [row for row in table.find_all('tr') if row.find_parent('table') is table]
+        self.cells = [row.find_all(['td', 'th'], recursive=False) for row in self.rows]
+        self.grid = self._build_grid()
+        self.first_data_row = self._find_first_data_row()
+        self.name_col, self.has_name_col = self._find_name_col()
+
+    def _build_grid(self):
+        grid = []
+        # column -> [cell, rows it still covers] for cells spanning down from earlier rows
+        spanning = {}
+
+        for row_cells in self.cells:
+            grid_row = []
+            col = 0
+            for cell in row_cells:
+                while col in spanning:
+                    col = self._place_spanning(grid_row, spanning, col)
+                rowspan = span_attribute(cell, 'rowspan')
+                for _ in range(span_attribute(cell, 'colspan')):
+                    grid_row.append(cell)
+                    if rowspan > 1:
+                        spanning[col] = [cell, rowspan - 1]
+                    col += 1
+            while len(spanning) > 0 and col <= max(spanning):
+                if col in spanning:
+                    col = self._place_spanning(grid_row, spanning, col)
+                else:
+                    grid_row.append(None)
+                    col += 1
+            grid.append(grid_row)
+
+        return grid
+
+    @staticmethod
+    def _place_spanning(grid_row, spanning, col):
+        cell, remaining = spanning[col]
+        grid_row.append(cell)
+        if remaining == 1:
+            del spanning[col]
+        else:
+            spanning[col][1] = remaining - 1
+
+        return col + 1
+
+    def _find_first_data_row(self):
+        if len(self.rows) == 0:
+            return 0
+
+        # Header rows are made of <th> cells only; the first row with a <td> holds data
+        for row_num in range(1, len(self.rows)):
+            if any(cell.name == 'td' for cell in self.cells[row_num]):
+                return row_num
+
+        header_row_len = len(self.cells[0])
+        for row_num in range(1, len(self.rows)):
+            if header_row_len <= len(self.cells[row_num]):
+                return row_num
+
+        return len(self.rows)
+
+    def _find_name_col(self):
+        if len(self.grid) == 0:
+            return 0, False
+
+        # Go through the first header row to get the column number of the name or national park column
+        for col_num, cell in enumerate(self.grid[0]):
+            if cell != None and any(regex.match(cell.text.strip()) for regex in NAME_COL_PATTERNS):
+                logger.info(f"Found column containing park name in column {col_num}")
+                return col_num, True
+
+        return 0, False
+
+    def data_rows(self):
+        """
+        Yield (row, grid_row) for each row of data that has cells of its own.
+        """
+        for row_num in range(self.first_data_row, len(self.rows)):
+            if len(self.cells[row_num]) == 0:
+                logger.info("Row is empty, moving to next row")
+                continue
+            yield self.rows[row_num], self.grid[row_num]
+
+
+def find_park_url(cell):
+    """
+    Get the URL of the park from the first link in the cell that is not an image or 
+    a citation. Returns None if there is no such link.
+    """
+    for item in cell.find_all('a'):
+        href = item.get('href')
+        if href == None:
+            return None
+        if ".jpg" not in href and "cite_note" not in href:
+            return href
+
+    return None
+
+
+def scrape_table_view(view: TableView, require_link=False, require_valid_link=False):
+    """
+    Get the name, URL and (if the table has them) coordinates of each park in a table.
+
+    require_link: skip rows whose park name has no link at all
+    require_valid_link: skip rows whose links are all images or citations
+    """
+    logger.info(f"Park name is in column {view.name_col}")
     parks = {}
 
-    # Iterate through each row
-    for row in park_table.find_all('tr')[first_row_num:]:
-        
-        # logger.info(f"Debugging: Number of columns in row: {len(row.find_all(park_name_element))}")
-        if len(row.find_all(park_name_element)) == 0:
-            logger.info("Row is empty, moving to next row")
+    for row, grid_row in view.data_rows():
+        if view.name_col >= len(grid_row) or grid_row[view.name_col] == None:
+            continue
+        nat_park_name_col = grid_row[view.name_col]
+        park_name = nat_park_name_col.text
+
+        if require_link and nat_park_name_col.find('a') == None:
+            continue
+        park_url = find_park_url(nat_park_name_col)
+        if require_valid_link and park_url == None:
             continue
 
         # Check if coordinates might be in the table
         if coordinates_check(row):
-            lat_dms, long_dms, lat_dec, long_dec = scrape_table_coordinates(row)
+            lat_dms, long_dms = scrape_table_coordinates(row)
         else:
-            lat_dms, long_dms, lat_dec, long_dec = None, None, None, None
+            lat_dms, long_dms = None, None
 
-        # skip header row
-        nat_park_name_col = row.find_all(park_name_element)[park_name_col_index]
-        
-        # get park name
-        park_name = nat_park_name_col.text
-        
-        # get park URL 
-        try:
-            a = nat_park_name_col.find_all('a')
-            if len(a) == 0:
-                park_url = None
-                # If can't find a tag, and therefore can't find the URL, save park_name to dictionary and then move to next park
-                parks[park_name] = {
-                    'url': park_url,
-                    'lat_dms': lat_dms,
-                    'long_dms': long_dms, 
-                    'lat_dec': lat_dec,
-                    'long_dec': long_dec
-                    }
-                continue
-            # a = row.find_next('a')
-            for item in a:
-                if ".jpg" not in item['href'] and "cite_note" not in item['href']:
-                    park_url = item['href']
-                    # logger.info(f"{park_url}") # Debugging
-                    break
-                else:
-                    park_url = None
-                    continue
-        except:
-            logger.info(f"No valid url for national park")
-            park_url = None
-    
         parks[park_name] = {
             'url': park_url,
             'lat_dms': lat_dms,
-            'long_dms': long_dms, 
-            'lat_dec': lat_dec,
-            'long_dec': long_dec
+            'long_dms': long_dms
             }
-    
+
     return parks
 
 
+############
+## Scrape ##
+############
+
+def scrape_next_national_park_table(park_table):
+    """
+    For the given national park table, get the name and URL of each park.
+    """
+    return scrape_table_view(TableView(park_table))
+
+
 def scrape_next_national_park_list(park_list):
     parks = {}
     for li in park_list.find_all('li'):
@@ -432,88 +706,64 @@ def scrape_next_national_park_list(park_list):
     return parks
 
 
-def multiple_table_scrape(soup):
-    # Regex patterns for column names
-    name_col = [re.compile('[Nn]ame'), re.compile('[Nn]ational [Pp]arks?'), re.compile('Short name')]
-    
+def multiple_table_scrape(soup, index=None):
     # Empty dictionary
     parks = {}
 
+    if index != None:
+        tables = index.tables
+    else:
+        tables = soup.find_all('table', class_='wikitable')
+
     # Go through each table and check if its valid
-    for table in soup.find_all('table', class_='wikitable'):
-        # Check table header to see if a column for park name exists; if not, go to next table
-        header_element = ['td', 'th']
+    for table in tables:
+        view = TableView(table)
 
-        header = table.find_next('tr')
-        header_contents = header.find_all(header_element)
-        
-        for content in header_contents:
-            regex_check = False
-            if any(regex.match(content.text.strip()) for regex in name_col):
-                regex_check = True
-                logger.info("Found park name column")
-                break
-        
-        # If the regex check is True, we can go to next table
-        if regex_check == False:
+        # Check table header to see if a column for park name exists; if not, go to next table
+        if not view.has_name_col:
             continue
-        
-        # Get the column number of where the park name is in the table
-        park_name_col_index = find_national_park_name_col(table)
+        logger.info("Found park name column")
 
-        # Get the first row of data
-        first_data_row = find_first_data_row(table)
-                
         # Scrape park name and url
-        for row in table.find_all('tr')[first_data_row:]:
-            
-            # Check if coordinates might be in the table
-            if coordinates_check(row):
-                lat_dms, long_dms, lat_dec, long_dec = scrape_table_coordinates(row)
-            else:
-                lat_dms, long_dms, lat_dec, long_dec = None, None, None, None
-            
-            col = row.find_all(['td', 'th'])[park_name_col_index]
-            park_name = col.text
-            # logger.info(f"Park name: {col.text}")
-                
-            # get park URL 
-            try:
-                a = col.find_all('a')
-                # a = row.find_next('a')
-                for item in a:
-                    if ".jpg" not in item['href'] and "cite_note" not in item['href']:
-                        park_url = item['href']
-                        # logger.info(f"Park URL: {park_url}")
-                        parks[park_name] = {
-                            'url': park_url,
-                            'lat_dms': lat_dms,
-                            'long_dms': long_dms, 
-                            'lat_dec': lat_dec,
-                            'long_dec': long_dec
-                            }
-                        break
-                    else:
-                        park_url = None
-                        logger.info(f"Park URL: {park_url}")
-                        continue
-            except:
-                logger.info(f"No valid url for national park")
-                park_url = None
-                parks[park_name] = {
-                    'url': park_url,
-                    'lat_dms': lat_dms,
-                    'long_dms': long_dms, 
-                    'lat_dec': lat_dec,
-                    'long_dec': long_dec
-                    }
-
-            # parks[park_name] = {'url': park_url}
+        parks.update(scrape_table_view(view, require_link=True, require_valid_link=True))
 
     return parks
 
 
-def scrape_coordinates(master_dict):
+def canonicalize_park_url(sub_url):
+    """
+    Turn a park href into the canonical '/wiki/Title' href of the article it points at: 
+    anchors are dropped, '/w/index.php?title=' links are rewritten, and the first letter 
+    of the title is capitalized since MediaWiki treats it as case-insensitive. Returns 
+    None for red links and hrefs that are not English Wikipedia articles.
+    """
+    if sub_url == None or 'wiki' not in sub_url:
+        return None
+
+    parts = urlsplit(sub_url)
+    if 'redlink=1' in parts.query or 'action=edit' in parts.query:
+        return None
+    if parts.netloc not in ('', 'en.wikipedia.org'):
+        return None
+
+    title = mediawiki.title_from_url(sub_url)
+    if title == None:
+        return None
+    title = title[0].upper() + title[1:]
+
+    return mediawiki.url_from_title(title)
+
+
+def build_park_url_index(master_dict, resolve_redirects=False, transport=None, api_url=mediawiki.API_URL):
+    """
+    Go through the master dictionary and group the parks whose coordinates still need 
+    to be scraped by the article their URL points at, so that each article is fetched 
+    once. Returns a dictionary of canonical park href -> list of (country, park). If 
+    resolve_redirects is True, redirects are resolved in bulk through the MediaWiki 
+    API first (through transport and api_url), so a park linked through a redirect 
+    shares its target's fetch.
+    """
+    url_index = {}
     for country in master_dict:
         c_dict = master_dict[country]
 
@@ -522,7 +772,6 @@ def scrape_coordinates(master_dict):
             logger.info(f"{country} does not have a valid URL. Moving to next country")
             continue
         
-        # Scrape each park URL 
         for park in c_dict['parks']:
             # If coordinates for park already exists, continue 
             if 'lat_dms' in c_dict['parks'][park]:
@@ -530,46 +779,280 @@ def scrape_coordinates(master_dict):
                     logger.info(f"{park} already has coordinates. Moving to next park.")
                     continue
 
-            # If park url is invalid, continue
+            # If park url is invalid or a red link, continue
             sub_url = c_dict['parks'][park]['url']
-            if sub_url == None or 'wiki' not in sub_url:
+            canonical_url = canonicalize_park_url(sub_url)
+            if canonical_url == None:
                 logger.info(f'Park has invalid URL ({sub_url}). Moving to next park.')
                 continue
             
-            park_url = "https://en.wikipedia.org" + c_dict['parks'][park]['url']
+            url_index.setdefault(canonical_url, []).append((country, park))
 
-            logger.info(f'Scraping {park_url}')
-            try:
-                # get coordinates - get both dms and dec
-                soup = create_soup(park_url)
-                lat_dms, long_dms = find_coordinates(soup)
-                
-                if lat_dms != None and long_dms != None:
-                    logger.info(f"Coordinates for {park}: {lat_dms} {long_dms}. Converting to degree decimal.")
-                    lat_dec = round(dms2dec(lat_dms),6)
-                    long_dec = round(dms2dec(long_dms),6)
-                    
-                    # Save coordinates to dictionary
-                    c_dict['parks'][park]['lat_dms'] = lat_dms
-                    c_dict['parks'][park]['long_dms'] = long_dms
-                    c_dict['parks'][park]['lat_dec'] = lat_dec
-                    c_dict['parks'][park]['long_dec'] = long_dec
+    if resolve_redirects:
+        titles = {url: mediawiki.title_from_url(url) for url in url_index}
+        targets = mediawiki.resolve_redirects(list(titles.values()), transport, api_url)
 
-                else:
-                    c_dict['parks'][park]['lat_dms'] = None
-                    c_dict['parks'][park]['long_dms'] = None
-                    c_dict['parks'][park]['lat_dec'] = None
-                    c_dict['parks'][park]['long_dec'] = None
+        resolved_index = {}
+        for url, parks in url_index.items():
+            target_url = mediawiki.url_from_title(targets[titles[url]])
+            resolved_index.setdefault(target_url, []).extend(parks)
+        url_index = resolved_index
 
-            except:
-                logger.info(f"Invalid URL ({park_url}). Moving to next park.")
-                c_dict['parks'][park]['lat_dms'] = None
-                c_dict['parks'][park]['long_dms'] = None
-                c_dict['parks'][park]['lat_dec'] = None
-                c_dict['parks'][park]['long_dec'] = None
-                continue
+    num_parks = sum(len(parks) for parks in url_index.values())
+    logger.info(f"{num_parks} parks need coordinates, pointing at {len(url_index)} distinct articles")
+
+    return url_index
+
+class FetchFailed(tuple):
+    """
+    Result of a park whose page (or API batch) could not be fetched, e.g. after a 
+    network or HTTP error. It unpacks to (None, None) like a page without coordinates, 
+    but is reported to observers as an error, so it is tried again by a resumed or 
+    incremental crawl instead of being saved as a park without coordinates.
+    """
+
+
+FETCH_FAILED = FetchFailed((None, None))
+
+
+def fetch_park_coordinates(park, park_url, mode='fast'):
+    """
+    Scrape the coordinates of a national park from its URL. Return the latitude and 
+    longitude in degree minutes seconds, Nones if the page has no coordinates, or 
+    FETCH_FAILED if it could not be fetched or scraped. mode is 'fast' to only extract 
+    the coordinates (find_coordinates_fast), 'stream' to also stop downloading the page 
+    once they are found, or 'full' to parse the whole page.
+    """
+    logger.info(f'Scraping {park_url}')
+    try:
+        # get coordinates in degree minutes seconds; they are converted to degree decimal 
+        # for the whole table in create_master_table
+        if mode == 'stream':
+            lat_dms, long_dms = find_coordinates_streaming(get_transport().stream_text(park_url))
+        elif mode == 'fast':
+            lat_dms, long_dms = find_coordinates_fast(get_transport().fetch_text(park_url))
+        else:
+            lat_dms, long_dms = find_coordinates_in_html(get_transport().fetch_text(park_url))
         
-        master_dict[country] = c_dict
+        if lat_dms != None and long_dms != None:
+            logger.info(f"Coordinates for {park}: {lat_dms} {long_dms}.")
+
+            return lat_dms, long_dms
+
+        return None, None
+
+    except Exception:
+        # Network and parse errors; KeyboardInterrupt still stops the crawl
+        logger.info(f"Invalid URL ({park_url}). Moving to next park.")
+
+    return FETCH_FAILED
+
+
+def fetch_park_coordinates_concurrently(jobs, max_in_flight, mode='fast'):
+    """
+    Fetch the coordinates for each (country, park, park_url) job on a thread pool of 
+    max_in_flight workers, which share the pooled transport, so at most max_in_flight 
+    park pages are fetched at once. Results are returned in the same order as the jobs.
+    """
+    parks = [park for _, park, _ in jobs]
+    park_urls = [park_url for _, _, park_url in jobs]
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        return list(executor.map(fetch_park_coordinates, parks, park_urls, [mode] * len(jobs)))
+
+
+def format_dms(value: float, positive: str, negative: str) -> str:
+    """
+    Format a coordinate in degree decimal the way Wikipedia writes it in degree 
+    minutes seconds, e.g. 23.288889 with 'N' and 'S' gives 23°17′20″N.
+    """
+    hemisphere = positive if value >= 0 else negative
+    # Four decimals of a second, so converting back to degree decimal gives the value to 
+    # within 1e-7 degrees
+    total_seconds = round(abs(value) * 3600, 4)
+    degrees, remainder = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    seconds = f"{round(seconds, 4):g}"
+
+    return f"{int(degrees)}°{int(minutes)}′{seconds}″{hemisphere}"
+
+
+class HtmlCoordinateBackend:
+    """
+    Get coordinates by scraping the rendered article of each park. Park pages are 
+    fetched one at a time, or concurrently on a thread pool if max_in_flight is 
+    greater than 1. Both give the same results.
+
+    mode: 'fast' to only extract the coordinates from each page, 'stream' to also stop 
+    downloading each page once its coordinates are found, 'full' to parse the whole page
+    """
+    def __init__(self, max_in_flight=1, mode='fast'):
+        self.max_in_flight = max_in_flight
+        self.mode = mode
+
+    def resolve(self, jobs):
+        if self.max_in_flight > 1:
+            logger.info(f"Fetching {len(jobs)} park pages with up to {self.max_in_flight} requests in flight")
+            return fetch_park_coordinates_concurrently(jobs, self.max_in_flight, self.mode)
+
+        return (fetch_park_coordinates(park, park_url, self.mode) for _, park, park_url in jobs)
+
+
+class MediaWikiCoordinateBackend:
+    """
+    Get coordinates from the MediaWiki API (prop=coordinates) for up to 50 parks per 
+    request, following redirects in bulk, instead of downloading every article. The 
+    API returns degree decimal, so the degree minutes seconds are formatted from it.
+
+    transport: Transport the API is queried through, defaults to the shared transport
+    api_url: URL of the api.php endpoint, e.g. a local stub server when testing
+    """
+    def __init__(self, transport=None, api_url=mediawiki.API_URL, batch_size=mediawiki.MAX_TITLES_PER_REQUEST):
+        self.transport = transport
+        self.api_url = api_url
+        self.batch_size = batch_size
+
+    def resolve(self, jobs):
+        titles = [mediawiki.title_from_url(park_url) for _, _, park_url in jobs]
+        coordinates = mediawiki.fetch_coordinates(
+            [title for title in titles if title != None], self.transport, self.api_url, self.batch_size
+        )
+
+        results = []
+        for (_, park, _), title in zip(jobs, titles):
+            if title != None and title not in coordinates:
+                # Its batch could not be queried
+                results.append(FETCH_FAILED)
+                continue
+            if coordinates.get(title) == None:
+                logger.info(f"No coordinates found for {park}")
+                results.append((None, None))
+                continue
+
+            lat_dec, long_dec = coordinates[title]
+            results.append((format_dms(lat_dec, 'N', 'S'), format_dms(long_dec, 'E', 'W')))
+
+        return results
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def resolve_coordinates(parks, backend=None, batch_size=500, resolve_redirects=False, completed=None, observers=()):
+    """
+    Get the coordinates of a stream of (country, park_name, park) parks batch_size parks 
+    at a time, saving them to each park, and yield the parks of each batch in order once 
+    it is resolved. By default park pages are scraped with HtmlCoordinateBackend; any 
+    object with a resolve(jobs) method returning (lat_dms, long_dms) per (country, park, 
+    park_url) job, in order, can be passed as the backend instead; with 
+    resolve_redirects, redirects are resolved through its transport and api_url 
+    attributes if it has them (e.g. MediaWikiCoordinateBackend). Parks that already 
+    have coordinates (e.g. from a table on the country page) or no valid URL are passed 
+    on as they are.
+
+    Each distinct article is resolved once for the whole stream: the result of every 
+    href (and with resolve_redirects, of every redirect target, so hrefs redirecting to 
+    the same article share one fetch) is kept and given to the parks linking to it in 
+    later batches.
+
+    completed: href -> (lat_dms, long_dms) of articles resolved before, e.g. by an 
+    interrupted run or unchanged since the previous crawl, which are not fetched again. 
+    Both hrefs and redirect targets are looked up.
+    observers: told about each park href once, with park_resolved(href, lat_dms, long_dms), 
+    or park_failed(href, error) if no coordinates were found, e.g. so progress can be 
+    checkpointed; error is True if the page could not be fetched (FETCH_FAILED) rather 
+    than having no coordinates. Hrefs found in completed are reported as well, so every 
+    observer hears about the whole crawl.
+    """
+    if backend is None:
+        backend = HtmlCoordinateBackend()
+    if completed is None:
+        completed = {}
+    # Redirects are resolved through the same API as the backend's, if it has one
+    transport = getattr(backend, 'transport', None)
+    api_url = getattr(backend, 'api_url', mediawiki.API_URL)
+
+    # Result of each href reported to the observers, and of each redirect target fetched
+    resolved = {}
+    targets = {} if resolve_redirects else resolved
+
+    def report(href, result):
+        resolved[href] = result
+        for observer in observers:
+            if result[0] != None:
+                observer.park_resolved(href, *result)
+            else:
+                observer.park_failed(href, error=result is FETCH_FAILED)
+
+    for batch in batched(parks, batch_size):
+        # Group the parks that need coordinates by the article they link to
+        url_index = {}
+        for country, park_name, park in batch:
+            if park.get('lat_dms') != None:
+                continue
+            href = canonicalize_park_url(park.get('url'))
+            if href == None:
+                continue
+            if href not in resolved and href in completed:
+                report(href, completed[href])
+            if href in resolved:
+                park['lat_dms'], park['long_dms'] = resolved[href]
+                continue
+            url_index.setdefault(href, []).append((country, park_name, park))
+
+        if resolve_redirects and url_index:
+            titles = {href: mediawiki.title_from_url(href) for href in url_index}
+            redirects = mediawiki.resolve_redirects(list(titles.values()), transport, api_url)
+            fetch_urls = {href: mediawiki.url_from_title(redirects[title]) for href, title in titles.items()}
+        else:
+            fetch_urls = {href: href for href in url_index}
+
+        # Hrefs redirecting to the same article share one fetch
+        articles = {}
+        for href, target in fetch_urls.items():
+            if target not in targets and target in completed:
+                targets[target] = completed[target]
+            if target in targets:
+                report(href, targets[target])
+            else:
+                articles.setdefault(target, []).append(href)
+        jobs = [(url_index[hrefs[0]][0][0], url_index[hrefs[0]][0][1], "https://en.wikipedia.org" + target)
+                for target, hrefs in articles.items()]
+        results = backend.resolve(jobs) if jobs else []
+
+        for (target, hrefs), result in zip(articles.items(), results):
+            targets[target] = result
+            for href in hrefs:
+                report(href, result)
+
+        for href, href_parks in url_index.items():
+            for _, _, park in href_parks:
+                park['lat_dms'], park['long_dms'] = resolved[href]
+
+        yield from batch
+
+
+def scrape_coordinates(master_dict, max_in_flight=1, backend=None, resolve_redirects=False, completed=None,
+                       observers=(), batch_size=500):
+    """
+    Get the coordinates of every park in the master dictionary that does not have them 
+    yet, with resolve_coordinates. Each distinct article is resolved once and its 
+    coordinates are saved to every park that links to it; articles in completed (href -> 
+    (lat_dms, long_dms)) are not fetched again.
+    """
+    if backend is None:
+        backend = HtmlCoordinateBackend(max_in_flight)
+
+    parks = (
+        (country, park_name, park)
+        for country, c_dict in master_dict.items() if valid_wiki_url(c_dict['url'])
+        for park_name, park in c_dict['parks'].items()
+    )
+    for _ in resolve_coordinates(parks, backend, batch_size, resolve_redirects, completed, observers):
+        pass
 
     return master_dict
 
@@ -670,130 +1153,28 @@ def scrape_edge_case_g4(soup):
     return parks
 
 def scrape_edge_case_g5(soup):
-    parks = {}
     main_container = soup.find(class_='mw-parser-output')
     park_table = main_container.find_next('table', class_='wikitable')
 
-    park_name_element = ['td', 'th']
-    park_name_col_index = find_national_park_name_col(park_table)
-    first_row_num = find_first_data_row(park_table)
-    
-    logger.info(f"Park name is in column {park_name_col_index}")
-
-    # Go through the park table, get the name and url of each park 
-    # Empty dictionary
-    parks = {}
-
-    # Iterate through each row
-    for row in park_table.find_all('tr')[first_row_num:]:
-        
-        # logger.info(f"Debugging: Number of columns in row: {len(row.find_all(park_name_element))}")
-        if len(row.find_all(park_name_element)) == 0:
-            logger.info("Row is empty, moving to next row")
-            continue
-
-        # skip header row
-        nat_park_name_col = row.find_all(park_name_element)[park_name_col_index]
-        
-        # get park name
-        park_name = nat_park_name_col.text
-        
-        # get park URL 
-        try:
-            a = nat_park_name_col.find_all('a')
-            if len(a) == 0:
-                continue
-            # a = row.find_next('a')
-            for item in a:
-                if ".jpg" not in item['href'] and "cite_note" not in item['href']:
-                    park_url = item['href']
-                    # logger.info(f"{park_url}") # Debugging
-                    break
-                else:
-                    park_url = None
-                    continue
-        except:
-            logger.info(f"No valid url for national park")
-            park_url = None
-    
-        parks[park_name] = {'url': park_url}
-    
-    return parks
+    return scrape_table_view(TableView(park_table), require_link=True)
 
 def scrape_edge_case_g7(soup):
-    # Empty dictionary
-    parks = {}
-
-    # HTML element for header and row contents
-    header_element = ['td', 'th']
-
-    # Get table
+    # The merged cells in the first column are expanded by TableView, so the park name 
+    # column lines up in every row
     park_table = soup.find('table', class_='wikitable')
 
-    # Get header contents and length
-    header = park_table.find_next('tr')
-    header_contents = header.find_all(header_element)
-    header_length = len(header_contents)
-
-    # Get index for park name column
-    park_name_col_index = find_national_park_name_col(park_table)
-    
-    # Get index for first row of data
-    first_data_row = find_first_data_row(park_table)
-
-    # iterate through rows of data
-    for row in park_table.find_all('tr')[first_data_row:]:
-        row_length = len(row.find_all(['td', 'th']))
-
-        if row_length == 0:
-            continue
-        
-        if row_length == header_length:
-            park_name_index = park_name_col_index
-        else:
-            park_name_index = park_name_col_index - 1
-            # then park name index is same as what it was in header
-            # else, park name index is header_index - 1
-    
-        col = row.find_all(header_element)[park_name_index]
-        park_name = col.text
-        
-        # get park URL 
-        try:
-            a = col.find_all('a')
-            if len(a) == 0:
-                continue
-            # a = row.find_next('a')
-            for item in a:
-                if ".jpg" not in item['href'] and "cite_note" not in item['href']:
-                    park_url = item['href']
-                    # logger.info(f"{park_url}") # Debugging
-                    break
-                else:
-                    park_url = None
-                    continue
-        except:
-            logger.info(f"No valid url for national park")
-            park_url = None
-    
-        parks[park_name] = {'url': park_url}
-
-    return parks
+    return scrape_table_view(TableView(park_table), require_link=True)
 
 def scrape_edge_case_g8(soup, park_url, country):
     parks = {}
     lat_dms, long_dms = find_coordinates(soup)
-    lat_dec = round(dms2dec(lat_dms), 6)
-    long_dec = round(dms2dec(long_dms), 6)
 
     park_name = soup.find('span', class_='mw-page-title-main').text
 
     parks[park_name] = {
         'url': park_url,
         'lat_dms': lat_dms,
-        'long_dms': long_dms,
-        'lat_dec': lat_dec,
-        'long_dec': long_dec
+        'long_dms': long_dms
     }
     
     return parks
@@ -804,55 +1185,54 @@ def scrape_edge_case_g8(soup, park_url, country):
 ####################
 
 def create_master_table(master_dict):
-    headers = ['country', 'national_park_name', 'park_url', 'lat_dms', 'long_dms', 'lat_dec', 'long_dms']
-    table_data = []
-    for country in master_dict:
-        c_dict = master_dict[country]
-
-        parks = c_dict['parks']
-        for park_name in parks:
-            park_dict = parks[park_name]
-
-            try:
-                lat_dms = park_dict['lat_dms']
-            except:
-                lat_dms = None
-
-            try:
-                long_dms = park_dict['long_dms']
-            except:
-                long_dms = None
-
-            try:
-                lat_dec = park_dict['lat_dec']
-            except:
-                lat_dec = None
-
-            try:
-                long_dec = park_dict['long_dec']
-            except:
-                long_dec = None
+    """
+    Build the table of every park in the master dictionary with build_master_table.
+    """
+    return build_master_table(as_park_store(master_dict).park_columns())
 
-            try:
-                park_url = 'https://en.wikipedia.org' + park_dict['url']
-            except:
-                park_url = None
+def build_master_table(columns: dict):
+    """
+    Build a table of parks column by column from lists of their country, 
+    national_park_name, url, lat_dms and long_dms: country is categorical, the names, 
+    URLs and coordinates are string columns (missing values are <NA>), and the degree 
+    decimal coordinates are float64.
+    """
+    df = pd.DataFrame({
+        'country': pd.Categorical(columns['country']),
+        'national_park_name': pd.array(columns['national_park_name'], dtype='string'),
+        # Prefixing a string column leaves missing URLs missing
+        'park_url': 'https://en.wikipedia.org' + pd.array(columns['url'], dtype='string'),
+        'lat_dms': pd.array(columns['lat_dms'], dtype='string'),
+        'long_dms': pd.array(columns['long_dms'], dtype='string')
+    })
+
+    # Convert every coordinate to degree decimal at once; coordinates that cannot be 
+    # parsed are left empty
+    df['lat_dec'], invalid_lat = dms_to_decimal(df['lat_dms'], limit=90)
+    df['long_dec'], invalid_long = dms_to_decimal(df['long_dms'], limit=180)
+    for row in df[invalid_lat | invalid_long].itertuples():
+        logger.info(f"Could not convert the coordinates of {row.national_park_name} ({row.lat_dms} {row.long_dms}) to degree decimal")
 
-            # append data to row
-            row_data = []
-            row_data.append(country)
-            row_data.append(park_name)
-            row_data.append(park_url)
-            row_data.append(lat_dms)
-            row_data.append(long_dms)
-            row_data.append(lat_dec)
-            row_data.append(long_dec)
-            table_data.append(row_data)
+    return df
 
-    df = pd.DataFrame(table_data, columns=headers)
+def clean_master_table_names(df):
+    """
+    Clean the park and country names of the master table.
+    """
+    df["national_park_name"] = clean_park_names(df["national_park_name"])
+    df["country"] = clean_country_names(df["country"])
 
     return df
 
+def write_master_table(df, parks_path, missing_path):
+    """
+    Split the master table with one mask into the parks with coordinates and the parks 
+    missing them, and write each to a CSV file.
+    """
+    has_coordinates = df['lat_dms'].notna().to_numpy()
+    df[has_coordinates].to_csv(parks_path, encoding='utf-8-sig', index=False)
+    df[~has_coordinates].to_csv(missing_path, encoding='utf-8-sig', index=False)
+
 #######################
 ## Completion Checks ##
 #######################
@@ -1019,9 +1399,54 @@ def completion_check(df, master_dict):
 ## Main functions ##
 ####################
 
-def create_soup(url: str):
-    page = requests.get(url).text
-    soup = BeautifulSoup(page, 'html.parser')
+# Parser backends; 'selectolax' is only used for coordinate lookups on park pages
+HTML_PARSERS = ('html.parser', 'lxml', 'html5lib', 'selectolax')
+_html_parser = 'html.parser'
+
+
+def parser_available(parser: str) -> bool:
+    if parser == 'selectolax':
+        return LexborHTMLParser != None
+    try:
+        BeautifulSoup('', parser)
+    except bs4.FeatureNotFound:
+        return False
+
+    return True
+
+
+def set_html_parser(parser: str) -> str:
+    """
+    Select the parser backend used to parse pages. Falls back to html.parser if the 
+    backend is not installed. Returns the parser that was selected.
+    """
+    global _html_parser
+    if parser not in HTML_PARSERS:
+        raise ValueError(f"Unknown parser {parser}. Choose one of {HTML_PARSERS}")
+
+    if not parser_available(parser):
+        logger.info(f"{parser} is not installed. Falling back to html.parser")
+        parser = 'html.parser'
+    _html_parser = parser
+
+    return parser
+
+
+def soup_parser(parser=None) -> str:
+    """
+    BeautifulSoup tree builder for a parser backend. selectolax cannot build soups, so 
+    pages that need one are parsed with html.parser.
+    """
+    parser = parser or _html_parser
+    if parser == 'selectolax':
+        return 'html.parser'
+
+    return parser
+
+
+def create_soup(url: str, parser=None):
+    page = get_transport().fetch_text(url)
+    soup = BeautifulSoup(page, soup_parser(parser))
 
     return soup
 
@@ -1050,7 +1475,8 @@ def create_master_dict(soup, country_names: list):
     Create a dictionary where each country in the main URL is a key. The value 
     for each country will contain information such as the National Park URL for 
     each country, the name of each national park in that country, and the 
-    corresponding URL for that national park
+    corresponding URL for that national park. The dictionary is returned as a 
+    ParkStore, which stores countries and parks as compact records.
     """
 
     master_dict = {}
@@ -1078,286 +1504,374 @@ def create_master_dict(soup, country_names: list):
                 if country not in master_dict:
                         master_dict[country] = country_dict
     
-    return master_dict 
+    return ParkStore(master_dict)
 
 def create_summary_df(master_dict: dict) -> pd.DataFrame:
-    headers = ['country', 'number_of_parks_listed', 'number_of_parks_scraped']
-    table_data = []
-    
-    for country in master_dict:
-        row_data = []
-        c_dict = master_dict[country]
-
-        number_of_parks = c_dict['number_of_parks']
-        num_scraped = c_dict['num_parks_scraped']
-        
-        row_data.append(country)
-        row_data.append(number_of_parks)
-        row_data.append(num_scraped)
-        table_data.append(row_data)
-        
-    df = pd.DataFrame(table_data, columns=headers)
+    # The counts are kept up to date by the store's metrics while the crawl runs
+    df = pd.DataFrame(as_park_store(master_dict).metrics.summary_columns())
     
     # Clean country names
-    clean_country_name_lambda = lambda x: clean_country_name(x)
-    df["country"] = df["country"].apply(clean_country_name_lambda)
+    df["country"] = clean_country_names(df["country"])
     
     return df
 
 
-def get_park_names_and_urls(url):
-    master_soup = create_soup(url)
-    country_names = get_country_names(master_soup)
-    master_dict = create_master_dict(master_soup, country_names)
+# Edge case where there is a "National Park" ID in a header, but there are multiple tables on the page
+EDGE_CASES_G1 = ['Greece', 'Thailand', 'Italy', "People's Republic of China"]
+# No header, there is an unordered list, but its all protected areas - look for just 'National Park'
+EDGE_CASES_G2 = ['Nicaragua', 'United Arab Emirates', 'Saudi Arabia', 'Oman', 'Afghanistan', 'Bhutan', 'Guyana']
+# Edge case where there is a "National Park" ID in a header, but there are multiple lists on the page
+EDGE_CASES_G3 = ['Bahamas']
+# National park header exists, multiple lists exists, but protected areas are also in the lists
+EDGE_CASES_G4 = ['Malaysia', 'Dominican Republic']
+# National park header exists, table is before header instead of after
+EDGE_CASES_G5 = ['South Africa', 'Poland']
+# Multiple countries on the webpage, but parks are organized in table instead of list
+EDGE_CASES_G6 = ['Estonia', 'Latvia', 'Lithuania']
+# Weird table structure - first column consists of merged cells which throws off park_name_col_index, header exists, Moldova potentially could be handled here
+EDGE_CASES_G7 = ['Vietnam']
+# Only one national park and country URL redirects to the national park 
+EDGE_CASES_G8 = ['Malta', 'Portugal', 'Slovenia', 'Switzerland']
 
-    # Edge case where there is a "National Park" ID in a header, but there are multiple tables on the page
-    edge_cases_g1 = ['Greece', 'Thailand', 'Italy', "People's Republic of China"]
-    # No header, there is an unordered list, but its all protected areas - look for just 'National Park'
-    edge_cases_g2 = ['Nicaragua', 'United Arab Emirates', 'Saudi Arabia', 'Oman', 'Afghanistan', 'Bhutan', 'Guyana']
-    # Edge case where there is a "National Park" ID in a header, but there are multiple lists on the page
-    edge_cases_g3 = ['Bahamas']
-    # National park header exists, multiple lists exists, but protected areas are also in the lists
-    edge_cases_g4 = ['Malaysia', 'Dominican Republic']
-    # National park header exists, table is before header instead of after
-    edge_cases_g5 = ['South Africa', 'Poland']
-    # Multiple countries on the webpage, but parks are organized in table instead of list
-    edge_cases_g6 = ['Estonia', 'Latvia', 'Lithuania']
-    # Weird table structure - first column consists of merged cells which throws off park_name_col_index, header exists, Moldova potentially could be handled here
-    edge_cases_g7 = ['Vietnam']
-    # Only one national park and country URL redirects to the national park 
-    edge_cases_g8 = ['Malta', 'Portugal', 'Slovenia', 'Switzerland']
-
-    # DEBUG
-    # counter = 0
 
-    for country in master_dict:
-        c_dict = master_dict[country]
-        logger.info('----------------------------------------------------------------------------------------------------------------')
-        # logger.info("DEBUGGING: New loop iteration")
-        logger.info(f'Getting park names and URLs for {country}...')
 
-        logger.info(f"URL for {country}: {c_dict['url']}")
-        # if invalid url or None, continue
-        if c_dict["url"] == None or 'wiki' not in c_dict['url']:
-            logger.info(f"{country} does not have a valid URL. Moving to next country")
-            c_dict['parks'] = {}
-            continue
-
-        # get URL
-        c_url = "https://en.wikipedia.org" + c_dict['url']
-        soup = create_soup(c_url)
+def scrape_country_parks(soup, country, c_dict, c_url):
+    """
+    Given the soup of a country's webpage, work out how the national parks are laid out 
+    on the page and get the name and URL of each park.
+    """
+    # Some layouts fall through every branch without finding parks
+    parks = {}
 
-        logger.info(f'Scraping {c_url}')
-
-        # If there is only one park:
-        if lone_nat_park_check(c_dict):
-            logger.info(f"Only one park in {country}. Looking for National Park ID.")
-            if country in edge_cases_g8:
-                logger.info(f"{country} is an edge case (Group 8). Scraping logic changing accordingly")
-                parks = scrape_edge_case_g8(soup, c_url, country)
-            else:         
-            # Else, if we can find a header with an ID containing "National park":
-                if check_national_park_id(soup, country):
-                    if country in edge_cases_g5:
-                        logger.info(f"{country} is an edge case (Group 5). Scraping logic changing accordingly")
-                        parks = scrape_edge_case_g5(soup)
-                    else:
-                        nat_park_id = find_national_park_id(soup)
-                        logger.info(f"A header with an ID containing national park has been found for {country}. Looking for the next table or list...")
-            #           If there is a table directly after the National park header:
-                        if check_next_national_park_table(nat_park_id, country):
-                            if country in edge_cases_g1:
-                                logger.info(f"{country} is an edge case (Group 1). Scraping logic changing accordingly")
-                                parks = multiple_table_scrape(soup)
-                            # Get park name and URLs from the table 
-                            else:
-                                park_table = find_next_national_park_table(nat_park_id)
-                                logger.info(f"A national park table for {country} directly after the 'National Park' header has been found. Getting park names and URLs.")
-                                parks = scrape_next_national_park_table(park_table)
-            #           Else, if there is a list directly after the National park list: 
-                        elif check_next_national_park_list(nat_park_id, country):
-                            logger.info(f"No table was found. An unordered list was found instead.")
-                            if country in edge_cases_g4:
-                                logger.info(f"{country} is an edge case (Group 4). Scraping logic changing accordingly")
-                                parks = scrape_edge_case_g4(soup)
-                            elif country in edge_cases_g3:
-                                logger.info(f"{country} is an edge case (Group 3). Scraping logic changing accordingly")
-                                parks = scrape_edge_case_g3(soup)
-                #           Get park name and URLs from the list
-                            else:
-                                park_list = find_next_national_park_list(nat_park_id)
-                                parks = scrape_next_national_park_list(park_list)
-            #       Else, there is no header with an ID containing "National park" and if we can find a table:
+    # Every check and find below looks features up in one pass over the page
+    index = PageIndex(soup)
+
+    # If there is only one park:
+    if lone_nat_park_check(c_dict):
+        logger.info(f"Only one park in {country}. Looking for National Park ID.")
+        if country in EDGE_CASES_G8:
+            logger.info(f"{country} is an edge case (Group 8). Scraping logic changing accordingly")
+            parks = scrape_edge_case_g8(soup, c_url, country)
+        else:         
+        # Else, if we can find a header with an ID containing "National park":
+            if check_national_park_id(soup, country, index=index):
+                if country in EDGE_CASES_G5:
+                    logger.info(f"{country} is an edge case (Group 5). Scraping logic changing accordingly")
+                    parks = scrape_edge_case_g5(soup)
                 else:
-                    logger.info(f"No header with an ID containing national park was found for {country}. Looking for any table in webpage...")
-                    if check_next_national_park_table(soup, country):           
-                        logger.info(f"A table was found in the webpage. Checking if there are multiple tables...")
-        #               If there is more than one valid table:
-                        if multiple_table_check(soup):
-        #                   Get park names and URLs from all the tables
-                            parks = multiple_table_scrape(soup)  
-        #               Else, if there is only one valid table:
+                    nat_park_id = find_national_park_id(soup, index=index)
+                    logger.info(f"A header with an ID containing national park has been found for {country}. Looking for the next table or list...")
+        #           If there is a table directly after the National park header:
+                    if check_next_national_park_table(nat_park_id, country, index=index):
+                        if country in EDGE_CASES_G1:
+                            logger.info(f"{country} is an edge case (Group 1). Scraping logic changing accordingly")
+                            parks = multiple_table_scrape(soup, index=index)
+                        # Get park name and URLs from the table 
                         else:
-        #                   Get park names and URLs from the table
-                            park_table = find_next_national_park_table(soup)
+                            park_table = find_next_national_park_table(nat_park_id, index=index)
+                            logger.info(f"A national park table for {country} directly after the 'National Park' header has been found. Getting park names and URLs.")
                             parks = scrape_next_national_park_table(park_table)
-        #           Else, if can find the first list: - This may not be necessary, could save as None and append country to a list to get data elsewhere 
-                    elif check_next_national_park_list(soup, country):
-                        if country in edge_cases_g2:
-                            logger.info(f"{country} is an edge case (Group 2). Scraping logic changing accordingly")
-                            parks = scrape_edge_case_g2(soup)
-                        # Get park names and URLs from the list 
-                        else:
-                            park_list = find_next_national_park_list(soup)
-                            parks = scrape_next_national_park_list(park_list)
-                    else:
-                        parks = {}
-        
-        # Else, if the country name is an ID
-        elif check_country_id(soup, country):
-            logger.info(f"First elif block for {country}...")
-            logger.info("More than one country. Country ID has been found.")
-            country_header = find_country_id(soup, country)
-            if country in edge_cases_g6:
-                logger.info(f"{country} is an edge case (Group 6). Scraping logic changing accordingly")
-                park_table = find_next_national_park_table(country_header)
-                parks = scrape_next_national_park_table(park_table)
-            elif check_next_national_park_list(country_header, country):
-                    park_list = find_next_national_park_list(country_header)
-                    parks = scrape_next_national_park_list(park_list)
-            else:
-                parks = {}
-        
-        # Else, if there is more than one park, if we can find a header with an ID containing "National park":
-        elif check_national_park_id(soup, country):
-            if country in edge_cases_g5:
-                logger.info(f"{country} is an edge case (Group 5). Scraping logic changing accordingly")
-                parks = scrape_edge_case_g5(soup)
-            elif country in edge_cases_g7:
-                logger.info(f"{country} is an edge case (Group 7). Scraping logic changing accordingly")
-                parks = scrape_edge_case_g7(soup)
-            else:
-                logger.info(f"Second elif block for {country}...")
-                nat_park_id = find_national_park_id(soup)
-                logger.info(f"{country} has more than one national park. A header with an ID containing national park has been found for {country}. Looking for the next table or list.")
-                # logger.info(f"DEBUGGING: Still on same loop iteration for {country}")
-            #   If there is a table directly after the National park header:
-                if check_next_national_park_table(nat_park_id, country):
-                    if country in edge_cases_g1:
-                            logger.info(f"{country} is an edge case (Group 1). Scraping logic changing accordingly")
-                            parks = multiple_table_scrape(soup)
-            # Get park name and URLs from the table 
-                    else:
-                        park_table = find_next_national_park_table(nat_park_id)
-                        logger.info(f'A national park table for {country} has been found. Getting park names and URLs.')
-                        parks = scrape_next_national_park_table(park_table)
-            #       Else, if there is a list directly after the National park list: 
-                elif check_next_national_park_list(nat_park_id, country):
-                        if country in edge_cases_g4:
+        #           Else, if there is a list directly after the National park list: 
+                    elif check_next_national_park_list(nat_park_id, country, index=index):
+                        logger.info(f"No table was found. An unordered list was found instead.")
+                        if country in EDGE_CASES_G4:
                             logger.info(f"{country} is an edge case (Group 4). Scraping logic changing accordingly")
                             parks = scrape_edge_case_g4(soup)
-                        elif country in edge_cases_g3:
+                        elif country in EDGE_CASES_G3:
                             logger.info(f"{country} is an edge case (Group 3). Scraping logic changing accordingly")
                             parks = scrape_edge_case_g3(soup)
-                        # Get park names and URLs from the list 
+            #           Get park name and URLs from the list
                         else:
-                            park_list = find_next_national_park_list(nat_park_id)
+                            park_list = find_next_national_park_list(nat_park_id, index=index)
                             parks = scrape_next_national_park_list(park_list)
+        #       Else, there is no header with an ID containing "National park" and if we can find a table:
+            else:
+                logger.info(f"No header with an ID containing national park was found for {country}. Looking for any table in webpage...")
+                if check_next_national_park_table(soup, country, index=index):           
+                    logger.info(f"A table was found in the webpage. Checking if there are multiple tables...")
+    #               If there is more than one valid table:
+                    if multiple_table_check(soup, index=index):
+    #                   Get park names and URLs from all the tables
+                        parks = multiple_table_scrape(soup, index=index)  
+    #               Else, if there is only one valid table:
+                    else:
+    #                   Get park names and URLs from the table
+                        park_table = find_next_national_park_table(soup, index=index)
+                        parks = scrape_next_national_park_table(park_table)
+    #           Else, if can find the first list: - This may not be necessary, could save as None and append country to a list to get data elsewhere 
+                elif check_next_national_park_list(soup, country, index=index):
+                    if country in EDGE_CASES_G2:
+                        logger.info(f"{country} is an edge case (Group 2). Scraping logic changing accordingly")
+                        parks = scrape_edge_case_g2(soup)
+                    # Get park names and URLs from the list 
+                    else:
+                        park_list = find_next_national_park_list(soup, index=index)
+                        parks = scrape_next_national_park_list(park_list)
                 else:
                     parks = {}
-        # Else, if there is no "National park" ID:
+
+    # Else, if the country name is an ID
+    elif check_country_id(soup, country, index=index):
+        logger.info(f"First elif block for {country}...")
+        logger.info("More than one country. Country ID has been found.")
+        country_header = find_country_id(soup, country, index=index)
+        if country in EDGE_CASES_G6:
+            logger.info(f"{country} is an edge case (Group 6). Scraping logic changing accordingly")
+            park_table = find_next_national_park_table(country_header, index=index)
+            parks = scrape_next_national_park_table(park_table)
+        elif check_next_national_park_list(country_header, country, index=index):
+                park_list = find_next_national_park_list(country_header, index=index)
+                parks = scrape_next_national_park_list(park_list)
+        else:
+            parks = {}
+
+    # Else, if there is more than one park, if we can find a header with an ID containing "National park":
+    elif check_national_park_id(soup, country, index=index):
+        if country in EDGE_CASES_G5:
+            logger.info(f"{country} is an edge case (Group 5). Scraping logic changing accordingly")
+            parks = scrape_edge_case_g5(soup)
+        elif country in EDGE_CASES_G7:
+            logger.info(f"{country} is an edge case (Group 7). Scraping logic changing accordingly")
+            parks = scrape_edge_case_g7(soup)
         else:
-            logger.info(f"Last else block for {country}...")
-            logger.info(f"No national park ID and more than one park for {country}. Trying to find tables in webpage.") 
-        #   If we can find a table:
-            if check_table(soup, country):
-                logger.info(f"Table found for {country}")
-        #       If we can find multiple tables:
-                if multiple_table_check(soup):      
-                    logger.info(f"{country} has multiple tables.")
-        #           Get park names and URLs from the tables
-                    parks = multiple_table_scrape(soup)
-        #       Else, if we only have one table:
+            logger.info(f"Second elif block for {country}...")
+            nat_park_id = find_national_park_id(soup, index=index)
+            logger.info(f"{country} has more than one national park. A header with an ID containing national park has been found for {country}. Looking for the next table or list.")
+            # logger.info(f"DEBUGGING: Still on same loop iteration for {country}")
+        #   If there is a table directly after the National park header:
+            if check_next_national_park_table(nat_park_id, country, index=index):
+                if country in EDGE_CASES_G1:
+                        logger.info(f"{country} is an edge case (Group 1). Scraping logic changing accordingly")
+                        parks = multiple_table_scrape(soup, index=index)
+        # Get park name and URLs from the table 
                 else:
-                    logger.info(f"{country} only has one table.")
-        #           Get park names and URLs from the table 
-                    park_table = find_lone_table(soup)
+                    park_table = find_next_national_park_table(nat_park_id, index=index)
+                    logger.info(f'A national park table for {country} has been found. Getting park names and URLs.')
                     parks = scrape_next_national_park_table(park_table)
-        #   Else, if we can find first list:
-            elif check_list(soup, country):
-                if country in edge_cases_g2:
-                    logger.info(f"{country} is an edge case (Group 2). Scraping logic changing accordingly")
-                    parks = scrape_edge_case_g2(soup)
-                else:       
-                    # Get park names and URLs from the table
-                    park_list = find_unordered_list(soup)
-                    parks = scrape_next_national_park_list(park_list) 
-        #   Else:
+        #       Else, if there is a list directly after the National park list: 
+            elif check_next_national_park_list(nat_park_id, country, index=index):
+                    if country in EDGE_CASES_G4:
+                        logger.info(f"{country} is an edge case (Group 4). Scraping logic changing accordingly")
+                        parks = scrape_edge_case_g4(soup)
+                    elif country in EDGE_CASES_G3:
+                        logger.info(f"{country} is an edge case (Group 3). Scraping logic changing accordingly")
+                        parks = scrape_edge_case_g3(soup)
+                    # Get park names and URLs from the list 
+                    else:
+                        park_list = find_next_national_park_list(nat_park_id, index=index)
+                        parks = scrape_next_national_park_list(park_list)
             else:
-        #       Set the park names and URLs as blank dictionary
-                logger.info("Saving a blank dictionary")
                 parks = {}
-        
-        # Save park urls for the country
-        c_dict['parks'] = parks 
-        master_dict[country] = c_dict
+    # Else, if there is no "National park" ID:
+    else:
+        logger.info(f"Last else block for {country}...")
+        logger.info(f"No national park ID and more than one park for {country}. Trying to find tables in webpage.") 
+    #   If we can find a table:
+        if check_table(soup, country, index=index):
+            logger.info(f"Table found for {country}")
+    #       If we can find multiple tables:
+            if multiple_table_check(soup, index=index):      
+                logger.info(f"{country} has multiple tables.")
+    #           Get park names and URLs from the tables
+                parks = multiple_table_scrape(soup, index=index)
+    #       Else, if we only have one table:
+            else:
+                logger.info(f"{country} only has one table.")
+    #           Get park names and URLs from the table 
+                park_table = find_lone_table(soup, index=index)
+                parks = scrape_next_national_park_table(park_table)
+    #   Else, if we can find first list:
+        elif check_list(soup, country, index=index):
+            if country in EDGE_CASES_G2:
+                logger.info(f"{country} is an edge case (Group 2). Scraping logic changing accordingly")
+                parks = scrape_edge_case_g2(soup)
+            else:       
+                # Get park names and URLs from the table
+                park_list = find_unordered_list(soup, index=index)
+                parks = scrape_next_national_park_list(park_list) 
+    #   Else:
+        else:
+    #       Set the park names and URLs as blank dictionary
+            logger.info("Saving a blank dictionary")
+            parks = {}
+
+    return parks
+
+
+def get_country_parks(country, c_dict):
+    """
+    Fetch the webpage of a country and get the name and URL of each of its national parks.
+    """
+    logger.info('----------------------------------------------------------------------------------------------------------------')
+    logger.info(f'Getting park names and URLs for {country}...')
+
+    logger.info(f"URL for {country}: {c_dict['url']}")
+    # if invalid url or None, there are no parks to get
+    if c_dict["url"] == None or 'wiki' not in c_dict['url']:
+        logger.info(f"{country} does not have a valid URL. Moving to next country")
+        return {}
+
+    # get URL
+    c_url = "https://en.wikipedia.org" + c_dict['url']
+    try:
+        soup = create_soup(c_url)
+    except OfflineCacheMiss:
+        logger.info(f"{c_url} is not in the page cache. Moving to next country")
+        return {}
+
+    logger.info(f'Scraping {c_url}')
+
+    return scrape_country_parks(soup, country, c_dict, c_url)
+
+
+def _get_country_parks_task(country, c_dict):
+    """
+    Run get_country_parks on a worker thread, tagging its log messages with the country.
+    """
+    token = _task_name.set(country)
+    try:
+        return get_country_parks(country, c_dict)
+    finally:
+        _task_name.reset(token)
+
+
+def discover_parks(countries, max_workers=1, completed=None, observers=()):
+    """
+    Scrape the page of each (country, c_dict), yielding (country, c_dict, parks) in 
+    country order as each is done. If max_workers is greater than 1, up to max_workers 
+    pages are fetched and scraped at once on a thread pool, and no more are started 
+    until the first one in order is handed on.
+
+    completed: country -> parks of countries already scraped, e.g. by an interrupted run 
+    or unchanged since the previous crawl, which are not fetched again
+    observers: objects whose country_done(country, parks) is called as each country is 
+    handed on, including the countries in completed
+    """
+    if completed is None:
+        completed = {}
+
+    def done(country, parks):
+        for observer in observers:
+            observer.country_done(country, parks)
+        return parks
+
+    if max_workers <= 1:
+        for country, c_dict in countries:
+            parks = completed[country] if country in completed else get_country_parks(country, c_dict)
+            yield country, c_dict, done(country, parks)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for country, c_dict in countries:
+            if country in completed:
+                in_flight.append((country, c_dict, None))
+            else:
+                in_flight.append((country, c_dict, executor.submit(_get_country_parks_task, country, c_dict)))
+            # Hand on the countries that are done, in order
+            while len(in_flight) > max_workers or (in_flight and in_flight[0][2] is None):
+                country, c_dict, future = in_flight.popleft()
+                yield country, c_dict, done(country, completed[country] if future is None else future.result())
+        while in_flight:
+            country, c_dict, future = in_flight.popleft()
+            yield country, c_dict, done(country, completed[country] if future is None else future.result())
 
-        # Debugging
-        # counter += 1
-        # if counter == 10:
-        #     break
+
+def get_park_names_and_urls(url, max_workers=1, incremental=None, observers=(), completed=None):
+    """
+    Scrape the main URL for the list of countries, then get the names and URLs of the 
+    national parks in each country with discover_parks. If max_workers is greater than 
+    1, countries are fetched and scraped on a thread pool; the results are saved to the 
+    master dictionary in the original country order either way. If an IncrementalCrawl 
+    is given, countries whose page has not changed since the previous crawl reuse the 
+    parks found then.
+
+    completed: dictionary of country -> parks of countries already scraped, e.g. by an 
+    interrupted run, which are not fetched again
+    observers: objects whose country_done(country, parks) is called as each country 
+    page is scraped
+    """
+    master_soup = create_soup(url)
+    country_names = get_country_names(master_soup)
+    master_dict = create_master_dict(master_soup, country_names)
+
+    # Countries already scraped take precedence over unchanged ones
+    known = ChainMap(completed if completed is not None else {})
+    if incremental is not None:
+        known.maps.append(incremental.unchanged_countries(master_dict))
+
+    countries = ((country, master_dict[country]) for country in master_dict)
+    for country, c_dict, parks in discover_parks(countries, max_workers, known, observers):
+        # Save park urls for the country
+        master_dict[country]['parks'] = parks
+        if incremental is not None:
+            incremental.record_country(country, parks)
 
     return master_dict
 
-def main(url):
+def main(url, max_in_flight=1, max_workers=1, coordinate_backend=None, resolve_redirects=False, incremental=None,
+         checkpoint=None, database=None, observers=(), exporters=()):
     main_start = time.time()
     
     # Create master dict with URLs for each national park
     logger.info("GETTING COUNTRY/NATIONAL PARK NAMES AND URLS ###################################################################")
     start = time.time()
-    master_dict = get_park_names_and_urls(url)
+    observers = list(observers)
+    if checkpoint is not None:
+        observers.append(checkpoint)
+        completed_countries = checkpoint.countries
+        completed_parks = checkpoint.parks
+    else:
+        completed_countries = None
+        completed_parks = {}
+    if database is not None:
+        observers.append(database)
+    master_dict = get_park_names_and_urls(url, max_workers, incremental, observers, completed_countries)
     end = time.time()
     logger.info(f"{round(end-start, 2)} seconds to get country/national park names and URLS ######################################################\n")
     
-    # Country URL check
-    logger.info("PERFORMING CHECK - NO COORDINATES DUE TO MISSING URL FOR COUNTRY ###############################################")
-    country_missing_url = find_invalid_or_missing_country_url(master_dict)
-    num_parks_missing_country_url(master_dict, country_missing_url)
-    
-    # Park URL check
-    logger.info("PERFORMING CHECKS - NO COORDINATES DUE TO MISSING URL FOR PARK #################################################")
-    park_missing_url = find_invalid_or_missing_park_url(master_dict)
-    num_parks_missing_park_url(master_dict)
+    # The store keeps running totals as countries, parks and coordinates are added
+    metrics = master_dict.metrics
+
+    # Country and park URL checks
+    logger.info("PERFORMING CHECKS - NO COORDINATES DUE TO MISSING URL FOR COUNTRY OR PARK ######################################")
+    country_missing_url = metrics.countries_missing_url()
+    park_missing_url = metrics.parks_missing_url()
+    metrics.log_missing_urls()
     
     # Get coordinates
     logger.info("SCRAPING NATIONAL PARK URLS TO GET COORDINATES #################################################################")
     start = time.time()
-    scrape_coordinates(master_dict)
+    # Articles whose coordinates are already known from a checkpoint or an unchanged 
+    # article in the previous crawl are not fetched again
+    completed = ChainMap(completed_parks)
+    coordinate_observers = list(observers)
+    if incremental is not None:
+        completed.maps.append(incremental.reuse_coordinates(master_dict, resolve_redirects))
+        coordinate_observers.append(incremental)
+    scrape_coordinates(master_dict, max_in_flight, coordinate_backend, resolve_redirects, completed, coordinate_observers)
+    if checkpoint is not None:
+        checkpoint.flush()
+    if database is not None:
+        database.flush()
     end = time.time()
     logger.info(f"{round(end-start,2)} seconds to get national park coordinates ##########################################################\n")
     
     # Create df and clean names
     logger.info("CREATING MAIN DATA TABLE AND CLEANING UP PARK AND COUNTRY NAMES ################################################")
-    df = create_master_table(master_dict)
-    
-    # Clean country and park names
-    clean_park_name_lambda = lambda x: clean_park_name(x)
-    df["national_park_name"] = df["national_park_name"].apply(clean_park_name_lambda)
-
-    clean_country_name_lambda = lambda x: clean_country_name(x)
-    df["country"] = df["country"].apply(clean_country_name_lambda)
+    df = clean_master_table_names(create_master_table(master_dict))
 
     # Add num_parks_scraped to master_dict
-    master_dict, num_parks_total = num_parks_found(master_dict)
-    logger.info(f"{num_parks_total} parks with coordinates have been found.")
+    for country, num_parks_scraped in metrics.parks_scraped_by_country().items():
+        master_dict[country]['num_parks_scraped'] = num_parks_scraped
+    logger.info(f"{metrics.parks_scraped} parks with coordinates have been found.")
     
     # Create a summary table
     df_summary = create_summary_df(master_dict)
-    df_summary['country'] = df_summary['country'].apply(clean_country_name_lambda)
 
     # completion checks
-    incomplete_countries, potentially_complete_countries, too_many_scraped, not_enough_scraped, error_list = country_completion_check(master_dict, 105, 50)
-    completion_check(df, master_dict)
+    incomplete_countries, potentially_complete_countries, too_many_scraped, not_enough_scraped, error_list = metrics.country_completion(105, 50)
+    metrics.log_completion()
     
     check_dict = {
         "country_missing_url": country_missing_url,
@@ -1373,11 +1887,14 @@ def main(url):
     logger.info(f"{round(main_end-main_start,2)} seconds to complete main function ##########################################################")
 
     # Write dataframes to file
-    df_final = df[~df['lat_dms'].isna()]
-    df_final.to_csv("data/national_parks.csv", encoding='utf-8-sig', index=False)
+    write_master_table(df, "data/national_parks.csv", "data/missing_coordinates.csv")
+    if database is not None:
+        database.sync(master_dict, df_summary)
+    for exporter in exporters:
+        exporter(df)
 
-    df_missing = df[df['lat_dms'].isna()]
-    df_missing.to_csv("data/missing_coordinates.csv", encoding='utf-8-sig', index=False)
+    if incremental is not None:
+        incremental.save(master_dict)
 
     df_summary.to_csv("data/summary_table.csv", encoding='utf-8-sig', index=False)
     
@@ -1389,33 +1906,92 @@ def main(url):
 ## DataFrame Cleaning ##
 ########################
 
+# Ordered rules applied to park names. Each rule is (pattern, replacement, regex); the
+# order matters, since most rules cut off everything after a match and a rule can only
+# see the text earlier rules left behind. Rules are only merged into one alternation
+# where they commute, i.e. the dagger and asterisk rules, which each delete single characters.
+PARK_NAME_RULES = [
+    (re.compile(r"[\[].+[\]]"), "", True), # remove square brackets
+    (re.compile("[(].+[)]"), "", True), # remove round brackets
+    ("\xa0", " ", False), # replace xa0 with space
+    ("\n", "", False), # remove new lines
+    (re.compile("established.+"), "", True), # remove text about park established dates
+    (re.compile("gazetted.+"), "", True), # remove text after gazetted
+    (re.compile(r" (—|-|–) .+"), "", True), # remove text after the park name that is separated with a dash
+    (re.compile(", .+"), "", True), # remove text after the park name that is separated by comma
+    (re.compile("  .+"), "", True), # remove text separated by double spaces
+    (re.compile("[‡†*]"), "", True), # remove dagger characters and asterisks
+    (re.compile("^Source [0-9]: "), "", True), # Edge case
+    (re.compile("Εθνικός.+"), "", True), # Remove specific Greek characters
+    (re.compile("Εθνικό.+"), "", True), # Remove specific Greek characters
+    (re.compile("[가-힣].+"), "", True), # Remove Korean characters
+    (re.compile(r"\.\s[0-9].+"), " ", True), # Edge case, period followed by date and area (size)
+    (re.compile(' in .+'), "", True), # Removing text that provides regional context about national park
+    (re.compile(r'\. Lagoon .+'), "", True), # Special case for Uruguay
+    (re.compile(r'\. Semi-freshwater .+'), "", True), # Special case for Uruguay
+    (re.compile(r'\. Includes .+'), "", True), # Special case for Uruguay
+]
+
+COUNTRY_NAME_RULES = [
+    (re.compile(r"[\[].+[\]]"), "", True),
+]
+
+# Names that have already been cleaned, shared by every call of clean_park_names. Once
+# a memo would hold more than NAME_MEMO_SIZE names it is cleared and starts over.
+NAME_MEMO_SIZE = 100_000
+_park_name_memo = {}
+_country_name_memo = {}
+
+
+def apply_name_rules(name: str, rules: list) -> str:
+    for pattern, replacement, regex in rules:
+        if regex:
+            name = pattern.sub(replacement, name)
+        else:
+            name = name.replace(pattern, replacement)
+
+    return name.strip() # Remove leading and trailing whitespaces
+
+
+def apply_name_rules_vectorized(names: pd.Series, rules: list, memo: dict) -> pd.Series:
+    """
+    Clean a column of names with vectorized Series.str operations. Each distinct name 
+    is only cleaned once: names already in the memo are looked up, and the rules run 
+    over the distinct new names only. The memo is cleared rather than grown past 
+    NAME_MEMO_SIZE names, and only as many new names as fit are added to it.
+    """
+    distinct_names = pd.unique(names.dropna())
+    if len(memo) + len(distinct_names) > NAME_MEMO_SIZE:
+        memo.clear()
+    lookup = {name: memo[name] for name in distinct_names if name in memo}
+    new_names = pd.Series([name for name in distinct_names if name not in lookup], dtype=object)
+    if len(new_names) > 0:
+        cleaned = new_names
+        for pattern, replacement, regex in rules:
+            cleaned = cleaned.str.replace(pattern, replacement, regex=regex)
+        new_lookup = dict(zip(new_names, cleaned.str.strip()))
+        lookup.update(new_lookup)
+        memo.update(itertools.islice(new_lookup.items(), max(0, NAME_MEMO_SIZE - len(memo))))
+
+    # map keeps categorical columns categorical, but turns string columns into objects
+    cleaned_names = names.map(lookup)
+    if not isinstance(names.dtype, pd.CategoricalDtype):
+        cleaned_names = cleaned_names.astype(names.dtype)
+
+    return cleaned_names
+
+
 def clean_park_name(park_name):
-    park_name = re.sub("[\[].+[\]]", "", park_name) # remove square brackets
-    park_name = re.sub("[(].+[)]", "", park_name) # remove round brackets
-    park_name = re.sub(r"\xa0", " ", park_name) # replace xa0 with space
-    park_name = re.sub(r"\n", "", park_name) # remove new lines
-    park_name = re.sub("established.+", "", park_name) # remove text about park established dates
-    park_name = re.sub("gazetted.+", "", park_name) # remove text after gazetted
-    park_name = re.sub(r" (—|-|–) .+", "", park_name) # remove text after the park name that is separated with a dash
-    park_name = re.sub(", .+", "", park_name) # remove text after the park name that is separated by comma
-    park_name = re.sub("  .+", "", park_name) # remove text separated by double spaces
-    park_name = re.sub("‡|†", "", park_name) # remove dagger characters
-    park_name = re.sub("\*", "", park_name) # remove asterisks
-    park_name = re.sub("^Source [0-9]: ", "", park_name) # Edge case
-    park_name = re.sub("Εθνικός.+", "", park_name) # Remove specific Greek characters
-    park_name = re.sub("Εθνικό.+", "", park_name) # Remove specific Greek characters
-    park_name = re.sub("[가-힣].+", "", park_name) # Remove Korean characters
-    park_name = re.sub("\.\s[0-9].+", " ", park_name) # Edge case, period followed by date and area (size)
-    park_name = re.sub(' in .+', "", park_name) # Removing text that provides regional context about national park
-    park_name = re.sub('\. Lagoon .+', "", park_name) # Special case for Uruguay
-    park_name = re.sub('\. Semi-freshwater .+', "", park_name) # Special case for Uruguay
-    park_name = re.sub('\. Includes .+', "", park_name) # Special case for Uruguay
-    park_name = park_name.strip() # Remove leading and trailing whitespaces
-    
-    return park_name
+    return apply_name_rules(park_name, PARK_NAME_RULES)
+
 
 def clean_country_name(country_name):
-    country_name = re.sub("[\[].+[\]]", "", country_name)
-    country_name = country_name.strip() # Remove leading and trailing whitespaces
+    return apply_name_rules(country_name, COUNTRY_NAME_RULES)
+
+
+def clean_park_names(park_names: pd.Series) -> pd.Series:
+    return apply_name_rules_vectorized(park_names, PARK_NAME_RULES, _park_name_memo)
+
 
-    return country_name
\ No newline at end of file
+def clean_country_names(country_names: pd.Series) -> pd.Series:
+    return apply_name_rules_vectorized(country_names, COUNTRY_NAME_RULES, _country_name_memo)
\ No newline at end of file
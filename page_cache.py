@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class OfflineCacheMiss(LookupError):
+    """
+    Raised when the scraper is running offline and a page is not in the cache.
+    """
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL so that equivalent spellings of the same page share a cache
+    entry: lowercase scheme and host, drop the fragment, use one percent-encoding
+    for the path and sort the query parameters.
+    """
+    parts = urlsplit(url)
+    path = quote(unquote(parts.path), safe="/:@!$&'()*+,;=-._~") or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ''))
+
+
+def _write_atomic(path, data: bytes):
+    """
+    Write to a temporary file in the same directory and rename it into place, so
+    a crash never leaves a half-written cache file behind.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except:
+        os.remove(tmp_path)
+        raise
+
+
+class PageCache:
+    """
+    On-disk cache of fetched pages.
+
+    Bodies are stored zlib-compressed under the SHA-256 of their content, so pages
+    reached through several URLs (e.g. redirects) are stored once. Each normalized
+    URL has a small JSON entry pointing at its body along with the ETag and
+    Last-Modified headers used to revalidate it.
+
+    max_age: seconds an entry is served without asking the server if it changed;
+    older entries are revalidated with a conditional GET
+    ttl: seconds after which an entry is removed by evict, None to keep entries forever
+    max_bytes: upper bound on the compressed size of all bodies; least recently
+    used entries are evicted first. Reads are saved to the entries by flush (and
+    evict), so the order carries over to later runs.
+    """
+    def __init__(self, cache_dir, max_age=7 * 24 * 3600, ttl=30 * 24 * 3600, max_bytes=2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self.index_dir = os.path.join(cache_dir, 'index')
+        self.objects_dir = os.path.join(cache_dir, 'objects')
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._object_sizes = {}
+        self._object_refs = {}
+        self._total_bytes = 0
+        # Entries read since their last_used was last saved
+        self._used = set()
+        self._load()
+
+    def _entry_path(self, key):
+        return os.path.join(self.index_dir, key + '.json')
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest + '.z')
+
+    def _load(self):
+        for file_name in os.listdir(self.index_dir):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.index_dir, file_name), encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                logger.info(f"Skipping unreadable cache entry {file_name}")
+                continue
+            self._entries[file_name[:-len('.json')]] = entry
+            self._object_refs[entry['digest']] = self._object_refs.get(entry['digest'], 0) + 1
+
+        for file_name in os.listdir(self.objects_dir):
+            if file_name.endswith('.z'):
+                digest = file_name[:-len('.z')]
+                self._object_sizes[digest] = os.path.getsize(self._object_path(digest))
+                self._total_bytes += self._object_sizes[digest]
+
+        # Entries whose body went missing, and bodies no entry points at
+        for key, entry in list(self._entries.items()):
+            if entry['digest'] not in self._object_sizes:
+                self._remove_entry(key)
+        for digest in list(self._object_sizes):
+            if digest not in self._object_refs:
+                self._remove_object(digest)
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode('utf-8')).hexdigest()
+
+    def get(self, url: str):
+        """
+        Return the cache entry for a URL, or None if it is missing. Entries past the
+        TTL are returned as well, so they can still be revalidated with their ETag and
+        Last-Modified, or served offline; only evict removes them.
+        """
+        key = self.key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry['last_used'] = time.time()
+            self._used.add(key)
+
+        return entry
+
+    def read_body(self, entry) -> str:
+        with open(self._object_path(entry['digest']), 'rb') as f:
+            return zlib.decompress(f.read()).decode('utf-8')
+
+    def put(self, url: str, body: str, etag=None, last_modified=None):
+        raw = body.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        key = self.key(url)
+        now = time.time()
+        entry = {
+            'url': normalize_url(url),
+            'digest': digest,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': now,
+            'last_used': now
+        }
+
+        with self._lock:
+            if digest not in self._object_sizes:
+                compressed = zlib.compress(raw, 6)
+                _write_atomic(self._object_path(digest), compressed)
+                self._object_sizes[digest] = len(compressed)
+                self._total_bytes += len(compressed)
+            _write_atomic(self._entry_path(key), json.dumps(entry).encode('utf-8'))
+
+            # Point the URL at the new body before releasing the old one
+            self._object_refs[digest] = self._object_refs.get(digest, 0) + 1
+            old_entry = self._entries.get(key)
+            self._entries[key] = entry
+            if old_entry is not None:
+                self._release_object(old_entry['digest'])
+            self._evict_over_size()
+
+    def touch(self, url: str, etag=None, last_modified=None):
+        """
+        Mark an entry as fresh after the server confirmed it is unchanged (304).
+        """
+        key = self.key(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry['stored_at'] = time.time()
+            entry['etag'] = etag or entry['etag']
+            entry['last_modified'] = last_modified or entry['last_modified']
+            _write_atomic(self._entry_path(key), json.dumps(entry).encode('utf-8'))
+
+    def invalidate(self, url: str):
+        """
+        Drop the entry for a URL, e.g. when the page is known to have changed, so that
+        the next fetch goes to the server.
+        """
+        key = self.key(url)
+        with self._lock:
+            if key in self._entries:
+                self._remove_entry(key)
+
+    def is_fresh(self, entry) -> bool:
+        return self.max_age is not None and time.time() - entry['stored_at'] <= self.max_age
+
+    def _expired(self, entry) -> bool:
+        return self.ttl is not None and time.time() - entry['stored_at'] > self.ttl
+
+    def _remove_object(self, digest):
+        self._object_refs.pop(digest, None)
+        self._total_bytes -= self._object_sizes.pop(digest, 0)
+        try:
+            os.remove(self._object_path(digest))
+        except FileNotFoundError:
+            pass
+
+    def _release_object(self, digest):
+        self._object_refs[digest] = self._object_refs.get(digest, 0) - 1
+        if self._object_refs[digest] <= 0:
+            self._remove_object(digest)
+
+    def _remove_entry(self, key):
+        self._used.discard(key)
+        entry = self._entries.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except FileNotFoundError:
+            pass
+        if entry is not None and entry['digest'] in self._object_refs:
+            self._release_object(entry['digest'])
+
+    def _evict_over_size(self):
+        if self.max_bytes is None or self._total_bytes <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until the bodies fit within max_bytes
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1]['last_used']):
+            self._remove_entry(key)
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def _flush(self):
+        for key in self._used:
+            _write_atomic(self._entry_path(key), json.dumps(self._entries[key]).encode('utf-8'))
+        self._used = set()
+
+    def flush(self):
+        """
+        Save the last use of the entries read since the last flush, in one go rather
+        than on every read.
+        """
+        with self._lock:
+            self._flush()
+
+    def evict(self):
+        """
+        Save the entries read since the last flush, then remove expired entries and
+        least recently used entries over max_bytes.
+        """
+        with self._lock:
+            self._flush()
+            for key, entry in list(self._entries.items()):
+                if self._expired(entry):
+                    self._remove_entry(key)
+            self._evict_over_size()
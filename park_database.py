@@ -0,0 +1,350 @@
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import pandas as pd
+
+from dms import dms_to_decimal
+from national_parks import canonicalize_park_url, clean_country_name, clean_park_name, clean_park_names
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS countries (
+    country TEXT PRIMARY KEY,
+    number_of_parks_listed INTEGER,
+    number_of_parks_scraped INTEGER
+);
+
+-- Parks are keyed by their country and the name they are listed under on the country
+-- page; cleaned names are not unique within a country
+CREATE TABLE IF NOT EXISTS parks (
+    id INTEGER PRIMARY KEY,
+    country TEXT NOT NULL,
+    listed_name TEXT NOT NULL,
+    national_park_name TEXT,
+    normalized_name TEXT,
+    park_url TEXT,
+    href TEXT,
+    lat_dms TEXT,
+    long_dms TEXT,
+    lat_dec REAL,
+    long_dec REAL,
+    UNIQUE (country, listed_name)
+);
+
+CREATE TABLE IF NOT EXISTS missing_parks (
+    id INTEGER PRIMARY KEY,
+    country TEXT NOT NULL,
+    listed_name TEXT NOT NULL,
+    national_park_name TEXT,
+    normalized_name TEXT,
+    park_url TEXT,
+    href TEXT,
+    UNIQUE (country, listed_name)
+);
+
+CREATE INDEX IF NOT EXISTS parks_country ON parks (country);
+CREATE INDEX IF NOT EXISTS parks_normalized_name ON parks (normalized_name);
+CREATE INDEX IF NOT EXISTS parks_href ON parks (href);
+CREATE INDEX IF NOT EXISTS missing_parks_country ON missing_parks (country);
+CREATE INDEX IF NOT EXISTS missing_parks_normalized_name ON missing_parks (normalized_name);
+CREATE INDEX IF NOT EXISTS missing_parks_href ON missing_parks (href);
+
+-- Bounding boxes of the parks with degree decimal coordinates, kept up to date by triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS parks_rtree USING rtree (id, min_lat, max_lat, min_long, max_long);
+
+CREATE TRIGGER IF NOT EXISTS parks_rtree_insert AFTER INSERT ON parks WHEN new.lat_dec IS NOT NULL AND new.long_dec IS NOT NULL
+BEGIN
+    INSERT OR REPLACE INTO parks_rtree VALUES (new.id, new.lat_dec, new.lat_dec, new.long_dec, new.long_dec);
+END;
+
+CREATE TRIGGER IF NOT EXISTS parks_rtree_update AFTER UPDATE OF lat_dec, long_dec ON parks
+BEGIN
+    DELETE FROM parks_rtree WHERE id = old.id;
+    INSERT INTO parks_rtree SELECT new.id, new.lat_dec, new.lat_dec, new.long_dec, new.long_dec
+    WHERE new.lat_dec IS NOT NULL AND new.long_dec IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS parks_rtree_delete AFTER DELETE ON parks
+BEGIN
+    DELETE FROM parks_rtree WHERE id = old.id;
+END;
+"""
+
+PARK_COLUMNS = ('country', 'listed_name', 'national_park_name', 'normalized_name', 'park_url', 'href')
+COORDINATE_COLUMNS = ('lat_dms', 'long_dms', 'lat_dec', 'long_dec')
+
+
+def _upsert(table, columns):
+    """
+    Insert or update a row keyed by (country, listed_name). Rows that have not changed
+    are left alone, so rewriting the same data does not touch the database.
+    """
+    values = [column for column in columns if column not in ('country', 'listed_name')]
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT (country, listed_name) DO UPDATE SET {', '.join(f'{column} = excluded.{column}' for column in values)} "
+        f"WHERE ({', '.join(values)}) IS NOT ({', '.join(f'excluded.{column}' for column in values)})"
+    )
+
+UPSERT_PARK = _upsert('parks', PARK_COLUMNS + COORDINATE_COLUMNS)
+UPSERT_MISSING_PARK = _upsert('missing_parks', PARK_COLUMNS)
+UPSERT_COUNTRY = (
+    "INSERT INTO countries (country, number_of_parks_listed, number_of_parks_scraped) VALUES (?, ?, ?) "
+    "ON CONFLICT (country) DO UPDATE SET number_of_parks_listed = excluded.number_of_parks_listed, "
+    "number_of_parks_scraped = excluded.number_of_parks_scraped "
+    "WHERE (number_of_parks_listed, number_of_parks_scraped) IS NOT (excluded.number_of_parks_listed, excluded.number_of_parks_scraped)"
+)
+
+
+def normalize_name(name):
+    """
+    Name used to look parks up: accents are removed, case is folded and whitespace is
+    collapsed, so 'Parque Nacional Los Glaciares' matches 'parque nacional los glaciares'.
+    """
+    if name == None:
+        return None
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(character for character in decomposed if not unicodedata.combining(character))
+
+    return ' '.join(stripped.casefold().split())
+
+
+class ParkDatabase:
+    """
+    SQLite copy of the scraped data that is kept up to date while the crawl runs, with
+    tables of countries (the fields of summary_table.csv), parks with coordinates and
+    parks missing them. Parks are indexed by country, normalized name and article, and
+    their coordinates by an R*Tree (parks_rtree), e.g.
+
+        SELECT parks.* FROM parks JOIN parks_rtree USING (id)
+        WHERE min_lat >= 45 AND max_lat <= 50 AND min_long >= -125 AND max_long <= -115
+
+    Pass it to main as the database: it is told about progress through the crawl
+    observer methods (country_done, park_resolved, park_failed), and updates are written
+    in batched transactions every batch_size updates or flush_interval seconds, so the
+    database can be queried (in WAL mode) during the run. Rows are upserted and only
+    rewritten when they changed, so a rerun only touches the parks that changed. Once
+    the crawl is done, sync brings every table in line with the final results (or
+    sync_summary the countries, after stream_main).
+
+    path: file of the database, created if it does not exist
+    """
+    def __init__(self, path, batch_size=500, flush_interval=5.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.execute("PRAGMA synchronous = NORMAL")
+        self._connection.executescript(SCHEMA)
+
+        # Updates not written yet: ('country', country, parks) or ('park', href, lat_dms, long_dms)
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _add(self, update):
+        with self._lock:
+            self._pending.append(update)
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        if pending:
+            # Convert the coordinates of the whole batch at once
+            resolved = [update for update in pending if update[0] == 'park']
+            lat_dec, long_dec = self._to_decimal([update[2] for update in resolved], [update[3] for update in resolved])
+            decimals = iter(zip(lat_dec, long_dec))
+
+            with self._connection:
+                for update in pending:
+                    if update[0] == 'country':
+                        self._write_country(update[1], update[2])
+                    else:
+                        self._write_coordinates(update[1], (update[2], update[3]) + next(decimals))
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._flush()
+                self._connection.close()
+                self._connection = None
+
+    def country_done(self, country, parks):
+        self._add(('country', country, {park_name: dict(park) for park_name, park in parks.items()}))
+
+    def park_resolved(self, url, lat_dms, long_dms):
+        self._add(('park', url, lat_dms, long_dms))
+
+    def park_failed(self, url, error=False):
+        # A page that could not be fetched is missing coordinates until a later run finds them
+        self._add(('park', url, None, None))
+
+    def _write_parks(self, rows):
+        """
+        Upsert rows of PARK_COLUMNS + COORDINATE_COLUMNS: rows with coordinates go to
+        parks and rows without them go to missing_parks, and are removed from the other.
+        """
+        # Parks with a lat_dms go to parks, the same split as write_master_table
+        found = [row for row in rows if row[len(PARK_COLUMNS)] != None]
+        missing = [row[:len(PARK_COLUMNS)] for row in rows if row[len(PARK_COLUMNS)] == None]
+
+        self._connection.executemany(UPSERT_PARK, found)
+        self._connection.executemany("DELETE FROM missing_parks WHERE country = ? AND listed_name = ?", [row[:2] for row in found])
+        self._connection.executemany(UPSERT_MISSING_PARK, missing)
+        self._connection.executemany("DELETE FROM parks WHERE country = ? AND listed_name = ?", [row[:2] for row in missing])
+
+    def _delete_parks_not_in(self, country, listed_names):
+        for table in ('parks', 'missing_parks'):
+            stale = [(country, name) for (name,) in self._connection.execute(f"SELECT listed_name FROM {table} WHERE country = ?", (country,))
+                     if name not in listed_names]
+            self._connection.executemany(f"DELETE FROM {table} WHERE country = ? AND listed_name = ?", stale)
+
+    def _write_country(self, country, parks):
+        """
+        Save the parks found on a country page. Parks with coordinates on the country
+        page keep them, and parks linking to an article that already has coordinates in
+        the database get them until it is resolved again.
+        """
+        country = clean_country_name(country)
+        hrefs = {park_name: canonicalize_park_url(park.get('url')) for park_name, park in parks.items()}
+        coordinates = {}
+        for href in set(hrefs.values()) - {None}:
+            row = self._connection.execute(
+                "SELECT lat_dms, long_dms, lat_dec, long_dec FROM parks WHERE href = ? LIMIT 1", (href,)
+            ).fetchone()
+            if row != None:
+                coordinates[href] = row
+
+        # Coordinates from the country page itself
+        listed = [park_name for park_name, park in parks.items() if park.get('lat_dms') != None]
+        lat_dec, long_dec = self._to_decimal([parks[name]['lat_dms'] for name in listed], [parks[name].get('long_dms') for name in listed])
+        own = {name: (parks[name]['lat_dms'], parks[name].get('long_dms'), lat, long)
+               for name, lat, long in zip(listed, lat_dec, long_dec)}
+
+        rows = []
+        for park_name, park in parks.items():
+            name = clean_park_name(park_name)
+            href = hrefs[park_name]
+            park_url = "https://en.wikipedia.org" + park['url'] if park.get('url') != None else None
+            rows.append((country, park_name, name, normalize_name(name), park_url, href)
+                        + own.get(park_name, coordinates.get(href, (None, None, None, None))))
+
+        self._delete_parks_not_in(country, set(parks))
+        self._write_parks(rows)
+        self._connection.execute("INSERT INTO countries (country) VALUES (?) ON CONFLICT (country) DO NOTHING", (country,))
+
+    def _write_coordinates(self, href, coordinates):
+        """
+        Save the coordinates of an article, (lat_dms, long_dms, lat_dec, long_dec), to
+        every park linking to it.
+        """
+        rows = []
+        for table in ('parks', 'missing_parks'):
+            for row in self._connection.execute(f"SELECT {', '.join(PARK_COLUMNS)} FROM {table} WHERE href = ?", (href,)):
+                rows.append(row + coordinates)
+        self._write_parks(rows)
+
+    @staticmethod
+    def _to_decimal(lat_dms, long_dms):
+        """
+        Degree decimal coordinates as lists of floats, None where they cannot be converted.
+        """
+        lat_dec, _ = dms_to_decimal(lat_dms, limit=90)
+        long_dec, _ = dms_to_decimal(long_dms, limit=180)
+
+        return (
+            [None if pd.isna(value) else float(value) for value in lat_dec],
+            [None if pd.isna(value) else float(value) for value in long_dec]
+        )
+
+    def sync(self, master_dict, df_summary):
+        """
+        Bring the database in line with the final results of the crawl, including
+        countries and coordinates that were reused rather than scraped in this run, and
+        remove the countries and parks that are gone. Rows that did not change are not
+        written.
+        """
+        keys = []
+        park_urls = []
+        coordinates = []
+        for country, c_dict in master_dict.items():
+            for park_name, park in c_dict['parks'].items():
+                keys.append((clean_country_name(country), park_name))
+                park_urls.append(park.get('url'))
+                coordinates.append((park.get('lat_dms'), park.get('long_dms')))
+
+        names = clean_park_names(pd.Series([park_name for _, park_name in keys], dtype=object))
+        lat_dms = [lat for lat, _ in coordinates]
+        long_dms = [long for _, long in coordinates]
+        lat_dec, long_dec = self._to_decimal(lat_dms, long_dms)
+
+        rows = []
+        for i, ((country, park_name), url, name) in enumerate(zip(keys, park_urls, names)):
+            park_url = "https://en.wikipedia.org" + url if url != None else None
+            rows.append((country, park_name, name, normalize_name(name), park_url, canonicalize_park_url(url),
+                         lat_dms[i], long_dms[i], lat_dec[i], long_dec[i]))
+
+        countries = self._summary_rows(df_summary)
+
+        with self._lock:
+            self._flush()
+            with self._connection:
+                self._sync(keys, rows, countries)
+
+        logger.info(f"Synced {len(countries)} countries and {len(rows)} parks to {self.path}")
+
+    def sync_summary(self, df_summary):
+        """
+        Bring the countries table in line with the summary table of a crawl whose parks
+        were only reported through the observer methods (e.g. stream_main), and remove
+        the countries that are gone with their parks.
+        """
+        countries = self._summary_rows(df_summary)
+
+        with self._lock:
+            self._flush()
+            with self._connection:
+                self._sync_countries(countries)
+
+        logger.info(f"Synced {len(countries)} countries to {self.path}")
+
+    @staticmethod
+    def _summary_rows(df_summary):
+        return [
+            (row.country, None if pd.isna(row.number_of_parks_listed) else int(row.number_of_parks_listed),
+             None if pd.isna(row.number_of_parks_scraped) else int(row.number_of_parks_scraped))
+            for row in df_summary.itertuples()
+        ]
+
+    def _sync(self, keys, rows, countries):
+        listed = {}
+        for country, park_name in keys:
+            listed.setdefault(country, set()).add(park_name)
+        for (country,) in self._connection.execute("SELECT DISTINCT country FROM parks UNION SELECT DISTINCT country FROM missing_parks").fetchall():
+            self._delete_parks_not_in(country, listed.get(country, set()))
+
+        self._write_parks(rows)
+        self._sync_countries(countries)
+
+    def _sync_countries(self, countries):
+        self._connection.executemany(UPSERT_COUNTRY, countries)
+        current = {country for country, _, _ in countries}
+        stale = [(country,) for (country,) in self._connection.execute("SELECT country FROM countries") if country not in current]
+        self._connection.executemany("DELETE FROM countries WHERE country = ?", stale)
+        for table in ('parks', 'missing_parks'):
+            stale = [(country,) for (country,) in self._connection.execute(f"SELECT DISTINCT country FROM {table}").fetchall()
+                     if country not in current]
+            self._connection.executemany(f"DELETE FROM {table} WHERE country = ?", stale)
@@ -0,0 +1,204 @@
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Mean radius of the Earth
+EARTH_RADIUS_KM = 6371.0088
+
+# Largest number of query/park pairs compared at once by the NumPy search
+BRUTE_FORCE_BLOCK = 4_000_000
+
+
+def to_unit_vectors(lat, long) -> np.ndarray:
+    """
+    Points on the unit sphere for degree decimal coordinates, as an (n, 3) array. The
+    straight-line (chord) distance between two of them grows with the great-circle
+    distance, so nearest neighbours on the sphere are nearest neighbours in 3D.
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))
+    long = np.radians(np.asarray(long, dtype=float))
+    cos_lat = np.cos(lat)
+
+    return np.stack([cos_lat * np.cos(long), cos_lat * np.sin(long), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1))
+
+
+def km_to_chord(km):
+    # Radii past the antipode cover the whole sphere
+    return 2 * np.sin(np.minimum(np.asarray(km, dtype=float) / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def haversine_km(lat1, long1, lat2, long2):
+    """
+    Great-circle distance in km between degree decimal coordinates, broadcast over arrays.
+    """
+    lat1, long1, lat2, long2 = (np.radians(np.asarray(value, dtype=float)) for value in (lat1, long1, lat2, long2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((long2 - long1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class ParkIndex:
+    """
+    Spatial index over the parks with coordinates, answering radius, nearest-neighbour
+    and bounding-box queries without scanning every park. Parks are indexed as 3D unit
+    vectors in a KD-tree (scipy's cKDTree); without scipy, queries fall back to a
+    vectorized NumPy search over blocks of parks. Bounding boxes are answered from the
+    parks sorted by latitude.
+
+    Every query takes a single point (or box) or arrays of them for a batch. Results are
+    positions in index.parks, the table of the indexed parks.
+
+    parks: master table, or any table with lat_dec and long_dec columns
+    """
+    def __init__(self, parks: pd.DataFrame):
+        has_coordinates = parks['lat_dec'].notna() & parks['long_dec'].notna()
+        self.parks = parks[has_coordinates].reset_index(drop=True)
+
+        self.lat = self.parks['lat_dec'].to_numpy(dtype=float)
+        self.long = self.parks['long_dec'].to_numpy(dtype=float)
+        self.points = to_unit_vectors(self.lat, self.long)
+        self.tree = cKDTree(self.points) if cKDTree is not None else None
+
+        self._lat_order = np.argsort(self.lat, kind='stable')
+        self._sorted_lat = self.lat[self._lat_order]
+
+    @classmethod
+    def from_csv(cls, path="data/national_parks.csv"):
+        return cls(pd.read_csv(path, encoding='utf-8-sig'))
+
+    @classmethod
+    def from_dataset(cls, path, file_format='parquet'):
+        """
+        Load a park table exported with export.write_park_dataset.
+        """
+        from export import read_park_dataset
+        return cls(read_park_dataset(path, file_format).to_table().to_pandas())
+
+    def __len__(self):
+        return len(self.parks)
+
+    def _blocks(self, queries):
+        """
+        Split the queries so that each block compares at most BRUTE_FORCE_BLOCK pairs.
+        """
+        block_size = max(1, BRUTE_FORCE_BLOCK // max(len(self.points), 1))
+        for start in range(0, len(queries), block_size):
+            yield start, queries[start:start + block_size]
+
+    def _distances_km(self, query, indices):
+        return chord_to_km(np.linalg.norm(self.points[indices] - query, axis=-1))
+
+    def within_radius(self, lat, long, radius_km, return_distances=False):
+        """
+        Parks within radius_km of a point, nearest first. For arrays of points (and
+        radii), returns a list with the result of each point.
+        """
+        batch = np.ndim(lat) > 0
+        queries = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(long))
+        chords = np.broadcast_to(km_to_chord(radius_km), len(queries))
+
+        if self.tree is not None:
+            matches = [np.asarray(indices, dtype=np.intp) for indices in self.tree.query_ball_point(queries, chords, return_sorted=False)]
+        else:
+            matches = []
+            for start, block in self._blocks(queries):
+                # Squared chord of every pair, compared to the squared radius of each query
+                squared_chords = 2 - 2 * block @ self.points.T
+                within = squared_chords <= chords[start:start + len(block), None] ** 2
+                matches.extend(np.flatnonzero(row) for row in within)
+
+        results = []
+        for query, indices in zip(queries, matches):
+            distances = self._distances_km(query, indices)
+            order = np.argsort(distances, kind='stable')
+            results.append((indices[order], distances[order]) if return_distances else indices[order])
+
+        return results if batch else results[0]
+
+    def nearest(self, lat, long, k=1):
+        """
+        The k parks nearest a point, nearest first. Returns (distances in km, positions),
+        each of shape (k,), or (n, k) for arrays of n points. Fewer than k parks give
+        positions of len(index) and infinite distances for the missing neighbours.
+        """
+        batch = np.ndim(lat) > 0
+        queries = to_unit_vectors(np.atleast_1d(lat), np.atleast_1d(long))
+
+        if self.tree is not None:
+            chords, indices = self.tree.query(queries, k=k)
+            chords = np.asarray(chords).reshape(len(queries), k)
+            indices = np.asarray(indices).reshape(len(queries), k)
+        else:
+            chords = np.full((len(queries), k), np.inf)
+            indices = np.full((len(queries), k), len(self.points), dtype=np.intp)
+            n = min(k, len(self.points))
+            for start, block in self._blocks(queries):
+                squared_chords = np.maximum(2 - 2 * block @ self.points.T, 0)
+                # Partition out the k nearest, then only sort those
+                nearest = np.argpartition(squared_chords, n - 1, axis=1)[:, :n] if n < len(self.points) else np.tile(np.arange(n), (len(block), 1))
+                nearest_chords = np.take_along_axis(squared_chords, nearest, axis=1)
+                order = np.argsort(nearest_chords, axis=1, kind='stable')
+                indices[start:start + len(block), :n] = np.take_along_axis(nearest, order, axis=1)
+                chords[start:start + len(block), :n] = np.sqrt(np.take_along_axis(nearest_chords, order, axis=1))
+
+        distances = np.where(np.isinf(chords), np.inf, chord_to_km(np.where(np.isinf(chords), 0, chords)))
+        if batch:
+            return distances, indices
+        return distances[0], indices[0]
+
+    def within_bbox(self, min_lat, min_long, max_lat, max_long):
+        """
+        Parks inside a bounding box, in order of latitude. A box with min_long greater
+        than max_long wraps around the antimeridian. For arrays of boxes, returns a list
+        with the result of each box.
+        """
+        batch = np.ndim(min_lat) > 0
+        boxes = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype=float)) for value in (min_lat, min_long, max_lat, max_long)))
+
+        starts = np.searchsorted(self._sorted_lat, boxes[0], side='left')
+        ends = np.searchsorted(self._sorted_lat, boxes[2], side='right')
+
+        results = []
+        for start, end, box_min_long, box_max_long in zip(starts, ends, boxes[1], boxes[3]):
+            candidates = self._lat_order[start:end]
+            long = self.long[candidates]
+            if box_min_long <= box_max_long:
+                inside = (long >= box_min_long) & (long <= box_max_long)
+            else:
+                inside = (long >= box_min_long) | (long <= box_max_long)
+            results.append(candidates[inside])
+
+        return results if batch else results[0]
+
+    def nearest_parks(self, lat, long, k=1) -> pd.DataFrame:
+        """
+        The k parks nearest a point as a table, with their distance_km.
+        """
+        distances, indices = self.nearest(lat, long, k)
+        found = indices < len(self.parks)
+        parks = self.parks.iloc[indices[found]].copy()
+        parks['distance_km'] = distances[found]
+
+        return parks
+
+    def parks_within(self, lat, long, radius_km) -> pd.DataFrame:
+        """
+        The parks within radius_km of a point as a table, with their distance_km.
+        """
+        indices, distances = self.within_radius(lat, long, radius_km, return_distances=True)
+        parks = self.parks.iloc[indices].copy()
+        parks['distance_km'] = distances
+
+        return parks
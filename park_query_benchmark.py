@@ -0,0 +1,118 @@
+"""
+Benchmark the park spatial index against a naive scan.
+
+Random points spread evenly over the sphere stand in for parks at each size (the
+scraped dataset has about 3,000). For each size the index is built once, then the
+same radius and nearest-park queries are answered by the index, one at a time and as
+a batch, and by scanning every park with the haversine formula per query, the way the
+services answer them from national_parks.csv. The results of the index are checked
+against the scan.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import park_query
+from park_query import ParkIndex, haversine_km
+
+import logging
+logging.basicConfig()
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+
+def random_parks(n, rng) -> pd.DataFrame:
+    # Uniform in sin(latitude) gives points spread evenly over the sphere
+    return pd.DataFrame({
+        'lat_dec': np.degrees(np.arcsin(rng.uniform(-1, 1, n))),
+        'long_dec': rng.uniform(-180, 180, n)
+    })
+
+
+def naive_within_radius(parks, lat, long, radius_km):
+    distances = haversine_km(lat, long, parks['lat_dec'].to_numpy(), parks['long_dec'].to_numpy())
+    indices = np.flatnonzero(distances <= radius_km)
+
+    return indices[np.argsort(distances[indices], kind='stable')]
+
+
+def naive_nearest(parks, lat, long, k):
+    distances = haversine_km(lat, long, parks['lat_dec'].to_numpy(), parks['long_dec'].to_numpy())
+
+    return np.argsort(distances, kind='stable')[:k]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+
+    return result, time.perf_counter() - start
+
+
+def benchmark_size(n, num_queries, radius_km, k, rng) -> dict:
+    parks = random_parks(n, rng)
+    queries = random_parks(num_queries, rng)
+    query_lat = queries['lat_dec'].to_numpy()
+    query_long = queries['long_dec'].to_numpy()
+
+    index, build_time = timed(lambda: ParkIndex(parks))
+
+    naive_radius, naive_radius_time = timed(lambda: [naive_within_radius(parks, lat, long, radius_km) for lat, long in zip(query_lat, query_long)])
+    radius, radius_time = timed(lambda: [index.within_radius(lat, long, radius_km) for lat, long in zip(query_lat, query_long)])
+    _, batch_radius_time = timed(lambda: index.within_radius(query_lat, query_long, radius_km))
+
+    naive_knn, naive_knn_time = timed(lambda: [naive_nearest(parks, lat, long, k) for lat, long in zip(query_lat, query_long)])
+    knn, knn_time = timed(lambda: [index.nearest(lat, long, k)[1] for lat, long in zip(query_lat, query_long)])
+    _, batch_knn_time = timed(lambda: index.nearest(query_lat, query_long, k))
+
+    # Points on the boundary of a radius can fall on either side of it in floating point,
+    # so only count the results that differ
+    radius_mismatches = sum(set(a) != set(b) for a, b in zip(radius, naive_radius))
+    knn_mismatches = sum(not np.array_equal(a, b) for a, b in zip(knn, naive_knn))
+
+    return {
+        'parks': n,
+        'build_s': build_time,
+        'naive_radius_ms': naive_radius_time / num_queries * 1000,
+        'radius_ms': radius_time / num_queries * 1000,
+        'batch_radius_ms': batch_radius_time / num_queries * 1000,
+        'naive_knn_ms': naive_knn_time / num_queries * 1000,
+        'knn_ms': knn_time / num_queries * 1000,
+        'batch_knn_ms': batch_knn_time / num_queries * 1000,
+        # Both one query at a time; the batch columns show what batching adds on top
+        'radius_speedup': naive_radius_time / radius_time,
+        'knn_speedup': naive_knn_time / knn_time,
+        'batch_radius_speedup': naive_radius_time / batch_radius_time,
+        'batch_knn_speedup': naive_knn_time / batch_knn_time,
+        'mismatches': radius_mismatches + knn_mismatches
+    }
+
+
+def run_benchmark(sizes=(3_000, 300_000, 3_000_000), num_queries=100, radius_km=100, k=10, seed=0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    backend = 'scipy cKDTree' if park_query.cKDTree is not None else 'NumPy blocks'
+    logger.info(f"Benchmarking the park index ({backend}) with {num_queries} queries, radius {radius_km} km, k={k}")
+
+    results = []
+    for n in sizes:
+        result = benchmark_size(n, num_queries, radius_km, k, rng)
+        logger.info(f"{n} parks: {result['radius_speedup']:.1f}x faster radius queries, {result['knn_speedup']:.1f}x faster nearest-park queries "
+                    f"({result['batch_radius_speedup']:.1f}x and {result['batch_knn_speedup']:.1f}x batched)")
+        results.append(result)
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the park spatial index against a naive haversine scan.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3_000, 300_000, 3_000_000], help="Numbers of parks to benchmark")
+    parser.add_argument('--queries', type=int, default=100, help="Queries answered at each size")
+    parser.add_argument('--radius', type=float, default=100, help="Radius of the radius queries in km")
+    parser.add_argument('-k', type=int, default=10, help="Parks returned by the nearest-park queries")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.queries, args.radius, args.k)
+    with pd.option_context('display.float_format', '{:.3f}'.format, 'display.width', 200):
+        print(results.to_string(index=False))
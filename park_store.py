@@ -0,0 +1,476 @@
+import sys
+import threading
+from collections.abc import Mapping, MutableMapping
+
+import logging
+logger = logging.getLogger()
+
+
+def intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class SlotRecord(MutableMapping):
+    """
+    Record whose fields live in __slots__ instead of a per-instance __dict__, and which
+    reads and writes like the dictionary it replaces: record['url'], 'lat_dms' in record,
+    record.get(...), dict(record). A field that was never set is absent, just like a
+    missing key, so existing checks such as `'lat_dms' in park_dict` keep working.
+    """
+    __slots__ = ()
+
+    # Fields read and written through the mapping interface; subclasses may add private
+    # slots of their own after them
+    FIELDS = ()
+    # Fields whose string values are interned, since many records share them
+    INTERNED = ()
+
+    def __init__(self, fields=None, **kwargs):
+        if fields is not None:
+            self.update(fields)
+        self.update(kwargs)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        if key in self.INTERNED:
+            value = intern(value)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        for key in self.FIELDS:
+            if hasattr(self, key):
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class ParkRecord(SlotRecord):
+    """
+    A national park: its URL and, once scraped, its coordinates in degree minutes seconds.
+    """
+    FIELDS = ('url', 'lat_dms', 'long_dms')
+    __slots__ = FIELDS + ('_country', '_name')
+    INTERNED = ('url',)
+
+    def _attach(self, country, name):
+        self._country = country
+        self._name = name
+
+    def _metrics(self):
+        country = getattr(self, '_country', None)
+        return country._metrics() if country is not None else None
+
+    def __setitem__(self, key, value):
+        metrics = self._metrics()
+        if metrics is None:
+            return super().__setitem__(key, value)
+
+        before = park_state(self)
+        super().__setitem__(key, value)
+        metrics.update_park(self._country._name, self._name, before, park_state(self))
+
+    def __delitem__(self, key):
+        metrics = self._metrics()
+        if metrics is None:
+            return super().__delitem__(key)
+
+        before = park_state(self)
+        super().__delitem__(key)
+        metrics.update_park(self._country._name, self._name, before, park_state(self))
+
+
+class ParkMap(MutableMapping):
+    """
+    The parks of a country, park name -> ParkRecord. Parks put in it are turned into 
+    ParkRecords, so c_dict['parks'][name] = {...} is counted by the store's metrics 
+    like assigning the whole 'parks' dictionary.
+    """
+    __slots__ = ('_parks', '_country')
+
+    def __init__(self, country):
+        self._parks = {}
+        self._country = country
+
+    def _put(self, park_name, park):
+        park = park if isinstance(park, ParkRecord) else ParkRecord(park)
+        park._attach(self._country, park_name)
+        self._parks[intern(park_name)] = park
+
+        return park
+
+    def __getitem__(self, park_name):
+        return self._parks[park_name]
+
+    def __setitem__(self, park_name, park):
+        metrics = self._country._metrics()
+        old_park = self._parks.get(park_name)
+        if metrics is not None and old_park is not None:
+            metrics.remove_park(self._country._name, park_name, old_park)
+        park = self._put(park_name, park)
+        if metrics is not None:
+            metrics.add_park(self._country._name, park_name, park)
+
+    def __delitem__(self, park_name):
+        park = self._parks.pop(park_name)
+        metrics = self._country._metrics()
+        if metrics is not None:
+            metrics.remove_park(self._country._name, park_name, park)
+
+    def __iter__(self):
+        return iter(self._parks)
+
+    def __len__(self):
+        return len(self._parks)
+
+    def __repr__(self):
+        return repr(self._parks)
+
+
+class CountryRecord(SlotRecord):
+    """
+    A country from the main page: its URL, the number of parks listed for it, the parks
+    found on its page (park name -> ParkRecord) and the number of them with coordinates.
+
+    Once the country is in a ParkStore, changes to it and to its parks' records are
+    counted by the store's CrawlMetrics. Parks are added by assigning the whole 'parks'
+    dictionary, which is kept as a ParkMap, or single parks in it.
+    """
+    FIELDS = ('url', 'number_of_parks', 'parks', 'num_parks_scraped')
+    __slots__ = FIELDS + ('_store_metrics', '_name')
+    INTERNED = ('url', 'number_of_parks')
+
+    # Fields the metrics are computed from
+    COUNTED = ('url', 'number_of_parks')
+
+    def _attach(self, metrics, name):
+        self._store_metrics = metrics
+        self._name = name
+        if metrics is not None:
+            metrics.add_country(name, self)
+            for park_name, park in self.get('parks', {}).items():
+                metrics.add_park(name, park_name, park)
+
+    def _detach(self):
+        metrics = self._metrics()
+        if metrics is not None:
+            for park_name, park in self.get('parks', {}).items():
+                metrics.remove_park(self._name, park_name, park)
+            metrics.remove_country(self._name, forget=True)
+        self._store_metrics = None
+
+    def _metrics(self):
+        return getattr(self, '_store_metrics', None)
+
+    def __setitem__(self, key, value):
+        metrics = self._metrics()
+        if key == 'parks':
+            parks = ParkMap(self)
+            for park_name, park in value.items():
+                parks._put(park_name, park)
+            if metrics is not None:
+                for park_name, park in self.get('parks', {}).items():
+                    metrics.remove_park(self._name, park_name, park)
+            super().__setitem__(key, parks)
+            if metrics is not None:
+                for park_name, park in parks.items():
+                    metrics.add_park(self._name, park_name, park)
+        elif key in self.COUNTED and metrics is not None:
+            metrics.remove_country(self._name)
+            super().__setitem__(key, value)
+            metrics.add_country(self._name, self)
+        else:
+            super().__setitem__(key, value)
+
+
+def valid_wiki_url(url) -> bool:
+    return url != None and 'wiki' in url
+
+
+def park_state(park) -> tuple:
+    """
+    What the metrics count about a park: whether it has coordinates and whether its 
+    URL is valid.
+    """
+    return park.get('lat_dms') != None, valid_wiki_url(park.get('url'))
+
+
+class _CountryCounts:
+    __slots__ = ('number_of_parks', 'listed', 'valid_url', 'parks_found', 'parks_scraped')
+
+    def __init__(self):
+        self.number_of_parks = None
+        self.listed = 0
+        self.valid_url = True
+        self.parks_found = 0
+        self.parks_scraped = 0
+
+
+class CrawlMetrics:
+    """
+    Running totals of a crawl, updated by the ParkStore as countries and parks are added 
+    and coordinates are saved, so the completion and coverage figures can be read at any 
+    point of the run without walking every park.
+
+    total_parks_listed: parks listed on the main page for all countries
+    parks_found: parks found on the country pages
+    parks_scraped: parks with coordinates
+    """
+    def __init__(self):
+        self.total_parks_listed = 0
+        self.parks_found = 0
+        self.parks_scraped = 0
+        self.parks_missing_country_url = 0
+
+        self._countries = {}
+        self._parks_missing_url = {}
+        self._lock = threading.Lock()
+
+    def _counts(self, country):
+        counts = self._countries.get(country)
+        if counts is None:
+            counts = self._countries[country] = _CountryCounts()
+
+        return counts
+
+    def add_country(self, country, record):
+        with self._lock:
+            counts = self._counts(country)
+            counts.number_of_parks = record.get('number_of_parks')
+            try:
+                counts.listed = int(counts.number_of_parks) if counts.number_of_parks != None else 0
+            except ValueError:
+                counts.listed = 0
+            counts.valid_url = valid_wiki_url(record.get('url'))
+
+            self.total_parks_listed += counts.listed
+            if not counts.valid_url:
+                self.parks_missing_country_url += counts.listed
+
+    def remove_country(self, country, forget=False):
+        """
+        Take back what add_country counted for a country. The country keeps its place in 
+        the order unless forget is True, i.e. it left the store.
+        """
+        with self._lock:
+            counts = self._countries.get(country)
+            if counts is None:
+                return
+            self.total_parks_listed -= counts.listed
+            if not counts.valid_url:
+                self.parks_missing_country_url -= counts.listed
+            counts.number_of_parks, counts.listed, counts.valid_url = None, 0, True
+            if forget:
+                del self._countries[country]
+
+    def add_park(self, country, park_name, park):
+        with self._lock:
+            self._counts(country).parks_found += 1
+            self.parks_found += 1
+            self._count_park_state(country, park_name, (False, True), park_state(park))
+
+    def remove_park(self, country, park_name, park):
+        with self._lock:
+            self._counts(country).parks_found -= 1
+            self.parks_found -= 1
+            self._count_park_state(country, park_name, park_state(park), (False, True))
+
+    def update_park(self, country, park_name, before, after):
+        """
+        Count a change to a park's record, given its park_state before and after.
+        """
+        with self._lock:
+            self._count_park_state(country, park_name, before, after)
+
+    def _count_park_state(self, country, park_name, before, after):
+        (had_coordinates, had_valid_url), (has_coordinates, has_valid_url) = before, after
+        scraped = int(has_coordinates) - int(had_coordinates)
+        self._counts(country).parks_scraped += scraped
+        self.parks_scraped += scraped
+
+        if had_valid_url and not has_valid_url:
+            self._parks_missing_url[(country, park_name)] = park_name
+        elif has_valid_url and not had_valid_url:
+            self._parks_missing_url.pop((country, park_name), None)
+
+    def countries_missing_url(self) -> list:
+        """
+        Countries with a missing or invalid URL on the main page.
+        """
+        return [country for country, counts in self._countries.items() if not counts.valid_url]
+
+    def parks_missing_url(self) -> list:
+        """
+        Names of the parks with a missing or invalid URL.
+        """
+        return list(self._parks_missing_url.values())
+
+    def parks_scraped_by_country(self) -> dict:
+        return {country: counts.parks_scraped for country, counts in self._countries.items()}
+
+    def summary_columns(self) -> dict:
+        """
+        Columns of the summary table: each country, the number of parks listed for it and 
+        the number of its parks with coordinates.
+        """
+        return {
+            'country': list(self._countries),
+            'number_of_parks_listed': [counts.number_of_parks for counts in self._countries.values()],
+            'number_of_parks_scraped': [counts.parks_scraped for counts in self._countries.values()]
+        }
+
+    def country_completion(self, high: float, low: float):
+        """
+        Sort countries by the percentage of their listed parks that have coordinates, 
+        the same way as country_completion_check. Returns the incomplete, potentially 
+        complete, too many scraped (over high percent), not enough scraped (under low 
+        percent) and error lists.
+        """
+        incomplete_countries = []
+        potentially_complete_countries = []
+        too_many_scraped = []
+        not_enough_scraped = []
+        error_list = []
+
+        for country, counts in self._countries.items():
+            if counts.number_of_parks == None:
+                continue
+            try:
+                pct_scraped = round(counts.parks_scraped / int(counts.number_of_parks) * 100, 2)
+            except (ValueError, ZeroDivisionError):
+                logger.info(f"Error with calculating scrape percentage for {country}")
+                error_list.append(country)
+                continue
+            logger.info(f"{pct_scraped}% ({counts.parks_scraped}/{counts.number_of_parks}) of national parks in {country} were scraped and have coordinates.")
+
+            if pct_scraped != 100.0:
+                incomplete_countries.append(country)
+            else:
+                potentially_complete_countries.append(country)
+            if pct_scraped > high:
+                too_many_scraped.append(country)
+            if pct_scraped < low:
+                not_enough_scraped.append(country)
+
+        return incomplete_countries, potentially_complete_countries, too_many_scraped, not_enough_scraped, error_list
+
+    def _log_share(self, count, message):
+        total = self.total_parks_listed
+        pct = round(count / total * 100, 2) if total else 0.0
+        logger.info(f"{pct}% ({count}/{total}) {message}")
+
+    def log_missing_urls(self):
+        logger.info(f"There are {self.total_parks_listed} national parks worldwide\n")
+        self._log_share(self.parks_missing_country_url, "of parks are missing due to missing or invalid URLs for the country.")
+        self._log_share(len(self._parks_missing_url), "of parks are missing due to missing or invalid URLs for the national park.")
+
+    def log_completion(self):
+        self._log_share(self.parks_scraped, "of available parks have been scraped.")
+        self._log_share(self.parks_missing_country_url, "of parks are missing due to invalid country URLs.")
+        self._log_share(len(self._parks_missing_url), "of parks are missing due to invalid park URLs.")
+
+    def snapshot(self) -> dict:
+        """
+        The running totals, e.g. to report progress while the crawl is running.
+        """
+        with self._lock:
+            return {
+                'countries': len(self._countries),
+                'total_parks_listed': self.total_parks_listed,
+                'parks_found': self.parks_found,
+                'parks_scraped': self.parks_scraped,
+                'parks_missing_country_url': self.parks_missing_country_url,
+                'parks_missing_url': len(self._parks_missing_url)
+            }
+
+
+class ParkStore(MutableMapping):
+    """
+    Every country and park found by the scraper, replacing the nested master dictionary.
+    It reads and writes like that dictionary (country -> country dictionary, with a
+    'parks' dictionary of park name -> park dictionary), but countries and parks are
+    stored as slotted records, the columns of the master table can be read from it
+    directly, and its metrics keep running totals of the crawl.
+    """
+    def __init__(self, countries=None):
+        self._countries = {}
+        self.metrics = CrawlMetrics()
+        if countries is not None:
+            self.update(countries)
+
+    def __getitem__(self, country):
+        return self._countries[country]
+
+    def __setitem__(self, country, record):
+        if not isinstance(record, CountryRecord):
+            record = CountryRecord(record)
+        country = intern(country)
+        if country in self._countries:
+            self._countries[country]._detach()
+        self._countries[country] = record
+        record._attach(self.metrics, country)
+
+    def __delitem__(self, country):
+        self._countries.pop(country)._detach()
+
+    def __iter__(self):
+        return iter(self._countries)
+
+    def __len__(self):
+        return len(self._countries)
+
+    def __repr__(self):
+        return f"ParkStore({self._countries!r})"
+
+    def parks(self):
+        """
+        Yield (country, park name, ParkRecord) for every park.
+        """
+        for country, record in self._countries.items():
+            for park_name, park in record.get('parks', {}).items():
+                yield country, park_name, park
+
+    def park_columns(self, fields=ParkRecord.FIELDS) -> dict:
+        """
+        The parks as columns: lists of the country, park name and each field, in the
+        order the parks were found, with None for fields that were never set.
+        """
+        columns = {'country': [], 'national_park_name': []}
+        columns.update({field: [] for field in fields})
+        for country, park_name, park in self.parks():
+            columns['country'].append(country)
+            columns['national_park_name'].append(park_name)
+            for field in fields:
+                columns[field].append(getattr(park, field, None))
+
+        return columns
+
+
+def as_park_store(master_dict: Mapping) -> ParkStore:
+    """
+    Return master_dict as a ParkStore, converting it if it is a plain dictionary.
+    """
+    if isinstance(master_dict, ParkStore):
+        return master_dict
+
+    return ParkStore(master_dict)
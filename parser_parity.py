@@ -0,0 +1,181 @@
+"""
+Check that every parser backend gives the same results as html.parser.
+
+The main page, each country page and a sample of park pages are fetched once
+(through the shared transport, so a cached crawl can be checked with --offline),
+parsed with every installed backend, and run through the scrape_*/find_*/check_*
+functions. Any result that differs from html.parser is reported, as is any park
+name the vectorized name cleaning cleans differently from clean_park_name. Both run
+the same PARK_NAME_RULES, so this only checks the pandas and re code paths agree on
+the live names; the rules themselves are checked against the original cleaning by the
+golden tests in tests/test_name_cleaning.py.
+"""
+import argparse
+import pandas as pd
+from bs4 import BeautifulSoup
+import bs4
+
+from national_parks import *
+from page_cache import OfflineCacheMiss, PageCache
+from transport import configure_transport, get_transport
+
+import logging
+logger = logging.getLogger()
+
+
+# Functions run on every country page; they take (soup, country) or (soup)
+COUNTRY_PAGE_CHECKS = {
+    'check_national_park_id': lambda soup, country: check_national_park_id(soup, country),
+    'check_country_id': lambda soup, country: check_country_id(soup, country),
+    'check_table': lambda soup, country: check_table(soup, country),
+    'check_list': lambda soup, country: check_list(soup, country),
+    'multiple_table_check': lambda soup, country: multiple_table_check(soup),
+    'find_national_park_id': lambda soup, country: find_national_park_id(soup),
+    'find_country_id': lambda soup, country: find_country_id(soup, country),
+    'find_lone_table': lambda soup, country: find_lone_table(soup),
+    'find_unordered_list': lambda soup, country: find_unordered_list(soup),
+    'find_coordinates': lambda soup, country: find_coordinates(soup),
+}
+
+
+def comparable(value):
+    """
+    Turn a result into something that can be compared across parsers. Tags are
+    compared by name, id and text, since builders differ in the markup they
+    reproduce (e.g. html5lib inserts <tbody>).
+    """
+    if isinstance(value, bs4.element.Tag):
+        return ('Tag', value.name, value.get('id'), value.get_text())
+    if isinstance(value, dict):
+        return {key: comparable(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(comparable(item) for item in value)
+
+    return value
+
+
+def run_check(function, *args):
+    """
+    Run a check and capture exceptions as results, since a backend that raises where
+    html.parser does not (or the other way round) is also a mismatch.
+    """
+    try:
+        return comparable(function(*args))
+    except Exception as e:
+        return ('raised', type(e).__name__)
+
+
+def compare_results(page, check, results, mismatches):
+    reference = results['html.parser']
+    for parser, result in results.items():
+        if result != reference:
+            mismatches.append({'page': page, 'check': check, 'parser': parser,
+                               'expected': reference, 'result': result})
+
+
+def check_name_cleaning_parity(park_names, mismatches):
+    """
+    Check that the vectorized name cleaning gives the same names as cleaning them one 
+    at a time.
+    """
+    park_names = pd.Series(park_names, dtype=object)
+    for name, cleaned in zip(park_names, clean_park_names(park_names)):
+        expected = clean_park_name(name)
+        if cleaned != expected:
+            mismatches.append({'page': name, 'check': 'clean_park_names', 'parser': 'vectorized',
+                               'expected': expected, 'result': cleaned})
+
+
+def check_parser_parity(url, parsers=None, max_countries=None, max_parks=100):
+    """
+    Compare every installed parser backend against html.parser on the main page, the
+    country pages and up to max_parks park pages, and the vectorized name cleaning
+    against clean_park_name on every park name found. Returns a list of mismatches.
+    """
+    parsers = [parser for parser in (parsers or HTML_PARSERS) if parser_available(parser)]
+    if 'html.parser' not in parsers:
+        parsers.insert(0, 'html.parser')
+    soup_parsers = [parser for parser in parsers if parser != 'selectolax']
+    logger.info(f"Checking parser parity for {parsers}")
+
+    transport = get_transport()
+    mismatches = []
+
+    # Main page
+    main_page = transport.fetch_text(url)
+    main_results = {}
+    for parser in soup_parsers:
+        soup = BeautifulSoup(main_page, parser)
+        main_results[parser] = run_check(lambda: create_master_dict(soup, get_country_names(soup)))
+    compare_results(url, 'create_master_dict', main_results, mismatches)
+
+    # Country pages
+    reference_soup = BeautifulSoup(main_page, 'html.parser')
+    master_dict = create_master_dict(reference_soup, get_country_names(reference_soup))
+    countries = list(master_dict)[:max_countries]
+    park_urls = []
+    park_names = []
+    for country in countries:
+        c_dict = master_dict[country]
+        if c_dict['url'] == None or 'wiki' not in c_dict['url']:
+            continue
+        c_url = "https://en.wikipedia.org" + c_dict['url']
+        try:
+            page = transport.fetch_text(c_url)
+        except OfflineCacheMiss:
+            logger.info(f"{c_url} is not in the page cache. Skipping")
+            continue
+
+        soups = {parser: BeautifulSoup(page, parser) for parser in soup_parsers}
+        for check, function in COUNTRY_PAGE_CHECKS.items():
+            results = {parser: run_check(function, soup, country) for parser, soup in soups.items()}
+            compare_results(c_url, check, results, mismatches)
+
+        results = {parser: run_check(scrape_country_parks, soup, country, c_dict, c_url) for parser, soup in soups.items()}
+        compare_results(c_url, 'scrape_country_parks', results, mismatches)
+
+        parks = scrape_country_parks(soups['html.parser'], country, c_dict, c_url)
+        park_urls.extend(canonicalize_park_url(park['url']) for park in parks.values())
+        park_names.extend(parks)
+
+    check_name_cleaning_parity(park_names, mismatches)
+
+    # Park pages
+    park_urls = [park_url for park_url in dict.fromkeys(park_urls) if park_url != None][:max_parks]
+    for park_url in park_urls:
+        park_url = "https://en.wikipedia.org" + park_url
+        try:
+            page = transport.fetch_text(park_url)
+        except OfflineCacheMiss:
+            continue
+        results = {parser: run_check(find_coordinates_in_html, page, parser) for parser in parsers}
+        compare_results(park_url, 'find_coordinates_in_html', results, mismatches)
+
+        results = {parser: run_check(find_coordinates_fast, page, parser) for parser in soup_parsers}
+        results['html.parser'] = run_check(find_coordinates_in_html, page, 'html.parser')
+        compare_results(park_url, 'find_coordinates_fast', results, mismatches)
+
+    logger.info(f"{len(mismatches)} mismatches found across {len(countries)} countries and {len(park_urls)} parks")
+
+    return mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every parser backend gives the same results as html.parser.")
+    parser.add_argument('--cache-dir', default='.page_cache', help="Directory of the on-disk page cache")
+    parser.add_argument('--offline', action='store_true', help="Only check pages that are already in the cache")
+    parser.add_argument('--max-countries', type=int, default=None, help="Only check the first N countries")
+    parser.add_argument('--max-parks', type=int, default=100, help="Number of park pages to check")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    logger.setLevel(logging.WARNING)
+    configure_transport(cache=PageCache(args.cache_dir), offline=args.offline)
+
+    url = "https://en.wikipedia.org/wiki/List_of_national_parks"
+    mismatches = check_parser_parity(url, max_countries=args.max_countries, max_parks=args.max_parks)
+    for mismatch in mismatches:
+        print(f"{mismatch['parser']} differs on {mismatch['check']} for {mismatch['page']}")
+        print(f"    html.parser: {mismatch['expected']}")
+        print(f"    {mismatch['parser']}: {mismatch['result']}")
+    print(f"{len(mismatches)} mismatches")
@@ -0,0 +1,186 @@
+import queue
+import threading
+from collections import Counter
+
+import pandas as pd
+
+from national_parks import (
+    HtmlCoordinateBackend, batched, build_master_table, clean_country_names, clean_master_table_names,
+    create_master_dict, create_soup, discover_parks, get_country_names, resolve_coordinates
+)
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Columns of national_parks.csv and missing_coordinates.csv
+MASTER_TABLE_COLUMNS = ['country', 'national_park_name', 'park_url', 'lat_dms', 'long_dms', 'lat_dec', 'long_dec']
+
+
+def prefetch(iterable, maxsize):
+    """
+    Run a stage on a background thread, handing its items over through a queue of at
+    most maxsize items, so it keeps working while the next stage is busy but never gets
+    more than maxsize items ahead. Exceptions are raised in the consuming thread.
+    """
+    items = queue.Queue(maxsize)
+    done = object()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((item, None))
+        except BaseException as e:
+            items.put((None, e))
+        items.put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item, error = items.get()
+        if error is not None:
+            raise error
+        if item is done:
+            return
+        yield item
+
+
+def discover_countries(url):
+    """
+    Scrape the main page for the countries, yielding (country, c_dict) with the
+    country's URL and number of parks listed.
+    """
+    master_soup = create_soup(url)
+    countries = create_master_dict(master_soup, get_country_names(master_soup))
+    for country in countries:
+        yield country, dict(countries[country])
+
+
+def country_parks(countries):
+    """
+    Flatten the countries handed on by discover_parks into (country, park_name, park)
+    for resolve_coordinates. Each park is a copy, so parks of completed countries are
+    left as they are.
+    """
+    for country, c_dict, parks in countries:
+        for park_name, park in parks.items():
+            yield country, park_name, dict(park)
+
+
+def clean_rows(parks, chunk_size=500):
+    """
+    Turn the parks into chunks of the master table, chunk_size rows at a time, with
+    clean names and degree decimal coordinates, built the same way as by main.
+    """
+    for batch in batched(parks, chunk_size):
+        chunk = build_master_table({
+            'country': [country for country, _, _ in batch],
+            'national_park_name': [park_name for _, park_name, _ in batch],
+            'url': [park.get('url') for _, _, park in batch],
+            'lat_dms': [park.get('lat_dms') for _, _, park in batch],
+            'long_dms': [park.get('long_dms') for _, _, park in batch]
+        })
+
+        yield clean_master_table_names(chunk)[MASTER_TABLE_COLUMNS]
+
+
+class CsvSink:
+    """
+    CSV file that chunks of a table are appended to as they come, with the header
+    written once.
+    """
+    def __init__(self, path, columns=MASTER_TABLE_COLUMNS):
+        self.path = path
+        self.rows = 0
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        pd.DataFrame(columns=columns).to_csv(self._file, index=False)
+
+    def write(self, chunk):
+        chunk.to_csv(self._file, header=False, index=False)
+        self._file.flush()
+        self.rows += len(chunk)
+
+    def close(self):
+        self._file.close()
+
+
+class MasterTableSink:
+    """
+    Split chunks of the master table into the parks with coordinates and the parks
+    missing them, the same way as write_master_table, and append each to its CSV file.
+    """
+    def __init__(self, parks_path, missing_path):
+        self.parks = CsvSink(parks_path)
+        self.missing = CsvSink(missing_path)
+
+    def write(self, chunk):
+        has_coordinates = chunk['lat_dms'].notna().to_numpy()
+        self.parks.write(chunk[has_coordinates])
+        self.missing.write(chunk[~has_coordinates])
+
+    def close(self):
+        self.parks.close()
+        self.missing.close()
+
+
+def stream_main(url, max_in_flight=1, max_workers=1, coordinate_backend=None, resolve_redirects=False, checkpoint=None,
+                database=None, observers=(), batch_size=500, prefetch_countries=8, parks_path="data/national_parks.csv",
+                missing_path="data/missing_coordinates.csv", summary_path="data/summary_table.csv"):
+    """
+    Run the crawl as a pipeline of stages (country discovery -> park discovery ->
+    coordinate resolution -> cleaning -> CSV sinks) connected by generators, so rows are
+    written to the CSV files as their batch is resolved. Only the parks of the batch in
+    flight, the country pages fetched ahead (up to prefetch_countries), the result of
+    each distinct article (so it is fetched once) and the per-country counts are held in
+    memory, rather than the whole master dictionary and table.
+
+    Unlike main, no master dictionary or table is returned, so the completion checks,
+    incremental crawls and exports that need the whole table are not run. A
+    ParkDatabase given as the database is kept up to date like in main. Returns the
+    summary table.
+    """
+    if coordinate_backend is None:
+        coordinate_backend = HtmlCoordinateBackend(max_in_flight)
+    observers = list(observers)
+    completed_countries = completed_parks = None
+    if checkpoint is not None:
+        observers.append(checkpoint)
+        completed_countries = checkpoint.countries
+        completed_parks = checkpoint.parks
+    if database is not None:
+        observers.append(database)
+
+    # Number of parks listed for each country, and scraped for each (cleaned) country
+    listed = {}
+    scraped = Counter()
+    def count_countries(countries):
+        for country, c_dict, parks in countries:
+            listed[country] = c_dict.get('number_of_parks')
+            yield country, c_dict, parks
+
+    countries = discover_parks(discover_countries(url), max_workers, completed_countries, observers)
+    countries = prefetch(count_countries(countries), prefetch_countries)
+    parks = resolve_coordinates(country_parks(countries), coordinate_backend, batch_size, resolve_redirects,
+                                completed_parks, observers)
+
+    sink = MasterTableSink(parks_path, missing_path)
+    try:
+        for chunk in clean_rows(parks, batch_size):
+            sink.write(chunk)
+            scraped.update(chunk.loc[chunk['lat_dms'].notna(), 'country'])
+            if checkpoint is not None:
+                checkpoint.flush()
+            if database is not None:
+                database.flush()
+    finally:
+        sink.close()
+
+    df_summary = pd.DataFrame({'country': list(listed), 'number_of_parks_listed': list(listed.values())})
+    df_summary['country'] = clean_country_names(df_summary['country'])
+    df_summary['number_of_parks_scraped'] = [scraped[country] for country in df_summary['country']]
+    df_summary.to_csv(summary_path, encoding='utf-8-sig', index=False)
+    if database is not None:
+        database.sync_summary(df_summary)
+
+    logger.info(f"Wrote {sink.parks.rows} parks with coordinates and {sink.missing.rows} missing them")
+
+    return df_summary
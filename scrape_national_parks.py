@@ -1,11 +1,137 @@
 from national_parks import * 
+from checkpoint import CheckpointJournal, has_progress
+from dedup import write_duplicate_parks
+from export import EXPORT_FORMATS, require_fiona, require_pyarrow, write_flatgeobuf, write_geojson_seq, write_park_dataset
+from incremental import IncrementalCrawl
+from park_database import ParkDatabase
+from pipeline import stream_main
+from page_cache import PageCache
+from transport import configure_transport
 
+import argparse
+import functools
 import logging 
 logging.basicConfig()
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scrape the national parks of the world from Wikipedia.")
+    parser.add_argument('--pool-size', type=int, default=10, help="Number of per-host connection pools to keep")
+    parser.add_argument('--max-per-host', type=int, default=10, help="Maximum open connections to a single host")
+    parser.add_argument('--connect-timeout', type=float, default=5, help="Seconds to wait for a connection")
+    parser.add_argument('--read-timeout', type=float, default=30, help="Seconds to wait for a response")
+    parser.add_argument('--workers', type=int, default=4, help="Country pages fetched and scraped in parallel; 1 scrapes them one at a time")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Park pages fetched concurrently; 1 fetches them one at a time")
+    parser.add_argument('--parser', choices=HTML_PARSERS, default='html.parser', help="Parser backend used to parse pages")
+    parser.add_argument('--coordinates', choices=['html', 'api'], default='html', help="Scrape coordinates from park pages or query them from the MediaWiki API")
+    parser.add_argument('--extract', choices=['fast', 'stream', 'full'], default='fast', help="Extract only the coordinates from park pages, also stop downloading them once found (pages cut short are not cached), or parse them whole")
+    parser.add_argument('--resolve-redirects', action='store_true', help="Resolve park URL redirects through the MediaWiki API so each article is fetched once")
+    parser.add_argument('--rate', type=float, default=None, help="Maximum requests per second to Wikipedia")
+    parser.add_argument('--max-retries', type=int, default=5, help="Times a throttled or failed request is retried")
+    parser.add_argument('--cache-dir', default='.page_cache', help="Directory of the on-disk page cache")
+    parser.add_argument('--no-cache', action='store_true', help="Fetch every page from the network")
+    parser.add_argument('--cache-max-age', type=float, default=7 * 24 * 3600, help="Seconds a cached page is used before it is revalidated")
+    parser.add_argument('--offline', action='store_true', help="Serve pages only from the cache and never touch the network")
+    parser.add_argument('--incremental', action='store_true', help="Only fetch the country and park pages whose revision changed since the previous crawl")
+    parser.add_argument('--state-file', default='.crawl_state.json', help="File the revisions and results of the previous crawl are kept in")
+    parser.add_argument('--checkpoint', default='.checkpoint.jsonl', help="Journal the progress of the crawl is appended to")
+    parser.add_argument('--resume', action='store_true', help="Continue an interrupted crawl from its checkpoint journal")
+    parser.add_argument('--fresh', action='store_true', help="Start a new crawl even if the checkpoint journal holds the progress of an interrupted one")
+    parser.add_argument('--stream', action='store_true', help="Write parks to the CSV files as they are resolved instead of keeping the whole crawl in memory")
+    parser.add_argument('--batch-size', type=int, default=500, help="Parks resolved and written at a time with --stream")
+    parser.add_argument('--database', default=None, help="Also keep the results in this SQLite database, updated as the crawl runs")
+    parser.add_argument('--duplicates', default=None, help="Also find parks listed more than once and write the groups of duplicates to this CSV file")
+    parser.add_argument('--export-dir', default=None, help="Also export the park table to this directory, partitioned by country (requires pyarrow)")
+    parser.add_argument('--export-format', choices=EXPORT_FORMATS, default='parquet', help="Format of the exported park table")
+    parser.add_argument('--geojson', default=None, help="Also write the parks with coordinates to this file as newline-delimited GeoJSON")
+    parser.add_argument('--flatgeobuf', default=None, help="Also write the parks with coordinates to this spatially indexed FlatGeobuf file (requires fiona)")
+
+    args = parser.parse_args()
+    if args.resume and args.fresh:
+        parser.error("--resume cannot be used with --fresh")
+    if not args.resume and not args.fresh and has_progress(args.checkpoint):
+        parser.error(f"{args.checkpoint} holds the progress of an interrupted crawl; pass --resume to continue it or --fresh to start over")
+    if args.incremental and args.offline:
+        # Revisions are always asked from the server
+        parser.error("--incremental cannot be used with --offline")
+    if args.stream:
+        # These need the whole crawl in memory
+        whole_crawl = {'--incremental': args.incremental, '--duplicates': args.duplicates, '--export-dir': args.export_dir,
+                       '--geojson': args.geojson, '--flatgeobuf': args.flatgeobuf}
+        for flag, value in whole_crawl.items():
+            if value:
+                parser.error(f"{flag} cannot be used with --stream")
+
+    return args
+
+
 if __name__ == "__main__":
-    url = "https://en.wikipedia.org/wiki/List_of_national_parks"
-    master_dict, df, check_dict = main(url)
+    args = parse_args()
+    cache = None if args.no_cache else PageCache(args.cache_dir, max_age=args.cache_max_age)
+    transport = configure_transport(
+        pool_size=args.pool_size,
+        max_per_host=args.max_per_host,
+        timeout=(args.connect_timeout, args.read_timeout),
+        cache=cache,
+        offline=args.offline,
+        rate=args.rate,
+        max_retries=args.max_retries
+    )
 
+    set_html_parser(args.parser)
+
+    if args.coordinates == 'api':
+        coordinate_backend = MediaWikiCoordinateBackend()
+    else:
+        coordinate_backend = HtmlCoordinateBackend(args.max_in_flight, mode=args.extract)
+
+    incremental = IncrementalCrawl(args.state_file) if args.incremental else None
+    checkpoint = CheckpointJournal(args.checkpoint, resume=args.resume, overwrite=args.fresh)
+    database = ParkDatabase(args.database) if args.database is not None else None
+
+    exporters = []
+    if args.duplicates is not None:
+        exporters.append(functools.partial(write_duplicate_parks, path=args.duplicates))
+    if args.export_dir is not None:
+        # Fail before crawling rather than after
+        require_pyarrow()
+        exporters.append(functools.partial(write_park_dataset, path=args.export_dir, file_format=args.export_format))
+    if args.geojson is not None:
+        exporters.append(functools.partial(write_geojson_seq, path=args.geojson))
+    if args.flatgeobuf is not None:
+        require_fiona()
+        exporters.append(functools.partial(write_flatgeobuf, path=args.flatgeobuf))
+
+    url = "https://en.wikipedia.org/wiki/List_of_national_parks"
+    try:
+        if args.stream:
+            df_summary = stream_main(
+                url,
+                max_workers=args.workers,
+                coordinate_backend=coordinate_backend,
+                resolve_redirects=args.resolve_redirects,
+                checkpoint=checkpoint,
+                database=database,
+                batch_size=args.batch_size
+            )
+        else:
+            master_dict, df, check_dict = main(
+                url,
+                max_workers=args.workers,
+                coordinate_backend=coordinate_backend,
+                resolve_redirects=args.resolve_redirects,
+                incremental=incremental,
+                checkpoint=checkpoint,
+                database=database,
+                exporters=exporters
+            )
+        # The crawl finished, so there is nothing left to resume
+        checkpoint.discard()
+    finally:
+        checkpoint.close()
+        if database is not None:
+            database.close()
+        # Saves the cache's reads and evicts expired pages
+        transport.close()
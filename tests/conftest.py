@@ -0,0 +1,79 @@
+"""
+Stub of the MediaWiki API, answering action=query requests from a dictionary of
+articles instead of the network, for testing the code that takes a transport.
+"""
+import json
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class StubWikipedia:
+    """
+    Transport answering MediaWiki queries (prop=coordinates and prop=info, redirects
+    and title normalization) from articles: title -> {'coordinates': [...],
+    'lastrevid': ...}. Titles starting with a lowercase letter are normalized to
+    uppercase, like on Wikipedia. A request for any title in fail_titles raises a
+    ConnectionError and one for a title in error_titles gets an API error. Every
+    request's titles are kept in requests.
+    """
+    offline = False
+    cache = None
+
+    def __init__(self, articles=None, redirects=None):
+        self.articles = articles if articles is not None else {}
+        self.redirects = redirects if redirects is not None else {}
+        self.fail_titles = set()
+        self.error_titles = set()
+        self.requests = []
+
+    def answer(self, url):
+        params = {key: values[0] for key, values in parse_qs(urlsplit(url).query).items()}
+        titles = params['titles'].split('|')
+        self.requests.append(titles)
+        if self.fail_titles.intersection(titles):
+            raise requests.ConnectionError(f"Could not reach {url}")
+        if self.error_titles.intersection(titles):
+            return {'error': {'code': 'internal_api_error', 'info': 'Stub error'}}
+
+        normalized = []
+        redirects = []
+        pages = []
+        for title in titles:
+            if title[0].islower():
+                normalized.append({'from': title, 'to': title[0].upper() + title[1:]})
+                title = title[0].upper() + title[1:]
+            if title in self.redirects:
+                redirects.append({'from': title, 'to': self.redirects[title]})
+                title = self.redirects[title]
+            if title in self.articles:
+                page = {'title': title}
+                if params.get('prop') == 'coordinates' and 'coordinates' in self.articles[title]:
+                    page['coordinates'] = self.articles[title]['coordinates']
+                if params.get('prop') == 'info':
+                    page['lastrevid'] = self.articles[title]['lastrevid']
+                pages.append(page)
+            else:
+                pages.append({'title': title, 'missing': True})
+
+        return {'batchcomplete': True, 'query': {'normalized': normalized, 'redirects': redirects, 'pages': pages}}
+
+    def fetch_text(self, url):
+        return json.dumps(self.answer(url))
+
+    def get(self, url, **kwargs):
+        return StubResponse(self.answer(url))
+
+
+@pytest.fixture
+def wikipedia():
+    return StubWikipedia()
@@ -0,0 +1,101 @@
+"""
+Tests of resuming a crawl from a checkpoint journal cut short by a crash.
+"""
+import json
+import sys
+
+import pytest
+
+import scrape_national_parks
+from checkpoint import CheckpointJournal
+from national_parks import scrape_coordinates
+from park_store import ParkStore
+
+
+RECORDS = [
+    {'type': 'country', 'country': 'Canada', 'parks': {
+        'Banff': {'url': '/wiki/Banff'}, 'Jasper': {'url': '/wiki/Jasper'}, 'Yoho': {'url': '/wiki/Yoho'}
+    }},
+    {'type': 'park', 'url': '/wiki/Banff', 'lat_dms': '51°N', 'long_dms': '116°W'},
+    {'type': 'park', 'url': '/wiki/Yoho', 'lat_dms': None, 'long_dms': None, 'error': False},
+    {'type': 'park', 'url': '/wiki/Jasper', 'lat_dms': None, 'long_dms': None, 'error': True},
+]
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.fetched = []
+
+    def resolve(self, jobs):
+        self.fetched.extend(park_url for _, _, park_url in jobs)
+        return [('52°N', '118°W') for _ in jobs]
+
+
+@pytest.fixture
+def torn_journal(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    complete = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in RECORDS)
+    # The crash cut the last record short
+    path.write_text(complete + '{"type": "park", "url": "/wiki/Kootenay", "lat', encoding='utf-8')
+
+    return path, len(complete.encode('utf-8'))
+
+
+def test_resume_skips_the_torn_record(torn_journal):
+    path, complete_size = torn_journal
+    journal = CheckpointJournal(path, resume=True)
+
+    assert dict(journal.countries) == {'Canada': RECORDS[0]['parks']}
+    assert journal.parks == {'/wiki/Banff': ('51°N', '116°W'), '/wiki/Yoho': (None, None)}
+    assert path.stat().st_size == complete_size
+
+    journal.park_resolved('/wiki/Kootenay', '50°N', '116°W')
+    journal.close()
+
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert records == RECORDS + [{'type': 'park', 'url': '/wiki/Kootenay', 'lat_dms': '50°N', 'long_dms': '116°W'}]
+
+
+def test_resume_retries_parks_that_could_not_be_fetched(torn_journal):
+    path, _ = torn_journal
+    journal = CheckpointJournal(path, resume=True)
+    store = ParkStore({'Canada': {'url': '/wiki/Canada', 'number_of_parks': '3'}})
+    store['Canada']['parks'] = journal.countries['Canada']
+
+    backend = RecordingBackend()
+    scrape_coordinates(store, backend=backend, completed=journal.parks, observers=[journal])
+    journal.close()
+
+    assert backend.fetched == ['https://en.wikipedia.org/wiki/Jasper']
+    assert {park_name: park['lat_dms'] for park_name, park in store['Canada']['parks'].items()} == {
+        'Banff': '51°N', 'Jasper': '52°N', 'Yoho': None
+    }
+    # Only the retried park is journaled again
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert records[len(RECORDS):] == [{'type': 'park', 'url': '/wiki/Jasper', 'lat_dms': '52°N', 'long_dms': '118°W'}]
+
+
+def test_unfinished_journal_is_not_started_over(torn_journal):
+    path, _ = torn_journal
+    with pytest.raises(FileExistsError):
+        CheckpointJournal(path)
+
+    CheckpointJournal(path, overwrite=True).close()
+    assert path.read_text(encoding='utf-8') == ''
+
+
+@pytest.mark.parametrize('flags, allowed', [
+    ([], False),
+    (['--resume'], True),
+    (['--fresh'], True),
+    (['--resume', '--fresh'], False),
+])
+def test_cli_refuses_to_overwrite_an_unfinished_journal(torn_journal, monkeypatch, flags, allowed):
+    path, _ = torn_journal
+    monkeypatch.setattr(sys, 'argv', ['scrape_national_parks.py', '--checkpoint', str(path)] + flags)
+
+    if allowed:
+        scrape_national_parks.parse_args()
+    else:
+        with pytest.raises(SystemExit):
+            scrape_national_parks.parse_args()
@@ -0,0 +1,124 @@
+"""
+Tests of the incremental crawl against a stub of the MediaWiki API (conftest.py), with
+a backend that records the park pages it is asked for.
+"""
+import pytest
+
+from incremental import IncrementalCrawl
+from national_parks import FETCH_FAILED, scrape_coordinates
+from park_store import ParkStore
+
+
+COUNTRY_PARKS = {
+    'Banff National Park': {'url': '/wiki/Banff_National_Park'},
+    'Jasper National Park': {'url': '/wiki/Jasper_National_Park'}
+}
+
+
+class RecordingBackend:
+    def __init__(self, coordinates):
+        self.coordinates = coordinates
+        self.fetched = []
+
+    def resolve(self, jobs):
+        hrefs = [park_url[len("https://en.wikipedia.org"):] for _, _, park_url in jobs]
+        self.fetched.extend(hrefs)
+        return [self.coordinates[href] for href in hrefs]
+
+
+@pytest.fixture
+def wikipedia(wikipedia):
+    wikipedia.articles = {
+        'Canada': {'lastrevid': 10},
+        'Banff National Park': {'lastrevid': 20},
+        'Jasper National Park': {'lastrevid': 30}
+    }
+    return wikipedia
+
+
+def crawl(path, wikipedia, backend):
+    """
+    Run the country and coordinate phases of main for one country.
+    """
+    incremental = IncrementalCrawl(path, transport=wikipedia)
+    store = ParkStore({'Canada': {'url': '/wiki/Canada', 'number_of_parks': '2'}})
+
+    unchanged = incremental.unchanged_countries(store)
+    parks = unchanged.get('Canada', COUNTRY_PARKS)
+    store['Canada']['parks'] = parks
+    incremental.record_country('Canada', parks)
+
+    completed = incremental.reuse_coordinates(store)
+    scrape_coordinates(store, backend=backend, completed=completed, observers=[incremental])
+    incremental.save(store)
+
+    return unchanged, store
+
+
+def coordinates(store):
+    return {park_name: (park.get('lat_dms'), park.get('long_dms')) for park_name, park in store['Canada']['parks'].items()}
+
+
+def test_unchanged_revisions_reuse_the_previous_crawl(tmp_path, wikipedia):
+    path = tmp_path / 'state.json'
+    backend = RecordingBackend({
+        '/wiki/Banff_National_Park': ('51°N', '116°W'),
+        '/wiki/Jasper_National_Park': (None, None)
+    })
+    _, first = crawl(path, wikipedia, backend)
+    assert sorted(backend.fetched) == ['/wiki/Banff_National_Park', '/wiki/Jasper_National_Park']
+
+    backend.fetched = []
+    unchanged, second = crawl(path, wikipedia, backend)
+
+    assert backend.fetched == []
+    assert unchanged == {'Canada': COUNTRY_PARKS}
+    assert coordinates(second) == coordinates(first) == {
+        'Banff National Park': ('51°N', '116°W'),
+        'Jasper National Park': (None, None)
+    }
+
+
+def test_changed_revisions_are_fetched_again(tmp_path, wikipedia):
+    path = tmp_path / 'state.json'
+    backend = RecordingBackend({
+        '/wiki/Banff_National_Park': ('51°N', '116°W'),
+        '/wiki/Jasper_National_Park': ('52°N', '118°W')
+    })
+    crawl(path, wikipedia, backend)
+
+    wikipedia.articles['Banff National Park']['lastrevid'] = 21
+    backend.coordinates['/wiki/Banff_National_Park'] = ('51°10′N', '115°34′W')
+    backend.fetched = []
+    _, store = crawl(path, wikipedia, backend)
+
+    assert backend.fetched == ['/wiki/Banff_National_Park']
+    assert coordinates(store) == {
+        'Banff National Park': ('51°10′N', '115°34′W'),
+        'Jasper National Park': ('52°N', '118°W')
+    }
+
+    # A changed country page is scraped again rather than reused
+    wikipedia.articles['Canada']['lastrevid'] = 11
+    unchanged, _ = crawl(path, wikipedia, backend)
+    assert unchanged == {}
+
+
+def test_failed_parks_are_retried_on_the_next_run(tmp_path, wikipedia):
+    path = tmp_path / 'state.json'
+    backend = RecordingBackend({
+        '/wiki/Banff_National_Park': ('51°N', '116°W'),
+        '/wiki/Jasper_National_Park': FETCH_FAILED
+    })
+    crawl(path, wikipedia, backend)
+
+    backend.coordinates['/wiki/Jasper_National_Park'] = ('52°N', '118°W')
+    backend.fetched = []
+    _, store = crawl(path, wikipedia, backend)
+
+    assert backend.fetched == ['/wiki/Jasper_National_Park']
+    assert coordinates(store)['Jasper National Park'] == ('52°N', '118°W')
+
+    backend.fetched = []
+    crawl(path, wikipedia, backend)
+    assert backend.fetched == []
@@ -0,0 +1,106 @@
+"""
+Tests of the MediaWiki coordinates backend against a stub of the API (conftest.py).
+"""
+import mediawiki
+from national_parks import FETCH_FAILED, MediaWikiCoordinateBackend, resolve_coordinates
+
+
+def earth(lat, lon):
+    return {'lat': lat, 'lon': lon, 'primary': True, 'globe': 'earth'}
+
+
+def test_fetch_coordinates_batches(wikipedia):
+    wikipedia.articles = {f"Park {i}": {'coordinates': [earth(i, -i)]} for i in range(5)}
+    titles = [f"Park {i}" for i in range(5)]
+
+    coordinates = mediawiki.fetch_coordinates(titles + ["Park 0"], wikipedia, batch_size=2)
+
+    assert coordinates == {f"Park {i}": (i, -i) for i in range(5)}
+    # Duplicate titles are only asked for once
+    assert wikipedia.requests == [["Park 0", "Park 1"], ["Park 2", "Park 3"], ["Park 4"]]
+
+
+def test_fetch_coordinates_follows_redirects_and_normalization(wikipedia):
+    wikipedia.articles = {"Banff National Park": {'coordinates': [earth(51.5, -116)]}}
+    wikipedia.redirects = {"Banff": "Banff National Park"}
+
+    coordinates = mediawiki.fetch_coordinates(["Banff", "banff", "Banff National Park", "Nowhere"], wikipedia)
+
+    assert coordinates == {
+        "Banff": (51.5, -116),
+        "banff": (51.5, -116),
+        "Banff National Park": (51.5, -116),
+        "Nowhere": None
+    }
+
+
+def test_fetch_coordinates_skips_other_globes(wikipedia):
+    wikipedia.articles = {
+        "Olympus Mons": {'coordinates': [{'lat': 18.65, 'lon': 226.2, 'globe': 'mars'}]},
+        "Teide": {'coordinates': [{'lat': 1, 'lon': 1, 'globe': 'moon'}, earth(28.27, -16.64)]}
+    }
+
+    coordinates = mediawiki.fetch_coordinates(["Olympus Mons", "Teide"], wikipedia)
+
+    assert coordinates == {"Olympus Mons": None, "Teide": (28.27, -16.64)}
+
+
+def test_fetch_coordinates_leaves_out_failed_batches(wikipedia):
+    wikipedia.articles = {f"Park {i}": {'coordinates': [earth(i, i)]} for i in range(6)}
+    wikipedia.fail_titles = {"Park 1"}
+    wikipedia.error_titles = {"Park 4"}
+
+    coordinates = mediawiki.fetch_coordinates([f"Park {i}" for i in range(6)], wikipedia, batch_size=2)
+
+    assert coordinates == {"Park 2": (2, 2), "Park 3": (3, 3)}
+
+
+def test_backend_results(wikipedia):
+    wikipedia.articles = {
+        "Banff National Park": {'coordinates': [earth(51.5, -116)]},
+        "No Coordinates": {}
+    }
+    wikipedia.redirects = {"Banff": "Banff National Park"}
+    wikipedia.fail_titles = {"Unreachable"}
+    backend = MediaWikiCoordinateBackend(wikipedia, batch_size=2)
+    jobs = [
+        ("Canada", "Banff", "https://en.wikipedia.org/wiki/Banff"),
+        ("Canada", "Nothing", "https://en.wikipedia.org/wiki/No_Coordinates"),
+        ("Canada", "Lost", "https://en.wikipedia.org/wiki/Unreachable"),
+        ("Canada", "Not an article", "https://en.wikipedia.org/w/index.php?action=edit")
+    ]
+
+    results = backend.resolve(jobs)
+
+    assert results[0] == ("51°30′0″N", "116°0′0″W")
+    assert results[1] == (None, None) and results[1] is not FETCH_FAILED
+    assert results[2] is FETCH_FAILED
+    assert results[3] == (None, None) and results[3] is not FETCH_FAILED
+
+
+def test_resolve_redirects_keeps_titles_of_failed_batches(wikipedia):
+    wikipedia.articles = {"Banff National Park": {}, "Jasper National Park": {}}
+    wikipedia.redirects = {"Banff": "Banff National Park", "Jasper": "Jasper National Park"}
+    wikipedia.fail_titles = {"Teide"}
+    wikipedia.error_titles = {"Vanoise"}
+
+    resolved = mediawiki.resolve_redirects(["Banff", "Teide", "Vanoise", "Jasper"], wikipedia, batch_size=1)
+
+    assert resolved == {"Banff": "Banff National Park", "Teide": "Teide", "Vanoise": "Vanoise",
+                        "Jasper": "Jasper National Park"}
+
+
+def test_resolve_coordinates_resolves_redirects_through_the_backend(wikipedia):
+    wikipedia.articles = {"Banff National Park": {'coordinates': [earth(51.5, -116)]}}
+    wikipedia.redirects = {"Banff": "Banff National Park"}
+    parks = [
+        ("Canada", "Banff", {'url': "/wiki/Banff"}),
+        ("Canada", "Banff National Park", {'url': "/wiki/Banff_National_Park"})
+    ]
+
+    backend = MediaWikiCoordinateBackend(wikipedia)
+    resolved = list(resolve_coordinates(parks, backend, resolve_redirects=True))
+
+    assert [park['lat_dms'] for _, _, park in resolved] == ["51°30′0″N", "51°30′0″N"]
+    # One query to resolve the redirects and one for the article they share
+    assert wikipedia.requests == [["Banff", "Banff National Park"], ["Banff National Park"]]
@@ -0,0 +1,73 @@
+"""
+Golden tests for the name cleaning. The expected names were produced by the original
+re.sub chain of clean_park_name and clean_country_name, run over every name in the
+published tables and over copies of them with the text each rule strips (footnotes,
+brackets, dates, dashes, other scripts, ...) added, so any change to the rules that
+changes a name fails here.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import national_parks
+from national_parks import clean_country_name, clean_country_names, clean_park_name, clean_park_names
+
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def load_golden(name):
+    return pd.read_csv(DATA_DIR / name, encoding='utf-8', dtype=str, keep_default_na=False)
+
+
+@pytest.fixture(scope='module')
+def park_names():
+    return load_golden("park_names.csv")
+
+
+@pytest.fixture(scope='module')
+def country_names():
+    return load_golden("country_names.csv")
+
+
+def test_clean_park_name(park_names):
+    cleaned = [clean_park_name(name) for name in park_names['name']]
+    assert cleaned == list(park_names['expected'])
+
+
+def test_clean_park_names(park_names):
+    names = pd.Series(park_names['name'], dtype=object)
+    # Twice, so the names looked up in the memo are checked as well
+    assert list(clean_park_names(names)) == list(park_names['expected'])
+    assert list(clean_park_names(names)) == list(park_names['expected'])
+
+
+def test_clean_park_names_categorical(park_names):
+    names = park_names['name'].astype('category')
+    assert list(clean_park_names(names)) == list(park_names['expected'])
+
+
+def test_clean_country_name(country_names):
+    assert [clean_country_name(name) for name in country_names['name']] == list(country_names['expected'])
+    assert list(clean_country_names(pd.Series(country_names['name'], dtype=object))) == list(country_names['expected'])
+
+
+def test_name_memo_is_bounded(park_names, monkeypatch):
+    monkeypatch.setattr(national_parks, 'NAME_MEMO_SIZE', 100)
+    memo = {}
+    names = pd.Series(park_names['name'], dtype=object)
+    for start in range(0, 1000, 50):
+        chunk = names[start:start + 50]
+        cleaned = national_parks.apply_name_rules_vectorized(chunk, national_parks.PARK_NAME_RULES, memo)
+        assert list(cleaned) == list(park_names['expected'][start:start + 50])
+        assert len(memo) <= 100
+
+
+def test_name_memo_is_bounded_within_a_call(park_names, monkeypatch):
+    monkeypatch.setattr(national_parks, 'NAME_MEMO_SIZE', 100)
+    memo = {}
+    names = pd.Series(park_names['name'], dtype=object)
+    cleaned = national_parks.apply_name_rules_vectorized(names, national_parks.PARK_NAME_RULES, memo)
+    assert list(cleaned) == list(park_names['expected'])
+    assert len(memo) == 100
@@ -0,0 +1,25 @@
+"""
+Tests of the slotted park store and the metrics it keeps.
+"""
+from park_store import ParkRecord, ParkStore
+
+
+def test_parks_set_one_at_a_time_are_records():
+    store = ParkStore({'Canada': {'url': '/wiki/Canada', 'number_of_parks': '3'}})
+    store['Canada']['parks'] = {'Banff': {'url': '/wiki/Banff'}}
+    store['Canada']['parks']['Jasper'] = {'url': '/wiki/Jasper', 'lat_dms': '52°N', 'long_dms': '118°W'}
+    store['Canada']['parks']['Red'] = {'url': None}
+
+    assert all(isinstance(park, ParkRecord) for park in store['Canada']['parks'].values())
+    assert store.park_columns()['lat_dms'] == [None, '52°N', None]
+    assert store.metrics.snapshot()['parks_found'] == 3
+    assert store.metrics.snapshot()['parks_scraped'] == 1
+    assert store.metrics.parks_missing_url() == ['Red']
+
+    store['Canada']['parks']['Banff']['lat_dms'] = '51°N'
+    store['Canada']['parks']['Jasper'] = {'url': '/wiki/Jasper'}
+    del store['Canada']['parks']['Red']
+
+    assert store.metrics.snapshot()['parks_found'] == 2
+    assert store.metrics.parks_scraped_by_country() == {'Canada': 1}
+    assert store.metrics.parks_missing_url() == []
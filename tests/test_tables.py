@@ -0,0 +1,106 @@
+"""
+Tests of the wikitable scrapers on small tables with merged cells. The expected parks
+are the ones the scrapers produced before TableView, for the layouts each of them was
+written for.
+"""
+import bs4
+import pytest
+
+from national_parks import (
+    TableView, scrape_edge_case_g5, scrape_edge_case_g7, scrape_next_national_park_table
+)
+
+
+SIMPLE = """
+<table class="wikitable">
+<tr><th>Name</th><th>Established</th></tr>
+<tr><td><a href="/wiki/Banff_National_Park">Banff</a></td><td>1885</td></tr>
+<tr><td><a href="/wiki/Jasper_National_Park">Jasper</a><sup><a href="#cite_note-1">[1]</a></sup></td><td>1907</td></tr>
+<tr><td>Unlinked</td><td>1930</td></tr>
+</table>
+"""
+
+# A province cell merged down two rows, right of the park name
+ROWSPAN = """
+<table class="wikitable">
+<tr><th>Photo</th><th>National park</th><th>Province</th></tr>
+<tr><td><a href="/wiki/File:A.jpg">img</a></td><td><a href="/wiki/Cuc_Phuong">Cuc Phuong</a></td><td rowspan="2">Ninh Binh</td></tr>
+<tr><td><a href="/wiki/File:B.jpg">img</a></td><td><a href="/wiki/Tam_Dao">Tam Dao</a></td></tr>
+<tr><td><a href="/wiki/File:C.jpg">img</a></td><td><a href="/wiki/Ba_Be">Ba Be</a></td><td>Bac Kan</td></tr>
+</table>
+"""
+
+# A region cell merged down two rows, left of the park name (Vietnam, group 7)
+MERGED_FIRST_COLUMN = """
+<table class="wikitable">
+<tr><th>Region</th><th>Name</th><th>Area</th></tr>
+<tr><td rowspan="2">North</td><td><a href="/wiki/Ba_Vi">Ba Vi</a></td><td>10</td></tr>
+<tr><td><a href="/wiki/Cat_Ba">Cat Ba</a></td><td>20</td></tr>
+<tr><td>South</td><td><a href="/wiki/Con_Dao">Con Dao</a></td><td>30</td></tr>
+</table>
+"""
+
+TWO_LEVEL_HEADER = """
+<table class="wikitable">
+<tr><th rowspan="2">Name</th><th colspan="2">Area</th></tr>
+<tr><th>km2</th><th>mi2</th></tr>
+<tr><td><a href="/wiki/Kruger_National_Park">Kruger</a></td><td>19485</td><td>7523</td></tr>
+<tr><td><a href="/wiki/Addo_Elephant_National_Park">Addo</a></td><td>1640</td><td>630</td></tr>
+</table>
+"""
+
+
+def soup(html):
+    return bs4.BeautifulSoup(f'<div class="mw-parser-output">{html}</div>', 'html.parser')
+
+
+def urls(parks):
+    return {park_name: park['url'] for park_name, park in parks.items()}
+
+
+@pytest.mark.parametrize('html, expected', [
+    (SIMPLE, {'Banff': '/wiki/Banff_National_Park', 'Jasper[1]': '/wiki/Jasper_National_Park', 'Unlinked': None}),
+    (ROWSPAN, {'Cuc Phuong': '/wiki/Cuc_Phuong', 'Tam Dao': '/wiki/Tam_Dao', 'Ba Be': '/wiki/Ba_Be'}),
+])
+def test_scrape_next_national_park_table(html, expected):
+    assert urls(scrape_next_national_park_table(soup(html).find('table'))) == expected
+
+
+@pytest.mark.parametrize('html, expected', [
+    (SIMPLE, {'Banff': '/wiki/Banff_National_Park', 'Jasper[1]': '/wiki/Jasper_National_Park'}),
+    (ROWSPAN, {'Cuc Phuong': '/wiki/Cuc_Phuong', 'Tam Dao': '/wiki/Tam_Dao', 'Ba Be': '/wiki/Ba_Be'}),
+    (TWO_LEVEL_HEADER, {'Kruger': '/wiki/Kruger_National_Park', 'Addo': '/wiki/Addo_Elephant_National_Park'}),
+])
+def test_scrape_edge_case_g5(html, expected):
+    assert urls(scrape_edge_case_g5(soup(html))) == expected
+
+
+def test_scrape_edge_case_g7_merged_first_column():
+    expected = {'Ba Vi': '/wiki/Ba_Vi', 'Cat Ba': '/wiki/Cat_Ba', 'Con Dao': '/wiki/Con_Dao'}
+    assert urls(scrape_edge_case_g7(soup(MERGED_FIRST_COLUMN))) == expected
+    # The grid lines the name column up without group 7's index shifting
+    assert urls(scrape_next_national_park_table(soup(MERGED_FIRST_COLUMN).find('table'))) == expected
+
+
+def test_two_level_header():
+    view = TableView(soup(TWO_LEVEL_HEADER).find('table'))
+    assert view.first_data_row == 2
+    assert (view.name_col, view.has_name_col) == (0, True)
+    assert [len(grid_row) for grid_row in view.grid] == [3, 3, 3, 3]
+
+    # The parks found before, without the sub-header row ('km2') that used to be
+    # taken for a park without a URL
+    expected = {'Kruger': '/wiki/Kruger_National_Park', 'Addo': '/wiki/Addo_Elephant_National_Park'}
+    assert urls(scrape_next_national_park_table(view.table)) == expected
+
+
+def test_name_column_is_read_from_the_first_header_row():
+    table = soup("""
+    <table class="wikitable">
+    <tr><th>Region</th><th>Park</th></tr>
+    <tr><th>Name</th><th>Title</th></tr>
+    <tr><td>North</td><td><a href="/wiki/Ba_Vi">Ba Vi</a></td></tr>
+    </table>
+    """).find('table')
+    view = TableView(table)
+    assert (view.name_col, view.has_name_col) == (0, False)
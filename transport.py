@@ -0,0 +1,364 @@
+import codecs
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from page_cache import OfflineCacheMiss
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'national_parks scraper (https://github.com/andrew-dang/national_parks)',
+}
+
+
+# Responses that mean the server wants us to slow down, or is briefly unavailable
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the rate requests are sent at. rate is in requests per
+    second, None for no limit; burst is how many requests may be sent back to back.
+    The bucket can also be paused, e.g. until a Retry-After time has passed.
+    """
+    def __init__(self, rate=None, burst=10):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self.rate is None:
+                    return
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrency:
+    """
+    Limit on the number of requests in flight, adjusted with additive increase /
+    multiplicative decrease (AIMD). Every successful response grows the limit by
+    about one per window of requests, while throttling responses, errors and latency
+    spikes shrink it by decrease_factor, at most once per cooldown period.
+
+    latency_factor: a response slower than latency_factor times the moving average
+    latency, and at least min_spike seconds slower than it, counts as a spike
+    """
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease_factor=0.5, latency_factor=3.0, min_spike=0.5,
+                 cooldown=1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.min_spike = min_spike
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.average_latency = None
+        self._last_decrease = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self, latency):
+        with self._condition:
+            if self._is_spike(latency):
+                self._decrease()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._condition.notify()
+
+            if self.average_latency is None:
+                self.average_latency = latency
+            else:
+                self.average_latency = 0.9 * self.average_latency + 0.1 * latency
+
+    def _is_spike(self, latency):
+        if self.average_latency is None:
+            return False
+
+        return (latency > self.latency_factor * self.average_latency
+                and latency - self.average_latency > self.min_spike)
+
+    def on_throttle(self):
+        with self._condition:
+            self._decrease()
+
+    def _decrease(self):
+        now = time.monotonic()
+        # Responses to requests sent before the last decrease should not shrink the limit again
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+        logger.info(f"Server is throttling or slowing down, lowering concurrency limit to {int(self.limit)}")
+
+
+def retry_after_seconds(response):
+    """
+    Seconds to wait according to a response's Retry-After header (either a number of
+    seconds or an HTTP date), or None if there is no usable header.
+    """
+    if response is None or 'Retry-After' not in response.headers:
+        return None
+
+    value = response.headers['Retry-After']
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Transport:
+    """
+    Shared HTTP transport for every page fetched by the scraper. Wraps a pooled
+    requests.Session so that connections to en.wikipedia.org are kept alive and
+    reused instead of paying a TCP + TLS handshake for each page.
+
+    pool_size: number of per-host connection pools kept by the session
+    max_per_host: maximum number of open connections to a single host
+    timeout: (connect, read) timeout in seconds applied to every request
+    cache: optional PageCache that fetch_text reads from and writes to
+    offline: serve pages only from the cache and never touch the network
+    rate: maximum requests per second, None for no limit
+    max_retries: times a throttled or failed request is retried before giving up
+    backoff: base delay in seconds of the jittered exponential backoff between retries
+
+    Requests go through a token bucket and an AdaptiveConcurrency limit, capped at
+    max_per_host, so that concurrent fetches settle at the highest rate the server
+    accepts without throttling.
+    """
+    def __init__(self, pool_size=10, max_per_host=10, timeout=(5, 30), headers=None, cache=None, offline=False,
+                 rate=None, max_retries=5, backoff=1.0):
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.rate_limiter = TokenBucket(rate, burst=max_per_host)
+        self.concurrency = AdaptiveConcurrency(initial=min(4, max_per_host), maximum=max_per_host)
+
+        if offline and cache is None:
+            raise ValueError("Offline mode needs a page cache to read from")
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+
+        # pool_block caps the number of connections per host at max_per_host;
+        # extra requests wait for a free connection rather than opening a new one
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=max_per_host, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _retry_delay(self, attempt, response):
+        """
+        Honor Retry-After if the server sent one, otherwise back off exponentially
+        with full jitter so that retries from many threads do not line up.
+        """
+        retry_after = retry_after_seconds(response)
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff)
+
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET a URL, retrying throttled (429), unavailable (5xx) and failed requests.
+        Raises requests.HTTPError or the connection error once retries run out.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            self.concurrency.acquire()
+            start = time.monotonic()
+            error = None
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response = None
+                error = e
+            finally:
+                self.concurrency.release()
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                self.concurrency.on_success(time.monotonic() - start)
+                return response
+
+            self.concurrency.on_throttle()
+            if attempt == self.max_retries:
+                break
+
+            delay = self._retry_delay(attempt, response)
+            if response is not None and response.status_code in (429, 503):
+                # The whole host is throttling us, so hold back every thread, not just this one
+                self.rate_limiter.pause(delay)
+            reason = error if response is None else f"HTTP {response.status_code}"
+            logger.info(f"{url} failed ({reason}). Retrying in {round(delay, 2)} seconds")
+            time.sleep(delay)
+
+        if response is None:
+            raise error
+        response.raise_for_status()
+
+        return response
+
+    def fetch_text(self, url: str) -> str:
+        """
+        Fetch a page and return its body as text, going through the page cache
+        if there is one.
+        """
+        if self.cache is None:
+            return self.get(url).text
+
+        entry = self.cache.get(url)
+        if self.offline:
+            if entry is None:
+                raise OfflineCacheMiss(f"{url} is not in the page cache")
+            return self.cache.read_body(entry)
+
+        if entry is not None and self.cache.is_fresh(entry):
+            return self.cache.read_body(entry)
+
+        # Revalidate a stale entry with a conditional GET
+        headers = {}
+        if entry is not None:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        response = self.get(url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            logger.debug(f"{url} has not changed since it was cached")
+            self.cache.touch(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return self.cache.read_body(entry)
+
+        body = response.text
+        if response.status_code == 200:
+            self.cache.put(url, body, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+        return body
+
+    def stream_text(self, url: str, chunk_size=32 * 1024):
+        """
+        Fetch a page and yield its body as decoded text chunks as they arrive. Closing
+        the generator before the end stops the download and closes the connection
+        (it cannot be reused for another request, since the rest of the body was never
+        read). Pages in the cache are yielded whole instead, and a page read to the
+        end is added to the cache.
+        """
+        if self.cache is not None and (self.offline or self.cache.get(url) is not None):
+            yield self.fetch_text(url)
+            return
+
+        response = self.get(url, stream=True)
+        complete = False
+        body = []
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+            for chunk in response.iter_content(chunk_size):
+                text = decoder.decode(chunk)
+                if self.cache is not None:
+                    body.append(text)
+                yield text
+            text = decoder.decode(b'', final=True)
+            if self.cache is not None:
+                body.append(text)
+            yield text
+            complete = True
+        finally:
+            response.close()
+
+        if complete and self.cache is not None and response.status_code == 200:
+            self.cache.put(url, ''.join(body), response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def close(self):
+        self.session.close()
+        # An offline run replays the cache as it is, however old
+        if self.cache is not None and self.offline:
+            self.cache.flush()
+        elif self.cache is not None:
+            self.cache.evict()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """
+    Return the shared transport, creating one with default settings on first use.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = Transport()
+
+    return _transport
+
+
+def set_transport(transport: Transport):
+    """
+    Replace the shared transport used by create_soup.
+    """
+    global _transport
+    with _transport_lock:
+        old_transport = _transport
+        _transport = transport
+
+    if old_transport is not None and old_transport is not transport:
+        old_transport.close()
+
+
+def configure_transport(**kwargs) -> Transport:
+    """
+    Create a Transport with the given settings and make it the shared transport.
+    """
+    transport = Transport(**kwargs)
+    set_transport(transport)
+
+    return transport